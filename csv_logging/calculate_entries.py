@@ -1,3 +1,6 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
 from geopandas import GeoDataFrame
 
 from csv_logging.csvlogger import (
@@ -5,6 +8,7 @@ from csv_logging.csvlogger import (
     GoodnessOfFitForInitialBottomElevation,
     GoodnessOfFitForInitialWaterDepth,
     GoodnessOfFitFor3dEvaluation,
+    GoodnessOfFitFor3dEvaluationOnGrid,
     ShearStress,
 )
 from evaluation_runner.analysis_calibration.three_dimensional import (
@@ -29,6 +33,9 @@ from statistical_formulas.formulas_goodness_of_fit import (
     calculate_average_error,
 )
 
+if TYPE_CHECKING:
+    from evaluation_runner.analysis_calibration.raster_comparison import ElevationChangeSummary
+
 
 def goodness_of_fit_for_velocity(
     gps_points_with_velocity, experiment_id: str, velocity_name: str
@@ -159,3 +166,36 @@ def goodness_of_fit_for_three_d_analysis(
             / sum(union_of_dod_and_simulated_dz_mesh.area)
         ),
     )
+
+
+def goodness_of_fit_for_three_d_analysis_on_grid(
+    summary: "ElevationChangeSummary", experiment_id: str, polygon_name: str
+) -> GoodnessOfFitFor3dEvaluationOnGrid:
+    area = np.float64(summary.area)
+    return GoodnessOfFitFor3dEvaluationOnGrid(
+        experiment_id=experiment_id,
+        polygon_name=polygon_name,
+        area_polygon=summary.area,
+        ratio_of_eroded_area_dod=np.divide(summary.eroded_area_observed, area),
+        ratio_of_deposited_area_dod=np.divide(summary.deposited_area_observed, area),
+        ratio_of_eroded_area_sim=np.divide(summary.eroded_area_simulated, area),
+        ratio_of_deposited_area_sim=np.divide(summary.deposited_area_simulated, area),
+        ratio_of_identical_change=np.divide(summary.identical_area, area),
+        ratio_of_different_change=np.divide(summary.area - summary.identical_area, area),
+        eroded_volume_sim=summary.eroded_volume_simulated,
+        deposited_volume_sim=summary.deposited_volume_simulated,
+        eroded_volume_dod=summary.eroded_volume_observed,
+        deposited_volume_dod=summary.deposited_volume_observed,
+        eroded_volume_absolute_error=abs(summary.eroded_volume_simulated - summary.eroded_volume_observed),
+        deposited_volume_absolute_error=abs(summary.deposited_volume_simulated - summary.deposited_volume_observed),
+        eroded_volume_per_area_sim=np.divide(summary.eroded_volume_simulated, area),
+        deposited_volume_per_area_sim=np.divide(summary.deposited_volume_simulated, area),
+        eroded_volume_per_area_dod=np.divide(summary.eroded_volume_observed, area),
+        deposited_volume_per_area_dod=np.divide(summary.deposited_volume_observed, area),
+        eroded_volume_per_area_abs_error=np.divide(
+            summary.eroded_volume_simulated - summary.eroded_volume_observed, area
+        ),
+        deposited_volume_per_area_abs_error=np.divide(
+            summary.deposited_volume_simulated - summary.deposited_volume_observed, area
+        ),
+    )
@@ -0,0 +1,243 @@
+import dataclasses
+import os
+import sqlite3
+import typing
+from typing import Iterable, Optional, Sequence, Type
+
+import pandas as pd
+
+from csv_logging.columnar_logs import load_logs_as_data_frame
+from csv_logging.csvlogger import (
+    BaseLogEntry,
+    CSVLogger,
+    GoodnessOfFitForInitialVelocity,
+    GoodnessOfFitForInitialBottomElevation,
+    GoodnessOfFitForInitialWaterDepth,
+    GoodnessOfFitFor3dEvaluation,
+    ShearStress,
+    ScenarioEvaluationHmid,
+)
+
+_PARAMETER_SEPARATOR = "$"
+_KEY_VALUE_SEPARATOR = "@"
+_SQLITE_TYPE_PER_FIELD_TYPE = {
+    str: "TEXT",
+    float: "REAL",
+    int: "INTEGER",
+    bool: "INTEGER",
+}
+_RUN_COLUMNS = ("scenario_set", "mesh", "flood_scenario")
+_INDEXED_COLUMNS = ("experiment_id", "time_step", "scenario_set", "mesh")
+
+
+def parse_experiment_parameters_from_folder_name(experiment_id: str) -> dict[str, str]:
+    parameters = {}
+    for key_value_pair in experiment_id.split(_PARAMETER_SEPARATOR):
+        key, separator, value = key_value_pair.partition(_KEY_VALUE_SEPARATOR)
+        if separator:
+            parameters[key] = value
+    return parameters
+
+
+def _get_table_name(type_of_log_entry: Type[BaseLogEntry]) -> str:
+    return type_of_log_entry.__name__
+
+
+def _get_field_names(type_of_log_entry: Type[BaseLogEntry]) -> tuple[str, ...]:
+    return tuple(field.name for field in dataclasses.fields(type_of_log_entry))
+
+
+def _create_table_statement(type_of_log_entry: Type[BaseLogEntry]) -> str:
+    type_hints = typing.get_type_hints(type_of_log_entry)
+    columns = [f'"{column}" TEXT NOT NULL' for column in _RUN_COLUMNS] + [
+        f'"{name}" {_SQLITE_TYPE_PER_FIELD_TYPE[type_hints[name]]}' for name in _get_field_names(type_of_log_entry)
+    ]
+    return f'CREATE TABLE IF NOT EXISTS "{_get_table_name(type_of_log_entry)}" ({", ".join(columns)})'
+
+
+class ExperimentCatalog:
+    _DEFAULT_PATH_TO_CATALOG = os.path.join(CSVLogger._LOG_FILE_FOLDER, "catalog.sqlite")
+    _connection: sqlite3.Connection
+    _known_tables: set[str]
+
+    def __init__(self, path_to_catalog: Optional[str] = None):
+        path_to_catalog = self._DEFAULT_PATH_TO_CATALOG if path_to_catalog is None else path_to_catalog
+        folder = os.path.dirname(path_to_catalog)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._connection = sqlite3.connect(path_to_catalog)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS experiment_parameters "
+            "(experiment_id TEXT NOT NULL, name TEXT NOT NULL, value TEXT, PRIMARY KEY (experiment_id, name))"
+        )
+        self._known_tables = set()
+
+    def _create_table_if_needed(self, type_of_log_entry: Type[BaseLogEntry]) -> str:
+        table_name = _get_table_name(type_of_log_entry)
+        if table_name in self._known_tables:
+            return table_name
+        self._connection.execute(_create_table_statement(type_of_log_entry))
+        for column in _INDEXED_COLUMNS:
+            if column in _RUN_COLUMNS or column in _get_field_names(type_of_log_entry):
+                self._connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{table_name}_{column}" ON "{table_name}" ("{column}")'
+                )
+        self._known_tables.add(table_name)
+        return table_name
+
+    def _register_experiments(self, experiment_ids: Iterable[str]) -> None:
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO experiment_parameters (experiment_id, name, value) VALUES (?, ?, ?)",
+            (
+                (experiment_id, name, value)
+                for experiment_id in set(experiment_ids)
+                for name, value in parse_experiment_parameters_from_folder_name(experiment_id).items()
+            ),
+        )
+
+    def ingest_log_entries(
+        self,
+        log_entries: Sequence[BaseLogEntry],
+        type_of_log_entry: Type[BaseLogEntry],
+        scenario_set: str,
+        mesh: str,
+        flood_scenario: str,
+    ) -> None:
+        field_names = _get_field_names(type_of_log_entry)
+        rows = [
+            (scenario_set, mesh, flood_scenario) + tuple(getattr(log_entry, name) for name in field_names)
+            for log_entry in log_entries
+        ]
+        self._ingest_rows(rows, type_of_log_entry, scenario_set, mesh, flood_scenario)
+
+    def ingest_logger(self, logger: CSVLogger, scenario_set: str, mesh: str, flood_scenario: str) -> None:
+        self.ingest_log_entries(
+            logger.get_all_entries(), logger.type_of_message_to_log, scenario_set, mesh, flood_scenario
+        )
+
+    def ingest_csv_log(
+        self,
+        path_to_log: str,
+        type_of_log_entry: Type[BaseLogEntry],
+        scenario_set: str,
+        mesh: str,
+        flood_scenario: str,
+        sep: str = ";",
+    ) -> None:
+        field_names = _get_field_names(type_of_log_entry)
+        logs = load_logs_as_data_frame(path_to_log, type_of_log_entry, columns=field_names, sep=sep)
+        rows = [
+            (scenario_set, mesh, flood_scenario) + tuple(None if pd.isna(value) else value for value in row)
+            for row in logs.itertuples(index=False, name=None)
+        ]
+        self._ingest_rows(rows, type_of_log_entry, scenario_set, mesh, flood_scenario)
+
+    def _ingest_rows(
+        self,
+        rows: list[tuple],
+        type_of_log_entry: Type[BaseLogEntry],
+        scenario_set: str,
+        mesh: str,
+        flood_scenario: str,
+    ) -> None:
+        table_name = self._create_table_if_needed(type_of_log_entry)
+        experiment_ids = {row[len(_RUN_COLUMNS)] for row in rows}
+        with self._connection:
+            self._connection.executemany(
+                f'DELETE FROM "{table_name}" WHERE scenario_set = ? AND mesh = ? AND flood_scenario = ? '
+                f"AND experiment_id = ?",
+                ((scenario_set, mesh, flood_scenario, experiment_id) for experiment_id in experiment_ids),
+            )
+            placeholders = ", ".join("?" * (len(_RUN_COLUMNS) + len(_get_field_names(type_of_log_entry))))
+            self._connection.executemany(f'INSERT INTO "{table_name}" VALUES ({placeholders})', rows)
+            self._register_experiments(experiment_ids)
+
+    def query(
+        self,
+        type_of_log_entry: Type[BaseLogEntry],
+        columns: Optional[Sequence[str]] = None,
+        experiment_ids: Optional[Sequence[str]] = None,
+        time_steps: Optional[Sequence[float]] = None,
+        scenario_set: Optional[str] = None,
+        mesh: Optional[str] = None,
+        flood_scenario: Optional[str] = None,
+        experiment_parameters: Optional[dict[str, str]] = None,
+    ) -> pd.DataFrame:
+        table_name = self._create_table_if_needed(type_of_log_entry)
+        selected_columns = "*" if columns is None else ", ".join(f'"{column}"' for column in columns)
+        conditions = []
+        arguments = []
+        for column, value in (("scenario_set", scenario_set), ("mesh", mesh), ("flood_scenario", flood_scenario)):
+            if value is not None:
+                conditions.append(f'"{column}" = ?')
+                arguments.append(value)
+        for column, values in (("experiment_id", experiment_ids), ("time_step", time_steps)):
+            if values is not None:
+                conditions.append(f'"{column}" IN ({", ".join("?" * len(values))})')
+                arguments.extend(values)
+        for name, value in ({} if experiment_parameters is None else experiment_parameters).items():
+            conditions.append(
+                "experiment_id IN (SELECT experiment_id FROM experiment_parameters WHERE name = ? AND value = ?)"
+            )
+            arguments.extend((name, value))
+        where_clause = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return pd.read_sql_query(
+            f'SELECT {selected_columns} FROM "{table_name}"{where_clause}', self._connection, params=arguments
+        )
+
+    def get_experiment_parameters(self, experiment_ids: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        parameters = pd.read_sql_query("SELECT * FROM experiment_parameters", self._connection)
+        if experiment_ids is not None:
+            parameters = parameters.loc[parameters["experiment_id"].isin(experiment_ids)]
+        return parameters.pivot(index="experiment_id", columns="name", values="value")
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def main():
+    catalog = ExperimentCatalog()
+    mesh = "new_mesh_finer_01"
+    path_to_logs = r"C:\Users\nflue\Documents\Masterarbeit\03_Projects\MasterThesis\BasementEvaluations\.logs"
+    catalog.ingest_csv_log(
+        os.path.join(path_to_logs, "log_three_d_statistics_BeforeOrAfterFloodScenario.af_2020.csv"),
+        GoodnessOfFitFor3dEvaluation,
+        scenario_set="calibration_run_with_finer_mesh",
+        mesh=mesh,
+        flood_scenario="af_2020",
+    )
+    for file_name, type_of_log_entry in (
+        ("log_goodness_of_fit_BeforeOrAfterFloodScenario.bf_2020_velocities.csv", GoodnessOfFitForInitialVelocity),
+        ("log_goodness_of_fit_BeforeOrAfterFloodScenario.bf_2020_water_depths.csv", GoodnessOfFitForInitialWaterDepth),
+        (
+            "log_goodness_of_fit_BeforeOrAfterFloodScenario.bf_2020_bottom_ele.csv",
+            GoodnessOfFitForInitialBottomElevation,
+        ),
+    ):
+        catalog.ingest_csv_log(
+            os.path.join(path_to_logs, file_name),
+            type_of_log_entry,
+            scenario_set="calibration_run_with_finer_mesh",
+            mesh=mesh,
+            flood_scenario="bf_2020",
+        )
+    catalog.ingest_csv_log(
+        r"C:\Users\nflue\Documents\Masterarbeit\03_Projects\MasterThesis\BasementEvaluations\out\HMID\log_hmid_input_01_fine_mesh.csv",
+        ScenarioEvaluationHmid,
+        scenario_set="hydrology_kst35_126000",
+        mesh=mesh,
+        flood_scenario="bf_2020",
+    )
+    catalog.ingest_csv_log(
+        os.path.join(path_to_logs, "log_shear_stress_fine_mesh.csv"),
+        ShearStress,
+        scenario_set="crit_shield_stress",
+        mesh=mesh,
+        flood_scenario="bf_2020",
+    )
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
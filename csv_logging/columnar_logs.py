@@ -0,0 +1,97 @@
+import dataclasses
+import os
+import typing
+from typing import Optional, Sequence, Type
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from csv_logging.csvlogger import BaseLogEntry, CSVLogger
+from tools.atomic_files import write_file_atomically
+
+_ARROW_TYPE_PER_FIELD_TYPE = {
+    str: pa.string(),
+    float: pa.float64(),
+    int: pa.int64(),
+    bool: pa.bool_(),
+}
+_PANDAS_TYPE_PER_FIELD_TYPE = {
+    str: "str",
+    float: "float64",
+    int: "int64",
+    bool: "boolean",
+}
+_PARQUET_EXTENSION = ".parquet"
+
+
+def create_arrow_schema_for_log_entry(type_of_log_entry: Type[BaseLogEntry]) -> pa.Schema:
+    type_hints = typing.get_type_hints(type_of_log_entry)
+    return pa.schema(
+        [
+            pa.field(field.name, _ARROW_TYPE_PER_FIELD_TYPE[type_hints[field.name]])
+            for field in dataclasses.fields(type_of_log_entry)
+        ]
+    )
+
+
+def _create_pandas_dtypes_for_log_entry(type_of_log_entry: Type[BaseLogEntry]) -> dict[str, str]:
+    type_hints = typing.get_type_hints(type_of_log_entry)
+    return {
+        field.name: _PANDAS_TYPE_PER_FIELD_TYPE[type_hints[field.name]]
+        for field in dataclasses.fields(type_of_log_entry)
+    }
+
+
+def replace_extension_with_parquet(file_name: str) -> str:
+    return f"{os.path.splitext(file_name)[0]}{_PARQUET_EXTENSION}"
+
+
+def convert_log_entries_to_arrow_table(
+    log_entries: Sequence[BaseLogEntry], type_of_log_entry: Type[BaseLogEntry]
+) -> pa.Table:
+    schema = create_arrow_schema_for_log_entry(type_of_log_entry)
+    columns = {name: [getattr(log_entry, name) for log_entry in log_entries] for name in schema.names}
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def _write_table_as_parquet_to_file(table: pa.Table, file_name: str, compression: str) -> str:
+    path = os.path.join(CSVLogger._LOG_FILE_FOLDER, replace_extension_with_parquet(file_name))
+    CSVLogger._make_folder_for_logs_if_needed()
+    output_stream = pa.BufferOutputStream()
+    pq.write_table(table, output_stream, compression=compression)
+    write_file_atomically(path, output_stream.getvalue().to_pybytes())
+    return path
+
+
+def write_logs_as_parquet_to_file(logger: CSVLogger, file_name: str, compression: str = "zstd") -> str:
+    table = convert_log_entries_to_arrow_table(logger.get_all_entries(), logger.type_of_message_to_log)
+    return _write_table_as_parquet_to_file(table, file_name, compression)
+
+
+def write_csv_log_as_parquet_to_file(
+    path_to_log: str, type_of_log_entry: Type[BaseLogEntry], compression: str = "zstd", sep: str = ";"
+) -> str:
+    logs = pd.read_csv(path_to_log, sep=sep, dtype=_create_pandas_dtypes_for_log_entry(type_of_log_entry))
+    table = pa.Table.from_pandas(
+        logs, schema=create_arrow_schema_for_log_entry(type_of_log_entry), preserve_index=False
+    )
+    return _write_table_as_parquet_to_file(table, os.path.basename(path_to_log), compression)
+
+
+def load_logs_as_data_frame(
+    path_to_log: str,
+    type_of_log_entry: Optional[Type[BaseLogEntry]] = None,
+    columns: Optional[Sequence[str]] = None,
+    sep: str = ";",
+) -> pd.DataFrame:
+    path_to_parquet = replace_extension_with_parquet(path_to_log)
+    parquet_is_up_to_date = os.path.exists(path_to_parquet) and (
+        path_to_parquet == path_to_log
+        or not os.path.exists(path_to_log)
+        or os.path.getmtime(path_to_parquet) >= os.path.getmtime(path_to_log)
+    )
+    if parquet_is_up_to_date:
+        return pq.read_table(path_to_parquet, columns=None if columns is None else list(columns)).to_pandas()
+    dtypes = None if type_of_log_entry is None else _create_pandas_dtypes_for_log_entry(type_of_log_entry)
+    return pd.read_csv(path_to_log, sep=sep, usecols=None if columns is None else list(columns), dtype=dtypes)
@@ -1,9 +1,12 @@
+import glob
 import os.path
 import time
 from abc import ABC
 from collections import deque
 from dataclasses import dataclass
-from typing import Deque, Type
+from typing import Deque, Optional, TextIO, Type
+
+from tools.atomic_files import write_file_atomically
 
 
 @dataclass(frozen=True)
@@ -11,41 +14,110 @@ class BaseLogEntry(ABC):
     experiment_id: str
 
 
+_SEPARATOR = ";"
+_SHARD_MARKER = ".shard-"
+
+
+def create_shard_file_name(file_name: str, worker_id: str) -> str:
+    stem, extension = os.path.splitext(file_name)
+    return f"{stem}{_SHARD_MARKER}{worker_id}{extension}"
+
+
 @dataclass(init=False)
 class CSVLogger:
     _LOG_FILE_FOLDER = r".\.logs"
     _type_of_message_to_log: Type[BaseLogEntry]
     _start_time: float
     _logs: Deque[BaseLogEntry]
+    _stream_to_file_name: Optional[str]
+    _worker_id: Optional[str]
+    _stream: Optional[TextIO]
+    _flush_every_n_entries: int
+    _entries_since_last_flush: int
 
-    def __init__(self, type_of_message_to_log: Type[BaseLogEntry]):
+    def __init__(
+        self,
+        type_of_message_to_log: Type[BaseLogEntry],
+        stream_to_file_name: Optional[str] = None,
+        flush_every_n_entries: int = 1,
+        worker_id: Optional[str] = None,
+    ):
+        if flush_every_n_entries < 1:
+            raise ValueError(f"{flush_every_n_entries=} has to be at least 1")
         self._type_of_message_to_log = type_of_message_to_log
         self._start_time = time.time()
         self._logs = deque([])
+        self._stream_to_file_name = stream_to_file_name
+        self._worker_id = worker_id
+        self._stream = None
+        self._flush_every_n_entries = flush_every_n_entries
+        self._entries_since_last_flush = 0
 
     def add_entry_to_log(self, log_entry: BaseLogEntry) -> None:
         if not type(log_entry) is self._type_of_message_to_log:
             raise AssertionError(f"{log_entry} is not of same type as {self._type_of_message_to_log}")
         self._logs.append(log_entry)
+        if self._stream_to_file_name is not None:
+            self.__append_to_stream(log_entry)
+
+    @property
+    def type_of_message_to_log(self) -> Type[BaseLogEntry]:
+        return self._type_of_message_to_log
+
+    def get_all_entries(self) -> tuple[BaseLogEntry, ...]:
+        return tuple(self._logs)
+
+    def get_entries_of_experiment(self, experiment_id: str) -> tuple[BaseLogEntry, ...]:
+        return tuple(log for log in self._logs if log.experiment_id == experiment_id)
+
+    def _get_path_of_stream(self) -> str:
+        file_name = (
+            self._stream_to_file_name
+            if self._worker_id is None
+            else create_shard_file_name(self._stream_to_file_name, self._worker_id)
+        )
+        return os.path.join(self._LOG_FILE_FOLDER, file_name)
 
     def write_logs_as_csv_to_file(self, file_name: str) -> str:
+        if file_name == self._stream_to_file_name:
+            self.flush()
+            return self._get_path_of_stream()
         path = os.path.join(self._LOG_FILE_FOLDER, file_name)
-        sep = ";"
         self._make_folder_for_logs_if_needed()
-        with open(path, "w") as file_to_write_to:
-            self.__create_csv_header(file_to_write_to, sep)
-            self.__add_rows(file_to_write_to, sep)
+        rows = (self.__create_row(log, _SEPARATOR) for log in self._logs)
+        write_file_atomically(path, (self.__create_csv_header(_SEPARATOR) + "".join(rows)).encode())
         return path
 
-    def __add_rows(self, file_to_write_to, sep):
-        file_to_write_to.writelines(
-            f"{sep.join(str(value) for value in log.__dict__.values())}\n" for log in self._logs
-        )
+    def flush(self) -> None:
+        if self._stream is None:
+            return
+        self._stream.flush()
+        os.fsync(self._stream.fileno())
+        self._entries_since_last_flush = 0
 
-    def __create_csv_header(self, file_to_write_to, sep):
-        file_to_write_to.write(
-            f"{sep.join((key for key in self._type_of_message_to_log.__dict__['__dataclass_fields__'].keys()))}\n"
-        )
+    def close(self) -> None:
+        if self._stream is None:
+            return
+        self.flush()
+        self._stream.close()
+        self._stream = None
+
+    def __append_to_stream(self, log_entry: BaseLogEntry) -> None:
+        if self._stream is None:
+            self._make_folder_for_logs_if_needed()
+            self._stream = open(self._get_path_of_stream(), "w")
+            self._stream.write(self.__create_csv_header(_SEPARATOR))
+        self._stream.write(self.__create_row(log_entry, _SEPARATOR))
+        self._entries_since_last_flush += 1
+        if self._entries_since_last_flush >= self._flush_every_n_entries:
+            self.flush()
+
+    @staticmethod
+    def __create_row(log: BaseLogEntry, sep: str) -> str:
+        return f"{sep.join(str(value) for value in log.__dict__.values())}\n"
+
+    def __create_csv_header(self, sep: str) -> str:
+        return f"{sep.join((key for key in self._type_of_message_to_log.__dict__['__dataclass_fields__'].keys()))}\n"
 
     @classmethod
     def _make_folder_for_logs_if_needed(cls):
@@ -53,6 +125,30 @@ class CSVLogger:
             os.mkdir(cls._LOG_FILE_FOLDER)
 
 
+def merge_csv_log_shards(file_name: str, remove_shards: bool = True, drop_duplicate_rows: bool = False) -> str:
+    stem, extension = os.path.splitext(file_name)
+    paths_to_shards = sorted(glob.glob(os.path.join(CSVLogger._LOG_FILE_FOLDER, f"{stem}{_SHARD_MARKER}*{extension}")))
+    if not paths_to_shards:
+        raise FileNotFoundError(f"no shards of {file_name} found in {CSVLogger._LOG_FILE_FOLDER}")
+    header = None
+    rows = []
+    for path_to_shard in paths_to_shards:
+        with open(path_to_shard, "r") as shard:
+            header_of_shard = shard.readline()
+            if header is not None and header_of_shard != header:
+                raise AssertionError(f"header of {path_to_shard} differs from the header of {paths_to_shards[0]}")
+            header = header_of_shard
+            rows.extend(row for row in shard if row.endswith("\n"))
+    if drop_duplicate_rows:
+        rows = list(dict.fromkeys(rows))
+    path = os.path.join(CSVLogger._LOG_FILE_FOLDER, file_name)
+    write_file_atomically(path, (header + "".join(rows)).encode())
+    if remove_shards:
+        for path_to_shard in paths_to_shards:
+            os.remove(path_to_shard)
+    return path
+
+
 @dataclass(frozen=True)
 class GoodnessOfFitForInitialVelocity(BaseLogEntry):
     v_obs_mean: float
@@ -132,6 +228,11 @@ class GoodnessOfFitFor3dEvaluation(BaseLogEntry):
     deposited_volume_per_area_abs_error: float
 
 
+@dataclass(frozen=True)
+class GoodnessOfFitFor3dEvaluationOnGrid(GoodnessOfFitFor3dEvaluation):
+    pass
+
+
 @dataclass(frozen=True)
 class ShearStress(BaseLogEntry):
     time_step: float
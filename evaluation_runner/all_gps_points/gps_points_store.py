@@ -0,0 +1,86 @@
+import io
+import os
+from typing import Iterable, Optional, Sequence
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from tools.atomic_files import write_file_atomically
+from tools.geo_export import create_geometry_fingerprint
+
+_POINT_ID_COLUMN = "point_id"
+_EXPERIMENT_ID_COLUMN = "experiment_id"
+_POINTS_FILE_NAME = "points.parquet"
+_VALUES_FOLDER_NAME = "values"
+_FINGERPRINT_METADATA_KEY = b"fingerprint"
+
+
+def _get_path_to_points(path_to_store: str) -> str:
+    return os.path.join(path_to_store, _POINTS_FILE_NAME)
+
+
+def _get_path_to_values(path_to_store: str) -> str:
+    return os.path.join(path_to_store, _VALUES_FOLDER_NAME)
+
+
+def create_path_to_gps_points_store(flood_scenario_name: str) -> str:
+    return os.path.join("out", "gps_points_calibration", flood_scenario_name)
+
+
+def write_gps_points_once(points: gpd.GeoDataFrame, path_to_store: str) -> str:
+    path = _get_path_to_points(path_to_store)
+    fingerprint = create_geometry_fingerprint(points)
+    if os.path.exists(path):
+        stored_fingerprint = pq.read_schema(path).metadata.get(_FINGERPRINT_METADATA_KEY, b"").decode()
+        if stored_fingerprint != fingerprint:
+            raise ValueError(f"{path} holds different gps points, use a separate store for these points")
+        return path
+    if not os.path.exists(path_to_store):
+        os.makedirs(path_to_store, exist_ok=True)
+    points_buffer = io.BytesIO()
+    points.rename_axis(_POINT_ID_COLUMN).reset_index().to_parquet(points_buffer, index=False)
+    table = pq.read_table(pa.BufferReader(points_buffer.getvalue()))
+    table = table.replace_schema_metadata({**table.schema.metadata, _FINGERPRINT_METADATA_KEY: fingerprint.encode()})
+    output_stream = pa.BufferOutputStream()
+    pq.write_table(table, output_stream)
+    write_file_atomically(path, output_stream.getvalue().to_pybytes())
+    return path
+
+
+def write_sampled_gps_values(
+    sampled_points: gpd.GeoDataFrame, columns_of_points: Iterable[str], experiment_id: str, path_to_store: str
+) -> str:
+    path_to_values = _get_path_to_values(path_to_store)
+    if not os.path.exists(path_to_values):
+        os.makedirs(path_to_values)
+    columns_of_points = set(columns_of_points)
+    value_columns = [column for column in sampled_points.columns if column not in columns_of_points]
+    values = pd.DataFrame(sampled_points[value_columns]).rename_axis(_POINT_ID_COLUMN).reset_index()
+    values.insert(0, _EXPERIMENT_ID_COLUMN, experiment_id)
+    path = os.path.join(path_to_values, f"{experiment_id}.parquet")
+    temporary_path = os.path.join(path_to_values, f".{experiment_id}.parquet.tmp")
+    pq.write_table(pa.Table.from_pandas(values, preserve_index=False), temporary_path, compression="zstd")
+    os.replace(temporary_path, path)
+    return path
+
+
+def load_sampled_gps_values(
+    path_to_store: str,
+    columns: Optional[Sequence[str]] = None,
+    experiment_ids: Optional[Sequence[str]] = None,
+    columns_of_points: Optional[Sequence[str]] = None,
+) -> gpd.GeoDataFrame:
+    values_dataset = ds.dataset(_get_path_to_values(path_to_store), format="parquet")
+    selected_columns = None if columns is None else [_EXPERIMENT_ID_COLUMN, _POINT_ID_COLUMN, *columns]
+    row_filter = None if experiment_ids is None else ds.field(_EXPERIMENT_ID_COLUMN).isin(list(experiment_ids))
+    values = values_dataset.to_table(columns=selected_columns, filter=row_filter).to_pandas()
+    points = gpd.read_parquet(
+        _get_path_to_points(path_to_store),
+        columns=None if columns_of_points is None else [_POINT_ID_COLUMN, *columns_of_points, "geometry"],
+    )
+    return gpd.GeoDataFrame(
+        values.merge(pd.DataFrame(points), on=_POINT_ID_COLUMN, how="left"), geometry="geometry", crs=points.crs
+    )
@@ -1,13 +1,14 @@
 import os
-import pathlib
-import pickle
 
-import geopandas as gpd
 import numpy as np
 import pandas as pd
 from plotly import graph_objects as go
 
+from csv_logging.columnar_logs import load_logs_as_data_frame
+from csv_logging.csvlogger import GoodnessOfFitFor3dEvaluation
+from evaluation_runner.all_gps_points.gps_points_store import create_path_to_gps_points_store, load_sampled_gps_values
 from misc.dataclasses_for_evaluations import ColumnNamePair
+from profile_creation.containers import BeforeOrAfterFloodScenario
 
 
 def calculate_index_of_agreement_for_volumes(simulated_deposited, observed_deposited, area):
@@ -148,22 +149,16 @@ def calculate_goodness_of_fit_parameters_for_three_dimensional(three_dimensional
 
 def main():
     path_to_csv_3d_results = r"C:\Users\nflue\Documents\Masterarbeit\03_Projects\MasterThesis\BasementEvaluations\.logs\log_three_d_statistics_BeforeOrAfterFloodScenario.af_2020.csv"
-    three_dimensional_results = pd.read_csv(path_to_csv_3d_results, sep=";")
+    three_dimensional_results = load_logs_as_data_frame(path_to_csv_3d_results, GoodnessOfFitFor3dEvaluation)
 
     create_boxplot(three_dimensional_results)
 
     # calculate goodness of fit parameters for volumes:
     calculate_goodness_of_fit_parameters_for_three_dimensional(three_dimensional_results)
 
-    all_dataframes = []
-    directory = "out\\gps_points_calibration"
-    for filepath in pathlib.Path(directory).glob("**/*"):
-        with open(filepath, "rb") as pickled:
-            gps_points: gpd.GeoDataFrame = pickle.load(pickled)
-            gps_points["filename"] = filepath.name
-            all_dataframes.append(gps_points)
-
-    # combined = pd.concat(all_dataframes, axis=0).reset_index(drop=True)
+    combined = load_sampled_gps_values(
+        create_path_to_gps_points_store(BeforeOrAfterFloodScenario.bf_2020.value), columns=["wd_sim_gps"]
+    ).rename(columns={"experiment_id": "filename"})
 
     # create_boxplot_for_gps_points(combined)
 
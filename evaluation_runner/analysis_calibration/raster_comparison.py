@@ -0,0 +1,236 @@
+import hashlib
+import io
+import os
+from typing import NamedTuple, Optional, Sequence
+
+import geopandas as gpd
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio import features
+from rasterio.io import MemoryFile
+
+from tools.atomic_files import write_file_atomically
+from tools.geo_export import create_geometry_fingerprint
+from tools.reference_layers import ReferenceLayerRegistry, load_vector_layer
+
+_NO_CELL = -1
+_PATH_TO_CACHE_FOLDER = os.path.join(r".\.checkpoints", "raster_mapping")
+EROSION = -1
+STABLE = 0
+DEPOSITION = 1
+NO_DATA = 2
+
+
+class RasterGrid(NamedTuple):
+    transform: Affine
+    width: int
+    height: int
+    crs: Optional[str]
+
+    @property
+    def pixel_area(self) -> float:
+        return abs(self.transform.determinant)
+
+
+class RasterValues(NamedTuple):
+    grid: RasterGrid
+    values: np.ndarray
+
+
+class CellToPixelMapping(NamedTuple):
+    grid: RasterGrid
+    cell_index_per_pixel: np.ndarray
+
+
+class ElevationChangeComparison(NamedTuple):
+    grid: RasterGrid
+    simulated_delta_z: np.ndarray
+    observed_delta_z: np.ndarray
+
+
+class ElevationChangeSummary(NamedTuple):
+    area: float
+    eroded_area_observed: float
+    deposited_area_observed: float
+    eroded_area_simulated: float
+    deposited_area_simulated: float
+    identical_area: float
+    eroded_volume_observed: float
+    deposited_volume_observed: float
+    eroded_volume_simulated: float
+    deposited_volume_simulated: float
+
+
+class DodComparisonGrid(NamedTuple):
+    dod: RasterValues
+    mapping: CellToPixelMapping
+    polygon_masks: dict[str, np.ndarray]
+
+
+def load_raster(path: str, band: int = 1) -> RasterValues:
+    with rasterio.open(path) as raster:
+        values = raster.read(band, masked=True).astype(np.float64).filled(np.nan)
+        grid = RasterGrid(
+            transform=raster.transform,
+            width=raster.width,
+            height=raster.height,
+            crs=None if raster.crs is None else raster.crs.to_string(),
+        )
+    return RasterValues(grid=grid, values=values)
+
+
+def write_raster(values: np.ndarray, grid: RasterGrid, path: str) -> str:
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    with MemoryFile() as memory_file:
+        with memory_file.open(
+            driver="GTiff",
+            width=grid.width,
+            height=grid.height,
+            count=1,
+            dtype="float32",
+            crs=grid.crs,
+            transform=grid.transform,
+            nodata=np.nan,
+            compress="deflate",
+        ) as raster:
+            raster.write(values.astype(np.float32), 1)
+        write_file_atomically(path, memory_file.read())
+    return path
+
+
+def _create_grid_digest(grid: RasterGrid) -> str:
+    return hashlib.sha1(repr((tuple(grid.transform)[:6], grid.width, grid.height)).encode()).hexdigest()[:16]
+
+
+def create_cell_to_pixel_mapping(mesh: gpd.GeoDataFrame, grid: RasterGrid) -> CellToPixelMapping:
+    cell_index_per_pixel = features.rasterize(
+        zip(mesh.geometry.values, range(len(mesh))),
+        out_shape=(grid.height, grid.width),
+        transform=grid.transform,
+        fill=_NO_CELL,
+        dtype="int32",
+    )
+    return CellToPixelMapping(grid=grid, cell_index_per_pixel=cell_index_per_pixel)
+
+
+def load_or_create_cell_to_pixel_mapping(
+    mesh: gpd.GeoDataFrame,
+    grid: RasterGrid,
+    path_to_cache_folder: Optional[str] = None,
+    mesh_fingerprint: Optional[str] = None,
+) -> CellToPixelMapping:
+    path_to_cache_folder = _PATH_TO_CACHE_FOLDER if path_to_cache_folder is None else path_to_cache_folder
+    mesh_fingerprint = create_geometry_fingerprint(mesh) if mesh_fingerprint is None else mesh_fingerprint
+    path = os.path.join(path_to_cache_folder, f"cells_{mesh_fingerprint}_{_create_grid_digest(grid)}.npy")
+    if os.path.exists(path):
+        return CellToPixelMapping(grid=grid, cell_index_per_pixel=np.load(path))
+    mapping = create_cell_to_pixel_mapping(mesh, grid)
+    if not os.path.exists(path_to_cache_folder):
+        os.makedirs(path_to_cache_folder)
+    content = io.BytesIO()
+    np.save(content, mapping.cell_index_per_pixel)
+    write_file_atomically(path, content.getvalue())
+    return mapping
+
+
+def burn_cell_values_into_grid(mapping: CellToPixelMapping, values_per_cell: np.ndarray) -> np.ndarray:
+    values_per_cell = np.asarray(values_per_cell, dtype=np.float64)
+    burnt = values_per_cell[np.maximum(mapping.cell_index_per_pixel, 0)]
+    burnt[mapping.cell_index_per_pixel == _NO_CELL] = np.nan
+    return burnt
+
+
+def create_polygon_mask(polygons: gpd.GeoDataFrame, grid: RasterGrid) -> np.ndarray:
+    return features.geometry_mask(
+        polygons.geometry.values, out_shape=(grid.height, grid.width), transform=grid.transform, invert=True
+    )
+
+
+def classify_elevation_change(delta_z: np.ndarray, threshold: float = 0.15) -> np.ndarray:
+    classes = np.full(delta_z.shape, NO_DATA, dtype=np.int8)
+    with np.errstate(invalid="ignore"):
+        classes[(delta_z >= -threshold) & (delta_z <= threshold)] = STABLE
+        classes[delta_z > threshold] = DEPOSITION
+        classes[delta_z < -threshold] = EROSION
+    return classes
+
+
+def compare_elevation_change_on_grid(
+    mapping: CellToPixelMapping, simulated_delta_z_per_cell: np.ndarray, dod: RasterValues
+) -> ElevationChangeComparison:
+    if mapping.grid != dod.grid:
+        raise ValueError("the cell to pixel mapping was created for a different grid than the one of the DoD")
+    return ElevationChangeComparison(
+        grid=dod.grid,
+        simulated_delta_z=burn_cell_values_into_grid(mapping, simulated_delta_z_per_cell),
+        observed_delta_z=dod.values,
+    )
+
+
+def calculate_pixel_wise_error(comparison: ElevationChangeComparison) -> np.ndarray:
+    return comparison.simulated_delta_z - comparison.observed_delta_z
+
+
+def summarise_elevation_change_on_grid(
+    comparison: ElevationChangeComparison, mask: Optional[np.ndarray] = None, threshold: float = 0.15
+) -> ElevationChangeSummary:
+    is_compared = ~np.isnan(comparison.simulated_delta_z) & ~np.isnan(comparison.observed_delta_z)
+    if mask is not None:
+        is_compared &= mask
+    simulated = comparison.simulated_delta_z[is_compared]
+    observed = comparison.observed_delta_z[is_compared]
+    simulated_classes = classify_elevation_change(simulated, threshold)
+    observed_classes = classify_elevation_change(observed, threshold)
+    pixel_area = comparison.grid.pixel_area
+    return ElevationChangeSummary(
+        area=float(np.count_nonzero(is_compared) * pixel_area),
+        eroded_area_observed=float(np.count_nonzero(observed_classes == EROSION) * pixel_area),
+        deposited_area_observed=float(np.count_nonzero(observed_classes == DEPOSITION) * pixel_area),
+        eroded_area_simulated=float(np.count_nonzero(simulated_classes == EROSION) * pixel_area),
+        deposited_area_simulated=float(np.count_nonzero(simulated_classes == DEPOSITION) * pixel_area),
+        identical_area=float(np.count_nonzero(simulated_classes == observed_classes) * pixel_area),
+        eroded_volume_observed=float(np.sum(observed[observed_classes == EROSION]) * pixel_area),
+        deposited_volume_observed=float(np.sum(observed[observed_classes == DEPOSITION]) * pixel_area),
+        eroded_volume_simulated=float(np.sum(simulated[simulated_classes == EROSION]) * pixel_area),
+        deposited_volume_simulated=float(np.sum(simulated[simulated_classes == DEPOSITION]) * pixel_area),
+    )
+
+
+def calculate_pixel_wise_error_statistics(
+    simulated: np.ndarray, observed: np.ndarray, mask: Optional[np.ndarray] = None
+) -> dict[str, float]:
+    error = simulated - observed
+    is_compared = ~np.isnan(error)
+    if mask is not None:
+        is_compared &= mask
+    error = error[is_compared]
+    if error.size == 0:
+        return {"mean_error": np.nan, "mean_absolute_error": np.nan, "root_mean_square_error": np.nan}
+    return {
+        "mean_error": float(np.mean(error)),
+        "mean_absolute_error": float(np.mean(np.abs(error))),
+        "root_mean_square_error": float(np.sqrt(np.mean(np.square(error)))),
+    }
+
+
+def create_dod_comparison_grid(
+    path_to_dod_raster: str,
+    mesh: gpd.GeoDataFrame,
+    paths_to_polygon_as_area_of_interest: Sequence[str],
+    reference_layers: Optional[ReferenceLayerRegistry] = None,
+    mesh_fingerprint: Optional[str] = None,
+) -> DodComparisonGrid:
+    dod = load_raster(path_to_dod_raster)
+    return DodComparisonGrid(
+        dod=dod,
+        mapping=load_or_create_cell_to_pixel_mapping(mesh, dod.grid, mesh_fingerprint=mesh_fingerprint),
+        polygon_masks={
+            os.path.split(polygon_path)[-1].split(".")[0]: create_polygon_mask(
+                load_vector_layer(polygon_path, reference_layers), dod.grid
+            )
+            for polygon_path in paths_to_polygon_as_area_of_interest
+        },
+    )
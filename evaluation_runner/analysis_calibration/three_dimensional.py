@@ -1,16 +1,24 @@
+from typing import Optional
+
 import geopandas as gpd
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+from tools.reference_layers import ReferenceLayerRegistry
 from utils.loading import load_data_with_crs_2056
 
 
 def create_union_of_dod_and_simulated_dz_mesh(
     path_to_dod_as_polygon: str,
     mesh_with_all_results: gpd.GeoDataFrame,
+    reference_layers: Optional[ReferenceLayerRegistry] = None,
 ) -> gpd.GeoDataFrame:
-    dod_as_polygon = load_data_with_crs_2056(path_to_dod_as_polygon)
+    dod_as_polygon = (
+        load_data_with_crs_2056(path_to_dod_as_polygon)
+        if reference_layers is None
+        else reference_layers.get_vector_layer(path_to_dod_as_polygon).copy()
+    )
 
     mesh_with_all_results["dz_sim"] = None
     mesh_with_all_results.loc[mesh_with_all_results["delta_z"] > 0.15, "dz_sim"] = "deposition"
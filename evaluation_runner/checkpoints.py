@@ -0,0 +1,101 @@
+import os
+import pickle
+import shutil
+from dataclasses import dataclass, replace
+from typing import Collection, Iterable, Optional
+
+from csv_logging.csvlogger import BaseLogEntry, CSVLogger
+from tools.atomic_files import write_file_atomically
+from tools.output_sink import OutputSink
+
+
+@dataclass(frozen=True)
+class ExperimentCheckpoint:
+    experiment_id: str
+    completed_stages: tuple[str, ...] = ()
+    log_entries: tuple[BaseLogEntry, ...] = ()
+    is_complete: bool = False
+
+
+@dataclass(init=False)
+class CheckpointStore:
+    _CHECKPOINT_FOLDER = r".\.checkpoints"
+    _folder: str
+    _checkpoints: dict[str, ExperimentCheckpoint]
+    _output_sink: Optional[OutputSink]
+
+    def __init__(
+        self,
+        run_name: str,
+        resume: bool,
+        output_sink: Optional[OutputSink] = None,
+        stages: Collection[str] = (),
+        reset: bool = False,
+    ):
+        self._folder = os.path.join(self._CHECKPOINT_FOLDER, run_name, _create_stage_key(stages))
+        self._output_sink = output_sink
+        if reset and os.path.exists(self._folder):
+            shutil.rmtree(self._folder)
+        os.makedirs(self._folder, exist_ok=True)
+        self._checkpoints = {}
+        if not resume:
+            return
+        for file_name in sorted(os.listdir(self._folder)):
+            if file_name.endswith(".pkl"):
+                with open(os.path.join(self._folder, file_name), "rb") as checkpoint_file:
+                    checkpoint: ExperimentCheckpoint = pickle.load(checkpoint_file)
+                self._checkpoints[checkpoint.experiment_id] = checkpoint
+
+    def _get_checkpoint(self, experiment_id: str) -> ExperimentCheckpoint:
+        return self._checkpoints.get(experiment_id, ExperimentCheckpoint(experiment_id=experiment_id))
+
+    def _write_checkpoint(self, checkpoint: ExperimentCheckpoint) -> None:
+        path = os.path.join(self._folder, f"{checkpoint.experiment_id}.pkl")
+        if self._output_sink is None:
+            write_file_atomically(path, pickle.dumps(checkpoint))
+        else:
+            self._output_sink.submit(
+                path, write_file_atomically, path, pickle.dumps(checkpoint), wait_for_earlier_writes=True
+            )
+        self._checkpoints[checkpoint.experiment_id] = checkpoint
+
+    def is_experiment_completed(self, experiment_id: str) -> bool:
+        return self._get_checkpoint(experiment_id).is_complete
+
+    def is_stage_completed(self, experiment_id: str, stage_name: str) -> bool:
+        return stage_name in self._get_checkpoint(experiment_id).completed_stages
+
+    def record_completed_stage(self, experiment_id: str, stage_name: str, loggers: Iterable[CSVLogger]) -> None:
+        checkpoint = self._get_checkpoint(experiment_id)
+        self._write_checkpoint(
+            replace(
+                checkpoint,
+                completed_stages=checkpoint.completed_stages + (stage_name,),
+                log_entries=_collect_log_entries_of_experiment(experiment_id, loggers),
+            )
+        )
+
+    def mark_experiment_as_completed(self, experiment_id: str, loggers: Iterable[CSVLogger]) -> None:
+        checkpoint = self._get_checkpoint(experiment_id)
+        self._write_checkpoint(
+            replace(
+                checkpoint,
+                log_entries=_collect_log_entries_of_experiment(experiment_id, loggers),
+                is_complete=True,
+            )
+        )
+
+    def restore_log_entries(self, experiment_id: str, loggers: Iterable[CSVLogger]) -> None:
+        logger_per_type = {logger.type_of_message_to_log: logger for logger in loggers}
+        for log_entry in self._get_checkpoint(experiment_id).log_entries:
+            logger: Optional[CSVLogger] = logger_per_type.get(type(log_entry))
+            if logger is not None:
+                logger.add_entry_to_log(log_entry)
+
+
+def _create_stage_key(stages: Collection[str]) -> str:
+    return "+".join(sorted(set(stages))) or "no_stages"
+
+
+def _collect_log_entries_of_experiment(experiment_id: str, loggers: Iterable[CSVLogger]) -> tuple[BaseLogEntry, ...]:
+    return tuple(log_entry for logger in loggers for log_entry in logger.get_entries_of_experiment(experiment_id))
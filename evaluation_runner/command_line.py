@@ -0,0 +1,225 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+from typing import Optional, Sequence
+
+from all_paths import PathsToJsonWithExperimentPath
+
+STAGES = ("de_watering", "individual_evaluations", "cross_sections", "points", "profiles", "polygons")
+DEFAULT_STAGES = ("points",)
+RESULT_MESH_FORMATS = ("parquet", "gpkg")
+_PATH_TO_FOLDER_WITH_POLYGONS = (
+    "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af"
+)
+
+
+@dataclass(frozen=True)
+class EvaluationConfiguration:
+    scenario_set: str = "calibration_experiments_with_different_sediment_depths_mesh2"
+    flood_scenario: str = "bf_2020"
+    stages: tuple[str, ...] = DEFAULT_STAGES
+    path_to_mesh: str = (
+        r"C:\Users\nflue\Documents\Masterarbeit\02_Data\04_Model_220620\04_Model\01_input_data\BF2020_Mesh\new_mesh_finer_01\Project1_computational-mesh.2dm"
+    )
+    path_to_gps_points: Optional[str] = None
+    paths_to_polygon_as_area_of_interest: tuple[str, ...] = tuple(
+        f"{_PATH_TO_FOLDER_WITH_POLYGONS}\\{number}.shp" for number in range(1, 23)
+    )
+    path_to_dod_as_polygon: str = (
+        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\03_Bathymetry\\DoDs\\dod_v2\\dod_as_polygon.shp"
+    )
+    path_to_dod_raster: Optional[str] = None
+    path_to_folder_containing_points_with_lines: str = (
+        "C:\\Users\\nflue\\Documents\\Masterarbeit\\03_Projects\\MasterThesis\\BasementPreparation\\river_profiles_from_bathymetry"
+    )
+    simulation_time_in_seconds: int = 90000
+    sample_time_step_width: int = 300
+    memory_budget_in_bytes: Optional[int] = None
+    spill_directory: Optional[str] = None
+    resume: bool = False
+    reset_checkpoints: bool = False
+    work_queue: Optional[str] = None
+    worker_id: Optional[str] = None
+    number_of_evaluation_workers: int = 1
+    number_of_render_workers: Optional[int] = None
+    prefetch_depth: int = 1
+    result_mesh_format: str = "parquet"
+    write_parquet_logs: bool = True
+    update_catalog: bool = True
+    create_figures: bool = True
+    validate_experiments: bool = True
+    render_figures_in_background: bool = True
+    write_outputs_in_background: bool = True
+
+
+def resolve_scenario_set(scenario_set: str) -> str:
+    return getattr(PathsToJsonWithExperimentPath, scenario_set, scenario_set)
+
+
+def create_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="evaluate a set of BASEMENT experiments, options not given are taken from --config or the defaults"
+    )
+    parser.add_argument("--config", help="json file with any of the options below, using underscores in the keys")
+    parser.add_argument(
+        "--scenario-set",
+        help="name of a scenario set in PathsToJsonWithExperimentPath or a path to a paths_to_experiments.json",
+    )
+    parser.add_argument("--flood-scenario", help="bf_2020 or af_2020")
+    parser.add_argument("--stages", nargs="+", choices=STAGES)
+    parser.add_argument("--path-to-mesh")
+    parser.add_argument("--path-to-gps-points", help="defaults to the gps points of the flood scenario")
+    parser.add_argument("--paths-to-polygon-as-area-of-interest", nargs="+")
+    parser.add_argument("--path-to-dod-as-polygon")
+    parser.add_argument("--path-to-dod-raster")
+    parser.add_argument("--path-to-folder-containing-points-with-lines")
+    parser.add_argument("--simulation-time-in-seconds", type=int)
+    parser.add_argument("--sample-time-step-width", type=int)
+    parser.add_argument("--memory-budget-in-bytes", type=int)
+    parser.add_argument("--spill-directory")
+    parser.add_argument(
+        "--resume",
+        action=argparse.BooleanOptionalAction,
+        help="continue from the first experiment that was not completely evaluated in the previous run",
+    )
+    parser.add_argument(
+        "--reset-checkpoints",
+        action=argparse.BooleanOptionalAction,
+        help="delete the checkpoints of this scenario set and stages first, only while no other node works on them",
+    )
+    parser.add_argument(
+        "--work-queue",
+        help="folder on a shared drive through which several nodes split the experiments among each other",
+    )
+    parser.add_argument("--worker-id")
+    parser.add_argument(
+        "--number-of-evaluation-workers",
+        type=int,
+        help="evaluation processes started on this node, they split the experiments through --work-queue",
+    )
+    parser.add_argument("--number-of-render-workers", type=int)
+    parser.add_argument("--prefetch-depth", type=int)
+    parser.add_argument("--result-mesh-format", choices=RESULT_MESH_FORMATS)
+    parser.add_argument("--write-parquet-logs", action=argparse.BooleanOptionalAction)
+    parser.add_argument("--update-catalog", action=argparse.BooleanOptionalAction)
+    parser.add_argument("--create-figures", action=argparse.BooleanOptionalAction)
+    parser.add_argument(
+        "--validate-experiments",
+        action=argparse.BooleanOptionalAction,
+        help="skip truncated or unfinished runs listed in the manifest next to the scenario set json",
+    )
+    parser.add_argument("--render-figures-in-background", action=argparse.BooleanOptionalAction)
+    parser.add_argument("--write-outputs-in-background", action=argparse.BooleanOptionalAction)
+    return parser
+
+
+def load_configuration(arguments: Optional[Sequence[str]] = None) -> EvaluationConfiguration:
+    parsed_arguments = vars(create_argument_parser().parse_args(arguments))
+    path_to_config = parsed_arguments.pop("config")
+    values = {}
+    if path_to_config is not None:
+        with open(path_to_config, "r") as config_file:
+            values.update(json.load(config_file))
+    values.update({name: value for name, value in parsed_arguments.items() if value is not None})
+    unknown_options = set(values).difference(field.name for field in fields(EvaluationConfiguration))
+    if unknown_options:
+        raise ValueError(f"unknown options {sorted(unknown_options)} in {path_to_config}")
+    for name in ("stages", "paths_to_polygon_as_area_of_interest"):
+        if name in values:
+            values[name] = tuple(values[name])
+    configuration = EvaluationConfiguration(**values)
+    if not set(configuration.stages).issubset(STAGES):
+        raise ValueError(f"{configuration.stages=} contains stages other than {STAGES}")
+    if configuration.result_mesh_format not in RESULT_MESH_FORMATS:
+        raise ValueError(f"{configuration.result_mesh_format=} is none of {RESULT_MESH_FORMATS}")
+    if configuration.number_of_evaluation_workers > 1 and configuration.work_queue is None:
+        raise ValueError(f"{configuration.number_of_evaluation_workers=} needs a --work-queue to split the experiments")
+    if configuration.number_of_evaluation_workers > 1 and configuration.reset_checkpoints:
+        raise ValueError("--reset-checkpoints cannot be combined with several evaluation workers")
+    return configuration
+
+
+def create_worker_configuration(configuration: EvaluationConfiguration, index: int) -> EvaluationConfiguration:
+    return replace(
+        configuration,
+        number_of_evaluation_workers=1,
+        worker_id=None if configuration.worker_id is None else f"{configuration.worker_id}-{index}",
+    )
+
+
+def run_evaluation_workers(configuration: EvaluationConfiguration) -> None:
+    with ProcessPoolExecutor(max_workers=configuration.number_of_evaluation_workers) as executor:
+        futures = [
+            executor.submit(run_evaluation, create_worker_configuration(configuration, index))
+            for index in range(configuration.number_of_evaluation_workers)
+        ]
+        for future in futures:
+            future.result()
+
+
+def run_evaluation(configuration: EvaluationConfiguration) -> None:
+    if configuration.number_of_evaluation_workers > 1:
+        run_evaluation_workers(configuration)
+        return
+    # imported here so that parsing the arguments stays fast and invalid options fail before the heavy imports
+    from evaluation_runner.scenario_evaluation.shield_stress import create_parameters_for_shear_stress
+    from evaluation_runner.work_queue import WorkQueue
+    from extract_data.memory_budget import MemoryBudget
+    from profile_creation.containers import BeforeOrAfterFloodScenario
+    from run_evaluation_of_conducted_experiments import evaluate_simulation_on_given_points
+    from script_for_profile_creation import create_paths
+    from tools.reference_layers import ReferenceLayerRegistry
+
+    flood_scenario = BeforeOrAfterFloodScenario[configuration.flood_scenario]
+    reference_layers = ReferenceLayerRegistry()
+    path_to_gps_points = (
+        create_paths(flood_scenario).path_to_gps_points
+        if configuration.path_to_gps_points is None
+        else configuration.path_to_gps_points
+    )
+    evaluate_simulation_on_given_points(
+        path_to_all_experiments_to_evaluate=resolve_scenario_set(configuration.scenario_set),
+        evaluation_points=reference_layers.get_vector_layer(path_to_gps_points),
+        path_to_mesh=configuration.path_to_mesh,
+        flood_scenario=flood_scenario,
+        paths_to_polygon_as_area_of_interest=configuration.paths_to_polygon_as_area_of_interest,
+        path_to_dod_as_polygon=configuration.path_to_dod_as_polygon,
+        path_to_folder_containing_points_with_lines=configuration.path_to_folder_containing_points_with_lines,
+        simulation_time_in_seconds=configuration.simulation_time_in_seconds,
+        evaluation_parameters_for_shear_stress=create_parameters_for_shear_stress(),
+        sample_time_step_width=configuration.sample_time_step_width,
+        memory_budget=(
+            None
+            if configuration.memory_budget_in_bytes is None
+            else MemoryBudget(configuration.memory_budget_in_bytes, configuration.spill_directory)
+        ),
+        resume=configuration.resume,
+        reset_checkpoints=configuration.reset_checkpoints,
+        write_parquet_logs=configuration.write_parquet_logs,
+        update_catalog=configuration.update_catalog,
+        share_mesh_geometry_in_outputs=configuration.result_mesh_format == "parquet",
+        render_figures_in_background=configuration.render_figures_in_background,
+        number_of_render_workers=configuration.number_of_render_workers,
+        path_to_dod_raster=configuration.path_to_dod_raster,
+        prefetch_depth=configuration.prefetch_depth,
+        write_outputs_in_background=configuration.write_outputs_in_background,
+        work_queue=(
+            None
+            if configuration.work_queue is None
+            else WorkQueue(configuration.work_queue, worker_id=configuration.worker_id)
+        ),
+        worker_id=configuration.worker_id,
+        stages=configuration.stages,
+        create_figures=configuration.create_figures,
+        validate_experiments=configuration.validate_experiments,
+        reference_layers=reference_layers,
+    )
+
+
+def main(arguments: Optional[Sequence[str]] = None):
+    run_evaluation(load_configuration(arguments))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import glob
+import os
+import pickle
+from dataclasses import replace
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from extract_data.gauges import locate_cells_of_points
+from extract_data.summarising_mesh import StateToNameInShapeFileMapping
+from profile_creation.containers import BeforeOrAfterFloodScenario, OrderedProjectedGpsPointsPerProfileLine
+from tools.reference_layers import ReferenceLayerRegistry
+
+_NO_CELL = -1
+_OBSERVED_WATER_SURFACE_ELEVATION = "WSE__m_"
+_OBSERVED_BOTTOM_ELEVATION = "H"
+
+
+class ProfilePointsLayout(NamedTuple):
+    profile_names: tuple[str, ...]
+    profile_lines: tuple[OrderedProjectedGpsPointsPerProfileLine, ...]
+    cell_index: np.ndarray
+    distance: np.ndarray
+    observed_water_surface_elevation: np.ndarray
+    observed_bottom_elevation: np.ndarray
+
+
+class ProfileSamples(NamedTuple):
+    experiment_ids: tuple[str, ...]
+    simulated_water_surface_elevation: np.ndarray
+    simulated_bottom_elevation: np.ndarray
+
+
+def load_points_with_lines(
+    path_to_folder_containing_points_with_line: str,
+    flood_scenario: BeforeOrAfterFloodScenario,
+    reference_layers: Optional[ReferenceLayerRegistry] = None,
+) -> dict[str, OrderedProjectedGpsPointsPerProfileLine]:
+    file_names = glob.glob(
+        os.path.join(path_to_folder_containing_points_with_line, f"points_with_line*{flood_scenario.value}*")
+    )
+    points_with_lines = {}
+    for file_name in sorted(file_names):
+        if reference_layers is not None:
+            points_with_lines[os.path.basename(file_name)] = reference_layers.get_pickle(file_name)
+            continue
+        with open(file_name, "rb") as dump_file:
+            points_with_lines[os.path.basename(file_name)] = pickle.load(dump_file)
+    return points_with_lines
+
+
+def _pad_profile_values(values_per_profile: Sequence[np.ndarray], fill_value) -> np.ndarray:
+    number_of_points = max((len(values) for values in values_per_profile), default=0)
+    padded = np.full((len(values_per_profile), number_of_points), fill_value, dtype=np.result_type(fill_value))
+    for profile_index, values in enumerate(values_per_profile):
+        padded[profile_index, : len(values)] = values
+    return padded
+
+
+def create_profile_points_layout(
+    points_with_lines: dict[str, OrderedProjectedGpsPointsPerProfileLine], mesh: gpd.GeoDataFrame
+) -> ProfilePointsLayout:
+    profile_lines = tuple(points_with_lines.values())
+    all_points = [profile_line.projected_gps_points for profile_line in profile_lines]
+    return ProfilePointsLayout(
+        profile_names=tuple(points_with_lines.keys()),
+        profile_lines=profile_lines,
+        cell_index=_pad_profile_values([locate_cells_of_points(points, mesh) for points in all_points], _NO_CELL),
+        distance=_pad_profile_values([points["distance"].values for points in all_points], np.nan),
+        observed_water_surface_elevation=_pad_profile_values(
+            [points[_OBSERVED_WATER_SURFACE_ELEVATION].values for points in all_points], np.nan
+        ),
+        observed_bottom_elevation=_pad_profile_values(
+            [points[_OBSERVED_BOTTOM_ELEVATION].values for points in all_points], np.nan
+        ),
+    )
+
+
+def sample_cell_values_along_profiles(layout: ProfilePointsLayout, values_per_cell: np.ndarray) -> np.ndarray:
+    values_per_cell = np.asarray(values_per_cell, dtype=np.float64)
+    sampled = values_per_cell[..., np.maximum(layout.cell_index, 0)]
+    sampled[..., layout.cell_index == _NO_CELL] = np.nan
+    return sampled
+
+
+def assign_values_of_cells_to_profile_points(
+    layout: ProfilePointsLayout, columns_to_lookup: Iterable[str], mesh_with_all_results: gpd.GeoDataFrame
+) -> list[OrderedProjectedGpsPointsPerProfileLine]:
+    sampled_per_column = {
+        column: sample_cell_values_along_profiles(layout, mesh_with_all_results[column].values)
+        for column in columns_to_lookup
+    }
+    updated_profile_lines = []
+    for profile_index, profile_line in enumerate(layout.profile_lines):
+        points = profile_line.projected_gps_points.copy()
+        for column, sampled in sampled_per_column.items():
+            points[column] = sampled[profile_index, : len(points)]
+        updated_profile_lines.append(replace(profile_line, projected_gps_points=points))
+    return updated_profile_lines
+
+
+def _get_path_to_samples(path_to_folder: str, experiment_id: str) -> str:
+    return os.path.join(path_to_folder, f"{experiment_id}.npz")
+
+
+def save_profile_samples_of_experiment(
+    layout: ProfilePointsLayout,
+    mesh_with_all_results: gpd.GeoDataFrame,
+    mapping: StateToNameInShapeFileMapping,
+    experiment_id: str,
+    path_to_folder: str,
+) -> str:
+    bottom_elevation = mesh_with_all_results[mapping.bottom_elevation.final_name].values
+    water_surface_elevation = mesh_with_all_results[mapping.water_depth.final_name].values + bottom_elevation
+    if not os.path.exists(path_to_folder):
+        os.makedirs(path_to_folder)
+    path = _get_path_to_samples(path_to_folder, experiment_id)
+    temporary_path = os.path.join(path_to_folder, f".{experiment_id}.tmp.npz")
+    np.savez(
+        temporary_path,
+        simulated_water_surface_elevation=sample_cell_values_along_profiles(layout, water_surface_elevation),
+        simulated_bottom_elevation=sample_cell_values_along_profiles(layout, bottom_elevation),
+    )
+    os.replace(temporary_path, path)
+    return path
+
+
+def load_profile_samples(path_to_folder: str, layout: ProfilePointsLayout) -> ProfileSamples:
+    experiment_ids = []
+    water_surface_elevations = []
+    bottom_elevations = []
+    for path in sorted(glob.glob(os.path.join(path_to_folder, "*.npz"))):
+        if os.path.basename(path).startswith("."):
+            continue
+        with np.load(path) as samples:
+            if samples["simulated_bottom_elevation"].shape != layout.cell_index.shape:
+                raise ValueError(f"{path} was sampled with a different set of profile points")
+            water_surface_elevations.append(samples["simulated_water_surface_elevation"])
+            bottom_elevations.append(samples["simulated_bottom_elevation"])
+        experiment_ids.append(os.path.splitext(os.path.basename(path))[0])
+    empty_samples = np.empty((0, *layout.cell_index.shape))
+    return ProfileSamples(
+        experiment_ids=tuple(experiment_ids),
+        simulated_water_surface_elevation=np.stack(water_surface_elevations) if experiment_ids else empty_samples,
+        simulated_bottom_elevation=np.stack(bottom_elevations) if experiment_ids else empty_samples,
+    )
+
+
+def calculate_root_mean_square_error_along_profiles(simulated: np.ndarray, observed: np.ndarray) -> np.ndarray:
+    squared_error = np.square(simulated - observed[np.newaxis, ...])
+    number_of_valid_points = np.sum(~np.isnan(squared_error), axis=-1)
+    sum_of_squared_error = np.nansum(squared_error, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.sqrt(sum_of_squared_error / number_of_valid_points)
+
+
+def calculate_mean_error_along_profiles(simulated: np.ndarray, observed: np.ndarray) -> np.ndarray:
+    error = simulated - observed[np.newaxis, ...]
+    number_of_valid_points = np.sum(~np.isnan(error), axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.nansum(error, axis=-1) / number_of_valid_points
+
+
+def create_profile_error_table(layout: ProfilePointsLayout, samples: ProfileSamples) -> pd.DataFrame:
+    number_of_experiments, number_of_profiles = len(samples.experiment_ids), len(layout.profile_names)
+    statistics = {
+        "rmse_wse": calculate_root_mean_square_error_along_profiles(
+            samples.simulated_water_surface_elevation, layout.observed_water_surface_elevation
+        ),
+        "mean_error_wse": calculate_mean_error_along_profiles(
+            samples.simulated_water_surface_elevation, layout.observed_water_surface_elevation
+        ),
+        "rmse_bottom_elevation": calculate_root_mean_square_error_along_profiles(
+            samples.simulated_bottom_elevation, layout.observed_bottom_elevation
+        ),
+        "mean_error_bottom_elevation": calculate_mean_error_along_profiles(
+            samples.simulated_bottom_elevation, layout.observed_bottom_elevation
+        ),
+    }
+    return pd.DataFrame(
+        {
+            "experiment_id": np.repeat(samples.experiment_ids, number_of_profiles),
+            "profile": np.tile(layout.profile_names, number_of_experiments),
+            "points_in_mesh": np.tile(np.sum(layout.cell_index != _NO_CELL, axis=-1), number_of_experiments),
+            **{name: values.reshape(-1) for name, values in statistics.items()},
+        }
+    )
@@ -0,0 +1,184 @@
+import os
+from typing import NamedTuple, Sequence
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from shapely.geometry import LineString
+
+from extract_data.create_shape_files_from_simulation_results import SimulationResultsShapes
+from extract_data.memory_budget import SimulationResultsProvider
+from profile_creation.containers import OrderedProjectedGpsPointsPerProfileLine
+
+
+class CrossSectionGeometry(NamedTuple):
+    profile_names: tuple[str, ...]
+    profile_index: np.ndarray
+    cell_index: np.ndarray
+    segment_length: np.ndarray
+    normal_x: np.ndarray
+    normal_y: np.ndarray
+
+
+class CrossSectionInput(NamedTuple):
+    time_stamps: list[int]
+    water_depth: np.ndarray
+    unit_discharge_x: np.ndarray
+    unit_discharge_y: np.ndarray
+    flow_velocity_x: np.ndarray
+    flow_velocity_y: np.ndarray
+
+
+def create_transect_lines_from_profile_points(
+    points_with_lines: dict[str, OrderedProjectedGpsPointsPerProfileLine],
+) -> dict[str, LineString]:
+    return {
+        profile_name: LineString(list(profile_line.projected_gps_points.sort_values("distance").geometry))
+        for profile_name, profile_line in points_with_lines.items()
+    }
+
+
+def _sum_length_weighted_normal(intersection) -> tuple[float, float]:
+    normal_x, normal_y = 0.0, 0.0
+    for part in getattr(intersection, "geoms", [intersection]):
+        if not isinstance(part, LineString):
+            continue
+        coordinates = np.asarray(part.coords)
+        delta = np.diff(coordinates[:, :2], axis=0)
+        normal_x += float(np.sum(delta[:, 1]))
+        normal_y += float(np.sum(-delta[:, 0]))
+    return normal_x, normal_y
+
+
+def intersect_transect_lines_with_mesh(lines: dict[str, LineString], mesh: gpd.GeoDataFrame) -> CrossSectionGeometry:
+    transects = gpd.GeoDataFrame(
+        {"profile_position": np.arange(len(lines))}, geometry=list(lines.values()), crs=mesh.crs
+    )
+    cells = gpd.GeoDataFrame({"cell_position": np.arange(len(mesh))}, geometry=mesh.geometry.values, crs=mesh.crs)
+    candidates = gpd.sjoin(transects, cells, how="inner", predicate="intersects")
+    intersections = gpd.GeoSeries(transects.geometry.values[candidates["profile_position"].values]).intersection(
+        gpd.GeoSeries(cells.geometry.values[candidates["cell_position"].values])
+    )
+    segment_length = intersections.length.values
+    length_weighted_normals = np.array(
+        [_sum_length_weighted_normal(geometry) for geometry in intersections], dtype=np.float64
+    ).reshape(-1, 2)
+    is_crossing = segment_length > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        normals = length_weighted_normals[is_crossing] / segment_length[is_crossing, np.newaxis]
+    return CrossSectionGeometry(
+        profile_names=tuple(lines.keys()),
+        profile_index=candidates["profile_position"].values[is_crossing],
+        cell_index=candidates["cell_position"].values[is_crossing],
+        segment_length=segment_length[is_crossing],
+        normal_x=normals[:, 0],
+        normal_y=normals[:, 1],
+    )
+
+
+def _stack_time_stamps(
+    data_frame: pd.DataFrame, column_name: str, time_stamps: Sequence[int], cell_index: np.ndarray
+) -> np.ndarray:
+    return np.stack([data_frame[f"{time_stamp}-{column_name}"].values[cell_index] for time_stamp in time_stamps])
+
+
+def create_cross_section_input(
+    results: SimulationResultsShapes, time_stamps: Sequence[int], geometry: CrossSectionGeometry
+) -> CrossSectionInput:
+    cell_index = geometry.cell_index
+    return CrossSectionInput(
+        time_stamps=list(time_stamps),
+        water_depth=_stack_time_stamps(results.hydraulic_state, "Value", time_stamps, cell_index)
+        - _stack_time_stamps(results.bottom_elevation, "BottomEl", time_stamps, cell_index),
+        unit_discharge_x=_stack_time_stamps(results.hydraulic_state, "DX", time_stamps, cell_index),
+        unit_discharge_y=_stack_time_stamps(results.hydraulic_state, "DY", time_stamps, cell_index),
+        flow_velocity_x=_stack_time_stamps(results.flow_velocity, "DX", time_stamps, cell_index),
+        flow_velocity_y=_stack_time_stamps(results.flow_velocity, "DY", time_stamps, cell_index),
+    )
+
+
+def _create_profile_aggregation_matrix(geometry: CrossSectionGeometry) -> sparse.csr_matrix:
+    number_of_segments = len(geometry.cell_index)
+    return sparse.csr_matrix(
+        (np.ones(number_of_segments), (geometry.profile_index, np.arange(number_of_segments))),
+        shape=(len(geometry.profile_names), number_of_segments),
+    )
+
+
+def _sum_per_profile(aggregation: sparse.csr_matrix, values_per_segment: np.ndarray) -> np.ndarray:
+    return np.asarray(aggregation @ values_per_segment.T).T
+
+
+def calculate_cross_section_time_series(
+    geometry: CrossSectionGeometry, cross_section_input: CrossSectionInput, minimum_water_depth: float = 0.01
+) -> pd.DataFrame:
+    water_depth = cross_section_input.water_depth
+    is_wet = water_depth > minimum_water_depth
+    wetted_length = np.where(is_wet, geometry.segment_length, 0.0)
+    normal_unit_discharge = (
+        cross_section_input.unit_discharge_x * geometry.normal_x
+        + cross_section_input.unit_discharge_y * geometry.normal_y
+    )
+    normal_flow_velocity = (
+        cross_section_input.flow_velocity_x * geometry.normal_x
+        + cross_section_input.flow_velocity_y * geometry.normal_y
+    )
+    aggregation = _create_profile_aggregation_matrix(geometry)
+    wetted_width = _sum_per_profile(aggregation, wetted_length)
+    wetted_cross_section_area = _sum_per_profile(aggregation, np.where(is_wet, water_depth, 0.0) * wetted_length)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_depth = wetted_cross_section_area / wetted_width
+    number_of_time_stamps, number_of_profiles = wetted_width.shape
+    return pd.DataFrame(
+        {
+            "profile": np.tile(geometry.profile_names, number_of_time_stamps),
+            "time_step": np.repeat(cross_section_input.time_stamps, number_of_profiles),
+            "discharge": _sum_per_profile(aggregation, normal_unit_discharge * wetted_length).reshape(-1),
+            "discharge_from_flow_velocity": _sum_per_profile(
+                aggregation, normal_flow_velocity * np.where(is_wet, water_depth, 0.0) * wetted_length
+            ).reshape(-1),
+            "wetted_width": wetted_width.reshape(-1),
+            "wetted_cross_section_area": wetted_cross_section_area.reshape(-1),
+            "mean_depth": mean_depth.reshape(-1),
+        }
+    )
+
+
+def calculate_cross_section_time_series_for_experiment(
+    results_provider: SimulationResultsProvider,
+    geometry: CrossSectionGeometry,
+    time_stamps: Sequence[int],
+    minimum_water_depth: float = 0.01,
+) -> pd.DataFrame:
+    time_series_per_chunk = [
+        calculate_cross_section_time_series(
+            geometry, create_cross_section_input(results_in_chunk, time_stamps_in_chunk, geometry), minimum_water_depth
+        )
+        for time_stamps_in_chunk, results_in_chunk in results_provider.iterate_chunks(time_stamps)
+    ]
+    return pd.concat(time_series_per_chunk, ignore_index=True)
+
+
+def summarise_discharge_along_reach(cross_section_time_series: pd.DataFrame) -> pd.DataFrame:
+    discharge_per_time_step = cross_section_time_series.groupby("time_step")["discharge"]
+    summary = discharge_per_time_step.agg(["mean", "min", "max"]).rename(
+        columns={"mean": "mean_discharge", "min": "min_discharge", "max": "max_discharge"}
+    )
+    discharge_range = summary["max_discharge"] - summary["min_discharge"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        summary["relative_discharge_deviation"] = discharge_range / summary["mean_discharge"].abs()
+    return summary.reset_index()
+
+
+def write_cross_section_time_series(
+    cross_section_time_series: pd.DataFrame, path_to_folder: str, experiment_id: str
+) -> str:
+    if not os.path.exists(path_to_folder):
+        os.makedirs(path_to_folder)
+    path = os.path.join(path_to_folder, f"cross_sections_{experiment_id}.csv")
+    cross_section_time_series.to_csv(path, sep=";", index=False)
+    summarise_discharge_along_reach(cross_section_time_series).to_csv(
+        os.path.join(path_to_folder, f"discharge_along_reach_{experiment_id}.csv"), sep=";", index=False
+    )
+    return path
@@ -1,21 +1,25 @@
-import glob
 import os.path
-import pickle
 from copy import deepcopy
 from dataclasses import replace
-from typing import Iterable
+from typing import Iterable, Optional
 
 import geopandas as gpd
 from plotly import graph_objs as go
 import plotly.express as px
 from plotly.graph_objs.scatter import Marker
 
+from evaluation_runner.profiles.batch_profiles import (
+    ProfilePointsLayout,
+    assign_values_of_cells_to_profile_points,
+    load_points_with_lines,
+)
 from extract_data.summarising_mesh import (
     assign_requested_values_from_summarising_mesh_to_point,
     StateToNameInShapeFileMapping,
 )
 from profile_creation.containers import BeforeOrAfterFloodScenario, OrderedProjectedGpsPointsPerProfileLine
 from tools.figure_generator import create_figure_if_none_given
+from tools.render_queue import RenderQueue, save_figure_as_html, save_figure_as_image
 
 
 def evaluate_points_along_profiles(
@@ -24,22 +28,32 @@ def evaluate_points_along_profiles(
     path_to_folder_containing_points_with_line: str,
     colum_name_mapping: StateToNameInShapeFileMapping,
     experiment_id: str,
+    render_queue: Optional[RenderQueue] = None,
+    profile_points_layout: Optional[ProfilePointsLayout] = None,
 ) -> None:
-    transect_lines_and_points = extract_specified_column_values_from_results_file(
-        [pair.final_name for pair in colum_name_mapping],
-        mesh_with_all_results,
-        flood_scenario,
-        path_to_folder_containing_points_with_line,
-    )
+    if profile_points_layout is None:
+        transect_lines_and_points = extract_specified_column_values_from_results_file(
+            [pair.final_name for pair in colum_name_mapping],
+            mesh_with_all_results,
+            flood_scenario,
+            path_to_folder_containing_points_with_line,
+        )
+    else:
+        transect_lines_and_points = assign_values_of_cells_to_profile_points(
+            profile_points_layout, [pair.final_name for pair in colum_name_mapping], mesh_with_all_results
+        )
     file_path = f"out\\profiles\\{flood_scenario.value}_{experiment_id}\\"
     if not os.path.exists(file_path):
         os.mkdir(file_path)
     for i, transect_line_with_points in enumerate(transect_lines_and_points):
         file_name = f"profile_{i}"
         figure = plot_river_profile_from_gps_vs_simulated_data(
-            transect_line_with_points.projected_gps_points, file_path + file_name + ".html", colum_name_mapping
+            transect_line_with_points.projected_gps_points,
+            file_path + file_name + ".html",
+            colum_name_mapping,
+            render_queue=render_queue,
         )
-        format_and_save_profile_as_png(figure, file_path + file_name + ".png")
+        format_and_save_profile_as_png(figure, file_path + file_name + ".png", render_queue=render_queue)
 
 
 def extract_specified_column_values_from_results_file(
@@ -49,16 +63,11 @@ def extract_specified_column_values_from_results_file(
     path_to_folder_containing_points_with_line: str,
 ) -> list[OrderedProjectedGpsPointsPerProfileLine]:
     updated_line_and_points_with_data = []
-    file_names = glob.glob(
-        os.path.join(path_to_folder_containing_points_with_line, f"points_with_line*{flood_scenario.value}*")
-    )
-    for file_name in sorted(file_names):
-        with open(file_name, "rb") as dump_file:
-            points_with_line: OrderedProjectedGpsPointsPerProfileLine = pickle.load(dump_file)
-            updated_points = assign_requested_values_from_summarising_mesh_to_point(
-                columns_to_lookup, mesh_with_all_results, points_with_line.projected_gps_points
-            )
-            updated_line_and_points_with_data.append(replace(points_with_line, projected_gps_points=updated_points))
+    for points_with_line in load_points_with_lines(path_to_folder_containing_points_with_line, flood_scenario).values():
+        updated_points = assign_requested_values_from_summarising_mesh_to_point(
+            columns_to_lookup, mesh_with_all_results, points_with_line.projected_gps_points
+        )
+        updated_line_and_points_with_data.append(replace(points_with_line, projected_gps_points=updated_points))
     return updated_line_and_points_with_data
 
 
@@ -67,6 +76,7 @@ def create_histogram_with_mesh_values(
     column_to_make_histogram_from: str,
     flood_scenario: BeforeOrAfterFloodScenario,
     experiment_id: str,
+    render_queue: Optional[RenderQueue] = None,
 ):
     file_path = f"out\\histograms\\{flood_scenario.value}_{experiment_id}\\"
     if not os.path.exists(file_path):
@@ -79,7 +89,7 @@ def create_histogram_with_mesh_values(
         xaxis=dict(title=f"{column_to_make_histogram_from}"),
         yaxis=dict(title="n"),
     )
-    fig.write_html(file_path + file_name)
+    save_figure_as_html(fig, file_path + file_name, render_queue=render_queue)
 
 
 def create_scatter_plot(
@@ -88,6 +98,7 @@ def create_scatter_plot(
     flood_scenario: BeforeOrAfterFloodScenario,
     experiment_id: str,
     column_to_make_scatter_from_obs: str,
+    render_queue: Optional[RenderQueue] = None,
 ):
     file_path = f"out\\scatter_plots_{flood_scenario.value}\\{experiment_id}\\"
     if not os.path.exists(file_path):
@@ -148,16 +159,18 @@ def create_scatter_plot(
         font=dict(size=30),
     )
 
-    fig.write_html(file_path + file_name)
+    save_figure_as_html(fig, file_path + file_name, render_queue=render_queue)
 
     # fig.update_yaxes(range=[0, 1.2])
     png_filename = file_name if file_name.endswith(".svg") else f"{file_name}.svg"
-    fig.write_image(
+    save_figure_as_image(
+        fig,
         file_path + png_filename,
         format="svg",
         width=1200,
         height=1200,
         scale=2,
+        render_queue=render_queue,
     )
 
 
@@ -227,6 +240,7 @@ def plot_river_profile_from_gps_vs_simulated_data(
     ordered_gps_points_on_profile_line: gpd.GeoDataFrame,
     filename: str,
     state_to_name_in_shape_file_mapping: StateToNameInShapeFileMapping,
+    render_queue: Optional[RenderQueue] = None,
 ):
     figure = go.Figure()
     figure.add_trace(
@@ -283,11 +297,13 @@ def plot_river_profile_from_gps_vs_simulated_data(
         ]
     )
 
-    figure.write_html(filename)
+    save_figure_as_html(figure, filename, render_queue=render_queue)
     return figure
 
 
-def format_and_save_profile_as_png(figure: go.Figure, filename: str) -> None:
+def format_and_save_profile_as_png(
+    figure: go.Figure, filename: str, render_queue: Optional[RenderQueue] = None
+) -> None:
     formatted_figure = figure
 
     formatted_figure.update_layout(
@@ -299,10 +315,12 @@ def format_and_save_profile_as_png(figure: go.Figure, filename: str) -> None:
     formatted_figure.update_yaxes(range=[574.5, 577.5])
     formatted_figure.update_layout(showlegend=True)
     png_filename = filename if filename.endswith(".png") else f"{filename}.png"
-    formatted_figure.write_image(
+    save_figure_as_image(
+        formatted_figure,
         png_filename,
         format="png",
         width=600,
         height=750,
         scale=2,
+        render_queue=render_queue,
     )
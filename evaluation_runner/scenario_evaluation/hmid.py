@@ -1,6 +1,7 @@
 import os
 import pathlib
 import pickle
+from typing import Optional
 
 import geopandas as gpd
 import numpy as np
@@ -9,7 +10,11 @@ from plotly import graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 
+from csv_logging.catalog import ExperimentCatalog
+from csv_logging.columnar_logs import load_logs_as_data_frame
+from csv_logging.csvlogger import ScenarioEvaluationHmid
 from tools.figure_generator import create_figure_if_none_given
+from tools.render_queue import RenderQueue, save_figure_as_image
 from misc.dataclasses_for_evaluations import ColumnNamePair
 
 
@@ -55,7 +60,7 @@ def create_scatter_plot_hmid():
     fig.show()
 
 
-def create_bar_plot_hmid(hmid_results):
+def create_bar_plot_hmid(hmid_results, render_queue: Optional[RenderQueue] = None):
     indices = hmid_results.groupby("experiment_id")["time_step"].transform(max) == hmid_results["time_step"]
     isolated = hmid_results[indices]
     isolated.to_csv("hmid.csv")
@@ -98,12 +103,14 @@ def create_bar_plot_hmid(hmid_results):
         showlegend=True,
     )
 
-    fig.write_image(
+    save_figure_as_image(
+        fig,
         r"C:\Users\nflue\Documents\Masterarbeit\03_Projects\MasterThesis\BasementEvaluations\out\HMIDscatter_waterdepthvari.svg",
         format="svg",
         width=1500,
         height=1000,
         scale=2,
+        render_queue=render_queue,
     )
 
     fig.show()
@@ -127,12 +134,14 @@ def create_bar_plot_hmid(hmid_results):
         ),
         showlegend=True,
     )
-    fig.write_image(
+    save_figure_as_image(
+        fig,
         r"C:\Users\nflue\Documents\Masterarbeit\03_Projects\MasterThesis\BasementEvaluations\out\scatter_flowvelocity.svg",
         format="svg",
         width=1500,
         height=1000,
         scale=2,
+        render_queue=render_queue,
     )
 
     fig.show()
@@ -163,12 +172,14 @@ def create_bar_plot_hmid(hmid_results):
         ),
         showlegend=True,
     )
-    fig.write_image(
+    save_figure_as_image(
+        fig,
         r"C:\Users\nflue\Documents\Masterarbeit\03_Projects\MasterThesis\BasementEvaluations\out\scatter_hmid.svg",
         format="svg",
         width=1500,
         height=1000,
         scale=2,
+        render_queue=render_queue,
     )
 
     fig.show()
@@ -181,10 +192,20 @@ def create_bar_plot_hmid(hmid_results):
 
 
 def main():
-    path_to_csv_hmid_results = r"C:\Users\nflue\Documents\Masterarbeit\03_Projects\MasterThesis\BasementEvaluations\out\HMID\log_hmid_input_01_fine_mesh.csv"
-    hmid_results = pd.read_csv(path_to_csv_hmid_results, sep=";")
-
-    create_bar_plot_hmid(hmid_results)
+    catalog = ExperimentCatalog()
+    hmid_results = catalog.query(
+        ScenarioEvaluationHmid,
+        columns=list(ScenarioEvaluationHmid.__dataclass_fields__),
+        scenario_set="hydrology_kst35_126000",
+    )
+    catalog.close()
+    if hmid_results.empty:
+        path_to_csv_hmid_results = r"C:\Users\nflue\Documents\Masterarbeit\03_Projects\MasterThesis\BasementEvaluations\out\HMID\log_hmid_input_01_fine_mesh.csv"
+        hmid_results = load_logs_as_data_frame(path_to_csv_hmid_results, ScenarioEvaluationHmid)
+
+    render_queue = RenderQueue()
+    create_bar_plot_hmid(hmid_results, render_queue=render_queue)
+    render_queue.close()
     create_scatter_plot_hmid()
 
 
@@ -0,0 +1,66 @@
+from typing import Collection, Optional
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from extract_data.shared_mesh import SharedMesh
+
+_TYPE_PER_COLUMN = {
+    "cell_index": np.int64,
+    "time_step": np.int64,
+    "discharge": np.float64,
+    "tau_chezy": np.float64,
+    "theta_chez": np.float64,
+}
+
+
+class TimeStackedSelections:
+    _chunks_per_column: dict[str, list[np.ndarray]]
+    _number_of_rows: int
+
+    def __init__(self):
+        self._chunks_per_column = {name: [] for name in _TYPE_PER_COLUMN}
+        self._number_of_rows = 0
+
+    def __len__(self) -> int:
+        return self._number_of_rows
+
+    def append(self, selection: pd.DataFrame, time_step: int, discharge: float) -> None:
+        number_of_cells = len(selection)
+        values_per_column = {
+            "cell_index": selection.index.to_numpy(),
+            "time_step": np.full(number_of_cells, time_step),
+            "discharge": np.full(number_of_cells, discharge),
+            "tau_chezy": selection["tau_chezy"].to_numpy(),
+            "theta_chez": selection["theta_chez"].to_numpy(),
+        }
+        for name, column_type in _TYPE_PER_COLUMN.items():
+            self._chunks_per_column[name].append(np.asarray(values_per_column[name], dtype=column_type))
+        self._number_of_rows += number_of_cells
+
+    def get_column(self, name: str) -> np.ndarray:
+        chunks = self._chunks_per_column[name]
+        if not chunks:
+            return np.empty(0, dtype=_TYPE_PER_COLUMN[name])
+        if len(chunks) > 1:
+            chunks[:] = [np.concatenate(chunks)]
+        return chunks[0]
+
+    def to_data_frame(self, shared_mesh: SharedMesh, discharges: Optional[Collection[float]] = None) -> pd.DataFrame:
+        columns = {name: self.get_column(name) for name in _TYPE_PER_COLUMN}
+        if discharges is not None:
+            is_selected = np.isin(columns["discharge"], list(discharges))
+            columns = {name: values[is_selected] for name, values in columns.items()}
+        columns["material_index"] = np.asarray(shared_mesh.material_index)[columns["cell_index"]]
+        columns["area"] = np.asarray(shared_mesh.cell_area)[columns["cell_index"]]
+        return pd.DataFrame(columns)
+
+    def to_geo_data_frame(
+        self, shared_mesh: SharedMesh, discharges: Optional[Collection[float]] = None
+    ) -> gpd.GeoDataFrame:
+        selections = self.to_data_frame(shared_mesh, discharges)
+        mesh = shared_mesh.create_geo_data_frame()
+        return gpd.GeoDataFrame(
+            selections, geometry=mesh.geometry.values[selections["cell_index"].to_numpy()], crs=mesh.crs
+        )
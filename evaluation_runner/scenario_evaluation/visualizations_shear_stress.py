@@ -1,5 +1,4 @@
 import pandas as pd
-from geopandas import GeoDataFrame
 from plotly import graph_objects as go
 
 from tools.figure_generator import create_figure_if_none_given
@@ -194,15 +193,14 @@ if __name__ == "__main__":
     main()
 
 
-def another_function_that_will_sexually_embarrass_me(some_df: GeoDataFrame) -> None:
+def another_function_that_will_sexually_embarrass_me(some_df: pd.DataFrame) -> None:
     upper_bounds_for_tau = list(range(0, 100, 10))
     trajectories_to_plot = {bound: [] for bound in upper_bounds_for_tau}
     discharge_steps = []
     for discharge, group in some_df.groupby("discharge"):
         discharge_steps.append(discharge)
         for bound in upper_bounds_for_tau:
-            df_with_lower_chezy = group.drop(group[group["tau_chezy"] > bound].index)
-            trajectories_to_plot[bound].append(df_with_lower_chezy.area.sum())
+            trajectories_to_plot[bound].append(group.loc[~(group["tau_chezy"] > bound), "area"].sum())
 
     fig = go.Figure()
     fig.add_traces(
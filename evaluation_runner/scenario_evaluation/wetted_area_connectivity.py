@@ -0,0 +1,150 @@
+import os
+from typing import NamedTuple, Optional, Sequence
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from extract_data.shared_mesh import CellAdjacency
+
+_DRY = -1
+_POOL_COLUMNS = (
+    "pool",
+    "time_step",
+    "area",
+    "volume",
+    "max_water_depth",
+    "number_of_cells",
+    "first_isolation",
+    "mean_water_depth",
+    "isolated_since",
+)
+
+
+class IsolatedPools(NamedTuple):
+    pools_per_time_step: pd.DataFrame
+    first_isolation_per_cell: np.ndarray
+    isolated_duration_per_cell: np.ndarray
+
+
+def label_wet_components(adjacency: CellAdjacency, is_wet: np.ndarray) -> np.ndarray:
+    connects_wet_cells = is_wet[adjacency.first_cell] & is_wet[adjacency.second_cell]
+    graph = sparse.coo_matrix(
+        (
+            np.ones(np.count_nonzero(connects_wet_cells), dtype=np.int8),
+            (adjacency.first_cell[connects_wet_cells], adjacency.second_cell[connects_wet_cells]),
+        ),
+        shape=(adjacency.number_of_cells, adjacency.number_of_cells),
+    )
+    _, labels = csgraph.connected_components(graph, directed=False)
+    return np.where(is_wet, labels, _DRY)
+
+
+def find_main_channel_components(
+    labels: np.ndarray, cell_area: np.ndarray, main_channel_cells: Optional[np.ndarray] = None
+) -> np.ndarray:
+    is_wet = labels != _DRY
+    if not np.any(is_wet):
+        return np.empty(0, dtype=labels.dtype)
+    if main_channel_cells is not None:
+        labels_of_main_channel = labels[main_channel_cells]
+        return np.unique(labels_of_main_channel[labels_of_main_channel != _DRY])
+    wetted_area_per_component = np.bincount(labels[is_wet], weights=cell_area[is_wet])
+    return np.array([np.argmax(wetted_area_per_component)])
+
+
+def find_isolated_pools_over_time(
+    adjacency: CellAdjacency,
+    water_depths_over_time: np.ndarray,
+    time_stamps: Sequence[int],
+    cell_area: np.ndarray,
+    minimum_water_depth: float = 0.05,
+    main_channel_cells: Optional[np.ndarray] = None,
+) -> IsolatedPools:
+    number_of_cells = adjacency.number_of_cells
+    first_isolation_per_cell = np.full(number_of_cells, np.nan)
+    isolated_duration_per_cell = np.zeros(number_of_cells)
+    time_until_next_step = np.diff(np.asarray(time_stamps, dtype=np.float64), append=time_stamps[-1])
+    pools = []
+    for time_index, time_stamp in enumerate(time_stamps):
+        water_depth = np.asarray(water_depths_over_time[:, time_index], dtype=np.float64)
+        labels = label_wet_components(adjacency, water_depth > minimum_water_depth)
+        is_isolated = (labels != _DRY) & ~np.isin(
+            labels, find_main_channel_components(labels, cell_area, main_channel_cells)
+        )
+        newly_isolated = is_isolated & np.isnan(first_isolation_per_cell)
+        first_isolation_per_cell[newly_isolated] = time_stamp
+        isolated_duration_per_cell[is_isolated] += time_until_next_step[time_index]
+        if not np.any(is_isolated):
+            continue
+        isolated_cells = pd.DataFrame(
+            {
+                "pool": labels[is_isolated],
+                "area": cell_area[is_isolated],
+                "volume": cell_area[is_isolated] * water_depth[is_isolated],
+                "water_depth": water_depth[is_isolated],
+                "first_isolation": first_isolation_per_cell[is_isolated],
+            }
+        )
+        pools_at_time_step = isolated_cells.groupby("pool").agg(
+            area=("area", "sum"),
+            volume=("volume", "sum"),
+            max_water_depth=("water_depth", "max"),
+            number_of_cells=("area", "size"),
+            first_isolation=("first_isolation", "min"),
+        )
+        pools_at_time_step["mean_water_depth"] = pools_at_time_step["volume"] / pools_at_time_step["area"]
+        pools_at_time_step["isolated_since"] = time_stamp - pools_at_time_step["first_isolation"]
+        pools_at_time_step.insert(0, "time_step", time_stamp)
+        pools.append(pools_at_time_step.reset_index())
+    return IsolatedPools(
+        pools_per_time_step=pd.concat(pools, ignore_index=True) if pools else pd.DataFrame(columns=_POOL_COLUMNS),
+        first_isolation_per_cell=first_isolation_per_cell,
+        isolated_duration_per_cell=isolated_duration_per_cell,
+    )
+
+
+def create_isolated_pools_mesh(isolated_pools: IsolatedPools, mesh: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    isolated_pools_mesh = gpd.GeoDataFrame(
+        {
+            "first_isolation": isolated_pools.first_isolation_per_cell,
+            "isolated_duration": isolated_pools.isolated_duration_per_cell,
+        },
+        geometry=mesh.geometry.values,
+        crs=mesh.crs,
+    )
+    return isolated_pools_mesh[~np.isnan(isolated_pools.first_isolation_per_cell)]
+
+
+def summarise_isolated_pools(isolated_pools: IsolatedPools, cell_area: np.ndarray, experiment_id: str) -> pd.DataFrame:
+    pools_per_time_step = isolated_pools.pools_per_time_step.groupby("time_step")
+    was_ever_isolated = ~np.isnan(isolated_pools.first_isolation_per_cell)
+    return pd.DataFrame(
+        index=[0],
+        data={
+            "experiment_id": experiment_id,
+            "maximum_isolated_area": pools_per_time_step["area"].sum().max(),
+            "maximum_number_of_pools": pools_per_time_step.size().max(),
+            "first_isolation": (
+                isolated_pools.first_isolation_per_cell[was_ever_isolated].min()
+                if np.any(was_ever_isolated)
+                else np.nan
+            ),
+            "ever_isolated_area": np.sum(cell_area[was_ever_isolated]),
+        },
+    )
+
+
+def write_isolated_pools_tables(
+    isolated_pools: IsolatedPools, cell_area: np.ndarray, path_to_folder: str, experiment_id: str
+) -> str:
+    if not os.path.exists(path_to_folder):
+        os.makedirs(path_to_folder)
+    path = os.path.join(path_to_folder, "isolated_pools_per_time_step.csv")
+    isolated_pools.pools_per_time_step.to_csv(path, sep=";", index=False)
+    summarise_isolated_pools(isolated_pools, cell_area, experiment_id).to_csv(
+        os.path.join(path_to_folder, "isolated_pools_summary.csv"), sep=";", index=False
+    )
+    return path
@@ -0,0 +1,246 @@
+import json
+import os
+import socket
+import threading
+import time
+import warnings
+from typing import Iterable, Iterator, Optional
+
+from csv_logging.csvlogger import merge_csv_log_shards
+from tools.atomic_files import write_file_atomically
+
+_PENDING = "pending"
+_LEASED = "leased"
+_RECOVERING = "recovering"
+_COMPLETED = "completed"
+_FAILED = "failed"
+_WORKERS = "workers"
+_LEASE_SEPARATOR = "@"
+_EXPERIMENTS_FILE_NAME = "experiments.json"
+_POPULATE_LOCK_FILE_NAME = "populate.lock"
+_MERGE_LOCK_FILE_NAME = "merge.lock"
+
+
+def create_default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _get_experiment_id(path_to_experiment: str) -> str:
+    return os.path.split(path_to_experiment)[-1]
+
+
+def _get_task_name(position: int, path_to_experiment: str) -> str:
+    return f"{position:06d}-{_get_experiment_id(path_to_experiment)}"
+
+
+def _try_to_create_lock_file(path: str) -> bool:
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+
+def _is_older_than(path: str, seconds: float) -> bool:
+    try:
+        return time.time() - os.path.getmtime(path) > seconds
+    except FileNotFoundError:
+        return False
+
+
+class WorkQueue:
+    _folder: str
+    _worker_id: str
+    _lease_timeout_in_seconds: float
+    _heartbeat_interval_in_seconds: float
+    _maximum_attempts: int
+    _leases: dict[str, str]
+    _lock: threading.Lock
+    _stop_event: threading.Event
+    _heartbeat: Optional[threading.Thread]
+
+    def __init__(
+        self,
+        path_to_queue_folder: str,
+        worker_id: Optional[str] = None,
+        lease_timeout_in_seconds: float = 900,
+        heartbeat_interval_in_seconds: float = 60,
+        maximum_attempts: int = 3,
+    ):
+        if heartbeat_interval_in_seconds * 3 > lease_timeout_in_seconds:
+            raise ValueError(
+                f"{heartbeat_interval_in_seconds=} has to be at most a third of {lease_timeout_in_seconds=}"
+            )
+        self._folder = path_to_queue_folder
+        self._worker_id = create_default_worker_id() if worker_id is None else worker_id
+        if _LEASE_SEPARATOR in self._worker_id:
+            raise ValueError(f"{self._worker_id=} must not contain {_LEASE_SEPARATOR}")
+        self._lease_timeout_in_seconds = lease_timeout_in_seconds
+        self._heartbeat_interval_in_seconds = heartbeat_interval_in_seconds
+        self._maximum_attempts = maximum_attempts
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._heartbeat = None
+        for state in (_PENDING, _LEASED, _RECOVERING, _COMPLETED, _FAILED, _WORKERS):
+            os.makedirs(os.path.join(self._folder, state), exist_ok=True)
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
+    def _get_path(self, state: str, file_name: str = "") -> str:
+        return os.path.join(self._folder, state, file_name)
+
+    def _get_lease_file_name(self, task_name: str) -> str:
+        return f"{task_name}{_LEASE_SEPARATOR}{self._worker_id}.json"
+
+    def populate(self, paths_to_experiments: Iterable[str]) -> None:
+        path_to_experiments = os.path.join(self._folder, _EXPERIMENTS_FILE_NAME)
+        path_to_lock = os.path.join(self._folder, _POPULATE_LOCK_FILE_NAME)
+        while not os.path.exists(path_to_experiments):
+            if _try_to_create_lock_file(path_to_lock):
+                paths_to_experiments = list(paths_to_experiments)
+                for position, path_to_experiment in enumerate(paths_to_experiments):
+                    write_file_atomically(
+                        self._get_path(_PENDING, f"{_get_task_name(position, path_to_experiment)}.json"),
+                        json.dumps({"path": path_to_experiment, "attempts": 0}).encode(),
+                    )
+                write_file_atomically(path_to_experiments, json.dumps(paths_to_experiments, indent=True).encode())
+                return
+            if _is_older_than(path_to_lock, self._lease_timeout_in_seconds):
+                os.remove(path_to_lock)
+            time.sleep(self._heartbeat_interval_in_seconds / 10)
+
+    def _start_heartbeat(self) -> None:
+        if self._heartbeat is not None:
+            return
+        self._touch(self._get_path(_WORKERS, self._worker_id))
+        self._heartbeat = threading.Thread(target=self._beat, name="work_queue_heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        with open(path, "a"):
+            os.utime(path)
+
+    def _beat(self) -> None:
+        while not self._stop_event.wait(self._heartbeat_interval_in_seconds):
+            self._touch(self._get_path(_WORKERS, self._worker_id))
+            with self._lock:
+                leases = dict(self._leases)
+            for path_to_experiment, path_to_lease in leases.items():
+                try:
+                    os.utime(path_to_lease)
+                except FileNotFoundError:
+                    warnings.warn(f"the lease of {path_to_experiment} was taken over by another worker")
+                    with self._lock:
+                        self._leases.pop(path_to_experiment, None)
+
+    def recover_stale_leases(self) -> list[str]:
+        recovered = []
+        for file_name in sorted(os.listdir(self._get_path(_LEASED))):
+            path_to_lease = self._get_path(_LEASED, file_name)
+            if not _is_older_than(path_to_lease, self._lease_timeout_in_seconds):
+                continue
+            task_name = file_name.split(_LEASE_SEPARATOR)[0]
+            path_to_recovering = self._get_path(_RECOVERING, f"{task_name}.json")
+            try:
+                os.rename(path_to_lease, path_to_recovering)
+            except (FileNotFoundError, FileExistsError):
+                continue
+            with open(path_to_recovering, "r") as recovering_file:
+                task = json.load(recovering_file)
+            task["attempts"] += 1
+            experiment_id = _get_experiment_id(task["path"])
+            state = _FAILED if task["attempts"] >= self._maximum_attempts else _PENDING
+            file_name_in_state = f"{task_name if state == _PENDING else experiment_id}.json"
+            write_file_atomically(self._get_path(state, file_name_in_state), json.dumps(task).encode())
+            os.remove(path_to_recovering)
+            warnings.warn(f"recovered the stale lease {file_name}, {experiment_id} is {state} now")
+            recovered.append(experiment_id)
+        return recovered
+
+    def claim_next_experiment(self) -> Optional[str]:
+        self._start_heartbeat()
+        self.recover_stale_leases()
+        # the pending files start with their position in the populated list, so they are claimed in that order
+        for file_name in sorted(os.listdir(self._get_path(_PENDING))):
+            path_to_lease = self._get_path(_LEASED, self._get_lease_file_name(os.path.splitext(file_name)[0]))
+            try:
+                os.rename(self._get_path(_PENDING, file_name), path_to_lease)
+            except (FileNotFoundError, FileExistsError):
+                continue
+            os.utime(path_to_lease)
+            with open(path_to_lease, "r") as lease_file:
+                path_to_experiment = json.load(lease_file)["path"]
+            with self._lock:
+                self._leases[path_to_experiment] = path_to_lease
+            return path_to_experiment
+        return None
+
+    def iterate_claimed_experiments(self) -> Iterator[str]:
+        while (path_to_experiment := self.claim_next_experiment()) is not None:
+            yield path_to_experiment
+
+    def _release_lease(self, path_to_experiment: str, state: str) -> None:
+        with self._lock:
+            path_to_lease = self._leases.pop(path_to_experiment, None)
+        if path_to_lease is None:
+            raise KeyError(f"{self._worker_id} does not hold a lease for {path_to_experiment}")
+        try:
+            os.replace(path_to_lease, self._get_path(state, f"{_get_experiment_id(path_to_experiment)}.json"))
+        except FileNotFoundError:
+            warnings.warn(f"the lease of {path_to_experiment} was taken over by another worker before it was {state}")
+
+    def mark_as_completed(self, path_to_experiment: str) -> None:
+        self._release_lease(path_to_experiment, _COMPLETED)
+
+    def mark_as_failed(self, path_to_experiment: str) -> None:
+        self._release_lease(path_to_experiment, _FAILED)
+
+    def is_drained(self) -> bool:
+        return not os.listdir(self._get_path(_PENDING)) and not os.listdir(self._get_path(_LEASED))
+
+    def _has_other_active_workers(self) -> bool:
+        return any(
+            not _is_older_than(self._get_path(_WORKERS, worker_id), self._lease_timeout_in_seconds)
+            for worker_id in os.listdir(self._get_path(_WORKERS))
+            if worker_id != self._worker_id
+        )
+
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        with self._lock:
+            unfinished = list(self._leases)
+        if unfinished:
+            warnings.warn(f"{self._worker_id} closes with unfinished leases for {unfinished}, they become stale")
+        path_to_worker = self._get_path(_WORKERS, self._worker_id)
+        if os.path.exists(path_to_worker):
+            os.remove(path_to_worker)
+
+    def merge_result_shards_if_last_worker(self, log_file_names: Iterable[str]) -> list[str]:
+        if not self.is_drained() or self._has_other_active_workers():
+            return []
+        if not _try_to_create_lock_file(os.path.join(self._folder, _MERGE_LOCK_FILE_NAME)):
+            return []
+        return merge_result_shards(log_file_names)
+
+
+def merge_result_shards(log_file_names: Iterable[str]) -> list[str]:
+    paths = []
+    for file_name in log_file_names:
+        try:
+            paths.append(merge_csv_log_shards(file_name, drop_duplicate_rows=True))
+        except FileNotFoundError:
+            continue
+    return paths
@@ -1,5 +1,6 @@
+import dataclasses
 import os.path
-from typing import Iterable, NamedTuple, Sequence, Union
+from typing import NamedTuple, Optional, Sequence, Union
 
 import geopandas as gpd
 import h5py
@@ -12,7 +13,12 @@ from shapely.geometry import Polygon
 from tqdm import tqdm
 
 from helpers.global_and_constant_values import GlobalConstants
-from helpers.helpers import change_back_to_original_wd_afterwards
+from extract_data.repacked_results import (
+    RepackedGroup,
+    RepackedResults,
+    open_repacked_results_if_available,
+    select_results_group,
+)
 from simulation_configuration import get_experiment_base_run_root_folder
 from simulation_runner.prepare_basement.preparation import (
     get_root_directory_for_experiment_results,
@@ -38,33 +44,53 @@ class SimulationResultsShapeFilePaths(NamedTuple):
     path_to_chezy_coefficient: str
 
 
-class SimulationResultsShapes(NamedTuple):
-    bottom_elevation: gpd.GeoDataFrame
-    hydraulic_state: gpd.GeoDataFrame
-    flow_velocity: gpd.GeoDataFrame
-    absolute_flow_velocity: gpd.GeoDataFrame
-    chezy_coefficient: gpd.GeoDataFrame
+def _create_column_key(time_stamp: int, column_name: str) -> str:
+    return f"{time_stamp}-{column_name}"
 
 
-def append_constant_data_per_time_step_to_geo_data_frame(
-    base_data_frame: GeoDataFrame,
-    file_with_constant_1d_data: Union[h5py.File, list],
-    column_name: str,
-    time_steps: Sequence[int],
-) -> GeoDataFrame:
-    data_frame_to_fill = base_data_frame.copy(deep=True)
-    for time_step in tqdm(time_steps):
-        column_key = f"{time_step}-{column_name}"
-        data_frame_to_fill[column_key] = file_with_constant_1d_data
-    return data_frame_to_fill
+@dataclasses.dataclass(frozen=True)
+class TimeInvariantData:
+    index: pd.Index
+    values: np.ndarray
+    column_name: str
+    time_stamps: tuple[int, ...]
 
+    @property
+    def columns(self) -> pd.Index:
+        return pd.Index([_create_column_key(time_stamp, self.column_name) for time_stamp in self.time_stamps])
 
-def process_h5_files_to_shape_files(
-    path_to_root_directory: str, path_to_mesh: str, time_step: int, used_geomorphologic_module: bool
-) -> SimulationResultsShapes:
-    path_to_results = os.path.join(path_to_root_directory, "evaluation")
-    if not os.path.exists(path_to_results):
-        os.mkdir(path_to_results)
+    def __getitem__(self, key: str) -> pd.Series:
+        time_stamp, _, column_name = key.partition("-")
+        if column_name != self.column_name or not time_stamp.lstrip("-").isdigit():
+            raise KeyError(key)
+        return pd.Series(self.values, index=self.index, name=key, copy=False)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+
+def create_time_invariant_data(
+    index: pd.Index, constant_1d_data: np.ndarray, column_name: str, time_stamps: Sequence[int]
+) -> TimeInvariantData:
+    return TimeInvariantData(
+        index=index, values=constant_1d_data, column_name=column_name, time_stamps=tuple(time_stamps)
+    )
+
+
+class SimulationResultsShapes(NamedTuple):
+    bottom_elevation: Union[pd.DataFrame, TimeInvariantData]
+    hydraulic_state: pd.DataFrame
+    flow_velocity: pd.DataFrame
+    absolute_flow_velocity: pd.DataFrame
+    chezy_coefficient: Union[pd.DataFrame, TimeInvariantData]
+    mesh: gpd.GeoDataFrame
+
+
+def load_mesh_as_geo_data_frame(path_to_mesh: str) -> GeoDataFrame:
     triangle_polygons = []
     triangle_material_index = []
     with py2dm.Reader(path_to_mesh) as mesh:
@@ -77,80 +103,159 @@ def process_h5_files_to_shape_files(
             assert len(element.materials) == 2
             assert isinstance(element.materials[0], int) and isinstance(element.materials[1], float)
             triangle_material_index.append(element.materials[0])
-    base_data_frame = GeoDataFrame(
+    return GeoDataFrame(
         geometry=triangle_polygons,
         data={"index": list(range(len(triangle_polygons))), "material_index": triangle_material_index},
         crs=2056,
     )
 
-    with change_back_to_original_wd_afterwards(path_to_results):
-        h5_path = os.path.join(path_to_root_directory, GlobalConstants.results_h5_file_name)
-        h5_results_data = h5py.File(h5_path, "r")
 
-        hydraulic_state = append_time_series_data_to_geo_data_frame(
-            base_data_frame, h5_results_data["RESULTS/CellsAll/HydState"], ["Value", "DX", "DY"]
-        )
-        h5_path = os.path.join(path_to_root_directory, "results_aux.h5")
-        h5_auxiliary_data = h5py.File(h5_path, "r")
-        flow_velocity = append_time_series_data_to_geo_data_frame(
-            base_data_frame, h5_auxiliary_data["flow_velocity"], ["DX", "DY"]
-        )
-        absolute_flow_velocity = append_time_series_data_to_geo_data_frame(
-            base_data_frame, h5_auxiliary_data["flow_velocity_abs"], ["Value"]
-        )
-        time_steps = list(range(len(absolute_flow_velocity.columns) - 1))
+def _convert_time_stamps_to_h5_keys(time_stamps: Optional[Sequence[int]], time_step: int) -> Optional[list[int]]:
+    if time_stamps is None:
+        return None
+    if any(time_stamp % time_step != 0 for time_stamp in time_stamps):
+        raise ValueError(f"all time stamps in {time_stamps} have to be a multiple of {time_step=}")
+    return sorted({time_stamp // time_step for time_stamp in time_stamps})
 
-        chezy_coefficient_is_available = "ChezyCoe" in h5_results_data["RESULTS/CellsAll"].keys()
-        if chezy_coefficient_is_available:
-            chezy_coefficient = append_time_series_data_to_geo_data_frame(
-                base_data_frame, h5_results_data["RESULTS/CellsAll/ChezyCoe"], ["ChezyCoe"]
-            )
-        else:
-            chezy_coefficient = append_constant_data_per_time_step_to_geo_data_frame(
-                base_data_frame, [pd.NA] * len(base_data_frame.geometry), "ChezyCoe", time_steps
-            )
 
-        if used_geomorphologic_module:
-            bottom_elevation = append_time_series_data_to_geo_data_frame(
-                base_data_frame, h5_results_data["RESULTS/CellsAll/BottomEl"], ["BottomEl"]
-            )
-        else:
-            bottom_elevation = append_constant_data_per_time_step_to_geo_data_frame(
-                base_data_frame, h5_results_data["CellsAll/BottomEl"], "BottomEl", time_steps
+def process_h5_files_to_shape_files(
+    path_to_root_directory: str,
+    path_to_mesh: str,
+    time_step: int,
+    used_geomorphologic_module: bool,
+    time_stamps_to_load: Optional[Sequence[int]] = None,
+    base_data_frame: Optional[GeoDataFrame] = None,
+    mesh_fingerprint: Optional[str] = None,
+) -> SimulationResultsShapes:
+    path_to_results = os.path.join(path_to_root_directory, "evaluation")
+    if not os.path.exists(path_to_results):
+        os.mkdir(path_to_results)
+    if base_data_frame is None:
+        base_data_frame = load_mesh_as_geo_data_frame(path_to_mesh)
+    keys_to_load = _convert_time_stamps_to_h5_keys(time_stamps_to_load, time_step)
+
+    path_to_h5_results = os.path.join(path_to_root_directory, GlobalConstants.results_h5_file_name)
+    path_to_h5_auxiliary_results = os.path.join(path_to_root_directory, "results_aux.h5")
+    with h5py.File(path_to_h5_results, "r") as h5_results_data, h5py.File(
+        path_to_h5_auxiliary_results, "r"
+    ) as h5_auxiliary_data:
+        repacked_results = open_repacked_results_if_available(path_to_root_directory, base_data_frame, mesh_fingerprint)
+        try:
+            return _read_simulation_results(
+                h5_results_data,
+                h5_auxiliary_data,
+                repacked_results,
+                base_data_frame,
+                time_step,
+                used_geomorphologic_module,
+                keys_to_load,
             )
+        finally:
+            if repacked_results is not None:
+                repacked_results.close()
 
-    return rename_columns_to_represent_time_step(
-        SimulationResultsShapes(
-            bottom_elevation=bottom_elevation.copy(),
-            hydraulic_state=hydraulic_state.copy(),
-            flow_velocity=flow_velocity.copy(),
-            absolute_flow_velocity=absolute_flow_velocity.copy(),
-            chezy_coefficient=chezy_coefficient.copy(),
-        ),
+
+def _read_simulation_results(
+    h5_results_data: h5py.File,
+    h5_auxiliary_data: h5py.File,
+    repacked_results: Optional[RepackedResults],
+    base_data_frame: GeoDataFrame,
+    time_step: int,
+    used_geomorphologic_module: bool,
+    keys_to_load: Optional[Sequence[int]],
+) -> SimulationResultsShapes:
+    index = base_data_frame.index
+
+    hydraulic_state = create_time_series_data_frame(
+        index,
+        select_results_group(repacked_results, h5_results_data, "RESULTS/CellsAll/HydState"),
+        ["Value", "DX", "DY"],
+        time_step,
+        keys_to_load,
+    )
+    flow_velocity = create_time_series_data_frame(
+        index,
+        select_results_group(repacked_results, h5_auxiliary_data, "flow_velocity"),
+        ["DX", "DY"],
         time_step,
+        keys_to_load,
     )
+    absolute_flow_velocity = create_time_series_data_frame(
+        index,
+        select_results_group(repacked_results, h5_auxiliary_data, "flow_velocity_abs"),
+        ["Value"],
+        time_step,
+        keys_to_load,
+    )
+    time_stamps = [
+        key * time_step for key in _select_keys_to_load(h5_auxiliary_data["flow_velocity_abs"], keys_to_load)
+    ]
+
+    chezy_coefficient_is_available = "ChezyCoe" in h5_results_data["RESULTS/CellsAll"].keys()
+    if chezy_coefficient_is_available:
+        chezy_coefficient = create_time_series_data_frame(
+            index,
+            select_results_group(repacked_results, h5_results_data, "RESULTS/CellsAll/ChezyCoe"),
+            ["ChezyCoe"],
+            time_step,
+            keys_to_load,
+        )
+    else:
+        chezy_coefficient = create_time_invariant_data(index, np.full(len(index), np.nan), "ChezyCoe", time_stamps)
+
+    if used_geomorphologic_module:
+        bottom_elevation = create_time_series_data_frame(
+            index,
+            select_results_group(repacked_results, h5_results_data, "RESULTS/CellsAll/BottomEl"),
+            ["BottomEl"],
+            time_step,
+            keys_to_load,
+        )
+    else:
+        bottom_elevation = create_time_invariant_data(
+            index,
+            np.asarray(h5_results_data["CellsAll/BottomEl"]).reshape(len(index), -1)[:, 0],
+            "BottomEl",
+            time_stamps,
+        )
+
+    return SimulationResultsShapes(
+        bottom_elevation=bottom_elevation,
+        hydraulic_state=hydraulic_state,
+        flow_velocity=flow_velocity,
+        absolute_flow_velocity=absolute_flow_velocity,
+        chezy_coefficient=chezy_coefficient,
+        mesh=base_data_frame,
+    )
+
+
+def _select_keys_to_load(
+    file_with_1d_data_per_step: Union[h5py.Group, RepackedGroup], keys_to_load: Optional[Sequence[int]]
+) -> list[int]:
+    available_keys = sorted(int(key) for key in file_with_1d_data_per_step.keys())
+    if keys_to_load is None:
+        return available_keys
+    requested_keys = set(keys_to_load)
+    return [key for key in available_keys if key in requested_keys]
 
 
-def rename_columns_to_represent_time_step(result: SimulationResultsShapes, time_step: int) -> SimulationResultsShapes:
-    relabeled_dataframes = []
-    for dataframe in result:
-        dataframe: GeoDataFrame
-        mapping = {
-            name: f"{int(name.split('-')[0]) * time_step}-{''.join(name.split('-')[1:])}"
-            for name in dataframe.columns.values
-            if "-" in name
-        }
-        relabeled_dataframes.append(dataframe.rename(columns=mapping))
-    return SimulationResultsShapes(*relabeled_dataframes)
-
-
-def append_time_series_data_to_geo_data_frame(
-    base_data_frame: GeoDataFrame, file_with_1d_data_per_step: h5py.File, column_names: Iterable[str]
-) -> GeoDataFrame:
-    data_frame_to_fill = base_data_frame.copy(deep=True)
-    for key in tqdm(sorted(file_with_1d_data_per_step.keys(), key=lambda x: int(x))):
+def create_time_series_data_frame(
+    index: pd.Index,
+    file_with_1d_data_per_step: Union[h5py.Group, RepackedGroup],
+    column_names: Sequence[str],
+    time_step: int,
+    keys_to_load: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
+    columns = {}
+    if isinstance(file_with_1d_data_per_step, RepackedGroup):
+        keys = _select_keys_to_load(file_with_1d_data_per_step, keys_to_load)
+        values_of_all_steps = file_with_1d_data_per_step.read_steps(keys)
+        for key, values_of_this_step in zip(keys, values_of_all_steps):
+            for column_index, column_name in enumerate(column_names):
+                columns[_create_column_key(key * time_step, column_name)] = values_of_this_step[:, column_index]
+        return pd.DataFrame(data=columns, index=index)
+    for key in tqdm(_select_keys_to_load(file_with_1d_data_per_step, keys_to_load)):
+        values_of_this_step = file_with_1d_data_per_step[str(key)][()]
         for column_index, column_name in enumerate(column_names):
-            column_key = f"{key}-{column_name}"
-            data_frame_to_fill[column_key] = file_with_1d_data_per_step[key][:, column_index]
-    return data_frame_to_fill
-    # data_frame_to_fill.to_file(f"{file_name}.shp" if not file_name.endswith(".shp") else file_name)
+            columns[_create_column_key(key * time_step, column_name)] = values_of_this_step[:, column_index]
+    return pd.DataFrame(data=columns, index=index)
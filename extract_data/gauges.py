@@ -0,0 +1,127 @@
+import os
+import warnings
+from typing import NamedTuple, Optional, Sequence, Union
+
+import geopandas as gpd
+import h5py
+import numpy as np
+import pandas as pd
+
+from extract_data.create_shape_files_from_simulation_results import (
+    _convert_time_stamps_to_h5_keys,
+    _select_keys_to_load,
+)
+from extract_data.repacked_results import RepackedGroup, open_repacked_results_if_available, select_results_group
+from helpers.global_and_constant_values import GlobalConstants
+
+_NO_CELL = -1
+
+
+class Gauge(NamedTuple):
+    name: str
+    cell_index: int
+
+
+def locate_cells_of_points(points: gpd.GeoDataFrame, mesh: gpd.GeoDataFrame) -> np.ndarray:
+    points_with_position = gpd.GeoDataFrame(
+        {"point_position": np.arange(len(points))}, geometry=points.geometry.values, crs=points.crs
+    )
+    cells = gpd.GeoDataFrame({"cell_position": np.arange(len(mesh))}, geometry=mesh.geometry.values, crs=mesh.crs)
+    joined = gpd.sjoin(points_with_position, cells, how="inner", predicate="within")
+    first_cell_per_point = joined.groupby("point_position")["cell_position"].min()
+    cell_index = np.full(len(points), _NO_CELL, dtype=np.int64)
+    cell_index[first_cell_per_point.index.values] = first_cell_per_point.values
+    return cell_index
+
+
+def locate_gauges(
+    points: gpd.GeoDataFrame, mesh: gpd.GeoDataFrame, name_column: Optional[str] = None
+) -> tuple[Gauge, ...]:
+    names = [str(name) for name in (points.index if name_column is None else points[name_column])]
+    gauges = []
+    for name, cell_index in zip(names, locate_cells_of_points(points, mesh)):
+        if cell_index == _NO_CELL:
+            warnings.warn(f"gauge {name} lies outside of the mesh and is skipped")
+            continue
+        gauges.append(Gauge(name=name, cell_index=int(cell_index)))
+    return tuple(gauges)
+
+
+def _read_rows_of_cells(dataset: h5py.Dataset, sorted_cells: np.ndarray, position_in_sorted_cells: np.ndarray):
+    return np.asarray(dataset[sorted_cells, ...]).reshape(len(sorted_cells), -1)[position_in_sorted_cells]
+
+
+def _read_time_series_of_cells(
+    group: Union[h5py.Group, RepackedGroup],
+    keys: Sequence[int],
+    sorted_cells: np.ndarray,
+    position_in_sorted_cells: np.ndarray,
+) -> np.ndarray:
+    if isinstance(group, RepackedGroup):
+        return group.read_cells(keys, sorted_cells)[:, position_in_sorted_cells]
+    return np.stack(
+        [_read_rows_of_cells(group[str(key)], sorted_cells, position_in_sorted_cells) for key in keys]
+    ).reshape(len(keys), len(position_in_sorted_cells), -1)
+
+
+def read_gauge_time_series(
+    path_to_experiment: str,
+    gauges: Sequence[Gauge],
+    time_step: int,
+    used_geomorphologic_module: bool,
+    time_stamps: Optional[Sequence[int]] = None,
+    mesh_fingerprint: Optional[str] = None,
+) -> pd.DataFrame:
+    cell_index = np.array([gauge.cell_index for gauge in gauges], dtype=np.int64)
+    sorted_cells, position_in_sorted_cells = np.unique(cell_index, return_inverse=True)
+    keys_to_load = _convert_time_stamps_to_h5_keys(time_stamps, time_step)
+    repacked_results = open_repacked_results_if_available(path_to_experiment, mesh_fingerprint=mesh_fingerprint)
+    try:
+        with h5py.File(os.path.join(path_to_experiment, GlobalConstants.results_h5_file_name), "r") as h5_results_data:
+            with h5py.File(os.path.join(path_to_experiment, "results_aux.h5"), "r") as h5_auxiliary_data:
+                hydraulic_state = select_results_group(repacked_results, h5_results_data, "RESULTS/CellsAll/HydState")
+                keys = _select_keys_to_load(hydraulic_state, keys_to_load)
+                if not keys:
+                    return pd.DataFrame(columns=["gauge", "time_step", "variable", "value"])
+
+                def read(h5_file: h5py.File, name: str) -> np.ndarray:
+                    group = select_results_group(repacked_results, h5_file, name)
+                    return _read_time_series_of_cells(group, keys, sorted_cells, position_in_sorted_cells)
+
+                water_surface_elevation = read(h5_results_data, "RESULTS/CellsAll/HydState")[..., 0]
+                if used_geomorphologic_module:
+                    bottom_elevation = read(h5_results_data, "RESULTS/CellsAll/BottomEl")[..., 0]
+                else:
+                    fixed_bottom_elevation = _read_rows_of_cells(
+                        h5_results_data["CellsAll/BottomEl"], sorted_cells, position_in_sorted_cells
+                    )[:, 0]
+                    bottom_elevation = np.broadcast_to(fixed_bottom_elevation, water_surface_elevation.shape)
+                flow_velocity = read(h5_auxiliary_data, "flow_velocity")
+                absolute_flow_velocity = read(h5_auxiliary_data, "flow_velocity_abs")[..., 0]
+    finally:
+        if repacked_results is not None:
+            repacked_results.close()
+    values_per_variable = {
+        "water_surface_elevation": water_surface_elevation,
+        "bottom_elevation": bottom_elevation,
+        "water_depth": water_surface_elevation - bottom_elevation,
+        "flow_velocity": absolute_flow_velocity,
+        "flow_velocity_x": flow_velocity[..., 0],
+        "flow_velocity_y": flow_velocity[..., 1],
+    }
+    time_stamps_loaded = np.repeat([key * time_step for key in keys], len(gauges))
+    gauge_names = np.tile([gauge.name for gauge in gauges], len(keys))
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "gauge": gauge_names,
+                    "time_step": time_stamps_loaded,
+                    "variable": variable,
+                    "value": values.reshape(-1),
+                }
+            )
+            for variable, values in values_per_variable.items()
+        ],
+        ignore_index=True,
+    )
@@ -0,0 +1,187 @@
+import gc
+import os
+import warnings
+from dataclasses import dataclass
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+from geopandas import GeoDataFrame
+
+from extract_data.create_shape_files_from_simulation_results import (
+    SimulationResultsShapes,
+    load_mesh_as_geo_data_frame,
+    process_h5_files_to_shape_files,
+)
+from extract_data.shared_mesh import SharedMesh
+
+# hydraulic state (3), flow velocity (2), absolute flow velocity (1), chezy coefficient (1) and bottom elevation (1)
+_VALUES_PER_CELL_AND_TIME_STEP = 8
+_BYTES_PER_VALUE = 8
+_BYTES_PER_TRIANGLE_POLYGON = 600
+# the five result frames plus the meshes derived from them while evaluating one experiment
+_COPIES_OF_MESH_HELD_PER_EXPERIMENT = 8
+
+
+class MemoryBudgetExceededError(MemoryError):
+    pass
+
+
+@dataclass(frozen=True)
+class MemoryBudget:
+    maximum_bytes: int
+    spill_directory: Optional[str] = None
+
+
+def _get_available_physical_memory_in_bytes() -> Optional[int]:
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def limit_memory_budget_to_available_memory(memory_budget: MemoryBudget) -> MemoryBudget:
+    available_memory = _get_available_physical_memory_in_bytes()
+    if available_memory is None or memory_budget.maximum_bytes <= available_memory:
+        return memory_budget
+    warnings.warn(
+        f"memory budget of {memory_budget.maximum_bytes} bytes exceeds the available memory of {available_memory} "
+        f"bytes, the budget is reduced to avoid swapping"
+    )
+    return MemoryBudget(maximum_bytes=available_memory, spill_directory=memory_budget.spill_directory)
+
+
+def estimate_bytes_for_mesh(number_of_cells: int) -> int:
+    return number_of_cells * _BYTES_PER_TRIANGLE_POLYGON * _COPIES_OF_MESH_HELD_PER_EXPERIMENT
+
+
+def estimate_bytes_per_time_step(number_of_cells: int) -> int:
+    return number_of_cells * _VALUES_PER_CELL_AND_TIME_STEP * _BYTES_PER_VALUE
+
+
+def choose_number_of_time_steps_per_chunk(memory_budget: MemoryBudget, number_of_cells: int) -> int:
+    bytes_left_for_time_steps = memory_budget.maximum_bytes - estimate_bytes_for_mesh(number_of_cells)
+    number_of_time_steps = bytes_left_for_time_steps // estimate_bytes_per_time_step(number_of_cells)
+    if number_of_time_steps < 1:
+        raise MemoryBudgetExceededError(
+            f"a memory budget of {memory_budget.maximum_bytes} bytes is too small to hold a single time step of a "
+            f"mesh with {number_of_cells} cells"
+        )
+    return int(number_of_time_steps)
+
+
+def split_time_stamps_into_chunks(time_stamps: Sequence[int], chunk_size: int) -> Iterator[list[int]]:
+    for start in range(0, len(time_stamps), chunk_size):
+        yield list(time_stamps[start : start + chunk_size])
+
+
+def allocate_array_within_budget(
+    memory_budget: Optional[MemoryBudget], shape: tuple[int, ...], file_name: str
+) -> np.ndarray:
+    required_bytes = int(np.prod(shape)) * _BYTES_PER_VALUE
+    if memory_budget is None or required_bytes <= memory_budget.maximum_bytes // 2:
+        return np.full(shape, np.nan, dtype=np.float64)
+    if memory_budget.spill_directory is None:
+        raise MemoryBudgetExceededError(
+            f"{file_name} needs {required_bytes} bytes, which does not fit into the memory budget of "
+            f"{memory_budget.maximum_bytes} bytes and no spill directory is given"
+        )
+    if not os.path.exists(memory_budget.spill_directory):
+        os.makedirs(memory_budget.spill_directory)
+    spilled_array = np.lib.format.open_memmap(
+        os.path.join(memory_budget.spill_directory, f"{file_name}.npy"), mode="w+", dtype=np.float64, shape=shape
+    )
+    spilled_array[:] = np.nan
+    return spilled_array
+
+
+class SimulationResultsProvider:
+    _path_to_experiment: str
+    _path_to_mesh: str
+    _sample_time_step_width: int
+    _used_geomorphologic_module: bool
+    _memory_budget: Optional[MemoryBudget]
+    _mesh: Optional[GeoDataFrame]
+    _shared_mesh: Optional[SharedMesh]
+    _all_results: Optional[SimulationResultsShapes]
+
+    def __init__(
+        self,
+        path_to_experiment: str,
+        path_to_mesh: str,
+        sample_time_step_width: int,
+        used_geomorphologic_module: bool,
+        memory_budget: Optional[MemoryBudget] = None,
+        mesh: Optional[GeoDataFrame] = None,
+        shared_mesh: Optional[SharedMesh] = None,
+    ):
+        self._path_to_experiment = path_to_experiment
+        self._path_to_mesh = path_to_mesh
+        self._sample_time_step_width = sample_time_step_width
+        self._used_geomorphologic_module = used_geomorphologic_module
+        self._memory_budget = None if memory_budget is None else limit_memory_budget_to_available_memory(memory_budget)
+        self._mesh = mesh
+        self._shared_mesh = shared_mesh
+        self._all_results = None
+
+    @property
+    def mesh(self) -> GeoDataFrame:
+        if self._mesh is None and self._shared_mesh is not None:
+            self._mesh = self._shared_mesh.create_geo_data_frame()
+        elif self._mesh is None:
+            self._mesh = load_mesh_as_geo_data_frame(self._path_to_mesh)
+        return self._mesh
+
+    @property
+    def memory_budget(self) -> Optional[MemoryBudget]:
+        return self._memory_budget
+
+    @property
+    def path_to_experiment(self) -> str:
+        return self._path_to_experiment
+
+    @property
+    def mesh_fingerprint(self) -> Optional[str]:
+        return None if self._shared_mesh is None else self._shared_mesh.fingerprint
+
+    def preload(self) -> None:
+        if self._memory_budget is None and self._all_results is None:
+            self._all_results = process_h5_files_to_shape_files(
+                self._path_to_experiment,
+                path_to_mesh=self._path_to_mesh,
+                time_step=self._sample_time_step_width,
+                used_geomorphologic_module=self._used_geomorphologic_module,
+                base_data_frame=self.mesh,
+                mesh_fingerprint=self.mesh_fingerprint,
+            )
+
+    def load(self, time_stamps: Sequence[int]) -> SimulationResultsShapes:
+        if self._memory_budget is None:
+            self.preload()
+            return self._all_results
+        if len(time_stamps) > choose_number_of_time_steps_per_chunk(self._memory_budget, len(self.mesh)):
+            raise MemoryBudgetExceededError(f"{len(time_stamps)} time steps do not fit into {self._memory_budget}")
+        return process_h5_files_to_shape_files(
+            self._path_to_experiment,
+            path_to_mesh=self._path_to_mesh,
+            time_step=self._sample_time_step_width,
+            used_geomorphologic_module=self._used_geomorphologic_module,
+            time_stamps_to_load=time_stamps,
+            base_data_frame=self.mesh,
+            mesh_fingerprint=self.mesh_fingerprint,
+        )
+
+    def iterate_chunks(self, time_stamps: Sequence[int]) -> Iterator[tuple[list[int], SimulationResultsShapes]]:
+        if self._memory_budget is None:
+            yield list(time_stamps), self.load(time_stamps)
+            return
+        chunk_size = choose_number_of_time_steps_per_chunk(self._memory_budget, len(self.mesh))
+        for time_stamps_in_chunk in split_time_stamps_into_chunks(time_stamps, chunk_size):
+            results_for_chunk = self.load(time_stamps_in_chunk)
+            yield time_stamps_in_chunk, results_for_chunk
+            del results_for_chunk
+            gc.collect()
+
+    def release(self) -> None:
+        self._all_results = None
+        self._mesh = None
+        gc.collect()
@@ -0,0 +1,286 @@
+import json
+import os
+import warnings
+from typing import NamedTuple, Optional, Sequence
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from all_paths import PathsToJsonWithExperimentPath
+from extract_data.create_shape_files_from_simulation_results import (
+    SimulationResultsShapes,
+    load_mesh_as_geo_data_frame,
+    process_h5_files_to_shape_files,
+)
+from tools.geo_export import create_geometry_fingerprint, write_results_with_shared_mesh_geometry
+
+_PATH_TO_CACHE_FOLDER = os.path.join(r".\.checkpoints", "mesh_remapping")
+_FIELDS_TO_COMPARE = ("water_surface_elevation", "bottom_elevation", "water_depth", "flow_velocity")
+
+
+class MeshRemapping(NamedTuple):
+    overlap_area: sparse.csr_matrix
+    source_cell_area: np.ndarray
+    target_cell_area: np.ndarray
+
+
+def create_area_overlap_matrix(source_mesh: gpd.GeoDataFrame, target_mesh: gpd.GeoDataFrame) -> sparse.csr_matrix:
+    source_cells = gpd.GeoDataFrame(
+        {"source_position": np.arange(len(source_mesh))}, geometry=source_mesh.geometry.values, crs=source_mesh.crs
+    )
+    target_cells = gpd.GeoDataFrame(
+        {"target_position": np.arange(len(target_mesh))}, geometry=target_mesh.geometry.values, crs=target_mesh.crs
+    )
+    candidates = gpd.sjoin(target_cells, source_cells, how="inner", predicate="intersects")
+    target_position = candidates["target_position"].values
+    source_position = candidates["source_position"].values
+    overlap_area = (
+        gpd.GeoSeries(target_cells.geometry.values[target_position])
+        .intersection(gpd.GeoSeries(source_cells.geometry.values[source_position]))
+        .area.values
+    )
+    is_overlapping = overlap_area > 0
+    return sparse.csr_matrix(
+        (overlap_area[is_overlapping], (target_position[is_overlapping], source_position[is_overlapping])),
+        shape=(len(target_mesh), len(source_mesh)),
+    )
+
+
+def _get_path_to_cached_overlap_matrix(
+    source_mesh_fingerprint: str, target_mesh_fingerprint: str, path_to_cache_folder: str
+) -> str:
+    return os.path.join(path_to_cache_folder, f"overlap_{source_mesh_fingerprint}_{target_mesh_fingerprint}.npz")
+
+
+def create_mesh_remapping(
+    source_mesh: gpd.GeoDataFrame,
+    target_mesh: gpd.GeoDataFrame,
+    path_to_cache_folder: Optional[str] = None,
+    source_mesh_fingerprint: Optional[str] = None,
+    target_mesh_fingerprint: Optional[str] = None,
+) -> MeshRemapping:
+    path_to_cache_folder = _PATH_TO_CACHE_FOLDER if path_to_cache_folder is None else path_to_cache_folder
+    path = _get_path_to_cached_overlap_matrix(
+        create_geometry_fingerprint(source_mesh) if source_mesh_fingerprint is None else source_mesh_fingerprint,
+        create_geometry_fingerprint(target_mesh) if target_mesh_fingerprint is None else target_mesh_fingerprint,
+        path_to_cache_folder,
+    )
+    if os.path.exists(path):
+        overlap_area = sparse.load_npz(path).tocsr()
+    else:
+        overlap_area = create_area_overlap_matrix(source_mesh, target_mesh)
+        if not os.path.exists(path_to_cache_folder):
+            os.makedirs(path_to_cache_folder)
+        temporary_path = f"{os.path.splitext(path)[0]}.tmp.npz"
+        sparse.save_npz(temporary_path, overlap_area)
+        os.replace(temporary_path, path)
+    return MeshRemapping(
+        overlap_area=overlap_area,
+        source_cell_area=source_mesh.geometry.area.values,
+        target_cell_area=target_mesh.geometry.area.values,
+    )
+
+
+def invert_mesh_remapping(remapping: MeshRemapping) -> MeshRemapping:
+    return MeshRemapping(
+        overlap_area=remapping.overlap_area.transpose().tocsr(),
+        source_cell_area=remapping.target_cell_area,
+        target_cell_area=remapping.source_cell_area,
+    )
+
+
+def transfer_values_conservatively(remapping: MeshRemapping, values_on_source_mesh: np.ndarray) -> np.ndarray:
+    values_on_source_mesh = np.asarray(values_on_source_mesh, dtype=np.float64)
+    is_valid = ~np.isnan(values_on_source_mesh)
+    integral_on_target_mesh = remapping.overlap_area @ np.where(is_valid, values_on_source_mesh, 0.0)
+    covered_area_on_target_mesh = remapping.overlap_area @ is_valid.astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(covered_area_on_target_mesh > 0, integral_on_target_mesh / covered_area_on_target_mesh, np.nan)
+
+
+def calculate_fraction_of_target_cells_covered(remapping: MeshRemapping) -> np.ndarray:
+    covered_area = np.asarray(remapping.overlap_area.sum(axis=1)).reshape(-1)
+    return covered_area / remapping.target_cell_area
+
+
+def extract_fields_at_time_stamp(results: SimulationResultsShapes, time_stamp: int) -> dict[str, np.ndarray]:
+    water_surface_elevation = results.hydraulic_state[f"{time_stamp}-Value"].values.astype(np.float64)
+    bottom_elevation = results.bottom_elevation[f"{time_stamp}-BottomEl"].values.astype(np.float64)
+    return {
+        "water_surface_elevation": water_surface_elevation,
+        "bottom_elevation": bottom_elevation,
+        "water_depth": water_surface_elevation - bottom_elevation,
+        "flow_velocity": results.absolute_flow_velocity[f"{time_stamp}-Value"].values.astype(np.float64),
+    }
+
+
+def calculate_convergence_statistics(
+    reference_values: np.ndarray, compared_values: np.ndarray, cell_area: np.ndarray
+) -> dict[str, float]:
+    difference = compared_values - reference_values
+    is_valid = ~np.isnan(difference)
+    area = cell_area[is_valid]
+    difference = difference[is_valid]
+    total_area = float(np.sum(area))
+    if total_area == 0:
+        return {
+            "compared_area": 0.0,
+            "mean_difference": np.nan,
+            "mean_absolute_difference": np.nan,
+            "root_mean_square_difference": np.nan,
+            "maximum_absolute_difference": np.nan,
+            "relative_l2_difference": np.nan,
+        }
+    norm_of_reference = np.sqrt(np.sum(area * np.square(reference_values[is_valid])))
+    root_of_squared_difference = np.sqrt(np.sum(area * np.square(difference)))
+    return {
+        "compared_area": total_area,
+        "mean_difference": float(np.sum(area * difference) / total_area),
+        "mean_absolute_difference": float(np.sum(area * np.abs(difference)) / total_area),
+        "root_mean_square_difference": float(root_of_squared_difference / np.sqrt(total_area)),
+        "maximum_absolute_difference": float(np.max(np.abs(difference))),
+        "relative_l2_difference": (
+            float(root_of_squared_difference / norm_of_reference) if norm_of_reference > 0 else np.nan
+        ),
+    }
+
+
+def match_experiments_between_meshes(
+    path_to_experiments_mesh1: PathsToJsonWithExperimentPath, path_to_experiments_mesh2: PathsToJsonWithExperimentPath
+) -> list[tuple[str, str, str]]:
+    paths_per_experiment_id = []
+    for path_to_json in (path_to_experiments_mesh1, path_to_experiments_mesh2):
+        with open(path_to_json, "r") as json_file:
+            paths_per_experiment_id.append({os.path.split(path)[-1]: path for path in json.load(json_file)})
+    paths_mesh1, paths_mesh2 = paths_per_experiment_id
+    unmatched = sorted(set(paths_mesh1).symmetric_difference(paths_mesh2))
+    if unmatched:
+        warnings.warn(f"no matching experiment on the other mesh for {unmatched}")
+    return [
+        (experiment_id, paths_mesh1[experiment_id], paths_mesh2[experiment_id])
+        for experiment_id in paths_mesh1
+        if experiment_id in paths_mesh2
+    ]
+
+
+def compare_experiment_between_meshes(
+    remapping_mesh2_to_mesh1: MeshRemapping,
+    mesh1: gpd.GeoDataFrame,
+    mesh2: gpd.GeoDataFrame,
+    path_to_mesh1: str,
+    path_to_mesh2: str,
+    path_to_experiment_mesh1: str,
+    path_to_experiment_mesh2: str,
+    time_stamps: Sequence[int],
+    time_step: int,
+    used_geomorphologic_module: bool,
+    fingerprint_of_mesh1: Optional[str] = None,
+    fingerprint_of_mesh2: Optional[str] = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    results_per_mesh = [
+        process_h5_files_to_shape_files(
+            path_to_experiment,
+            path_to_mesh=path_to_mesh,
+            time_step=time_step,
+            used_geomorphologic_module=used_geomorphologic_module,
+            time_stamps_to_load=time_stamps,
+            base_data_frame=mesh,
+            mesh_fingerprint=mesh_fingerprint,
+        )
+        for path_to_experiment, path_to_mesh, mesh, mesh_fingerprint in (
+            (path_to_experiment_mesh1, path_to_mesh1, mesh1, fingerprint_of_mesh1),
+            (path_to_experiment_mesh2, path_to_mesh2, mesh2, fingerprint_of_mesh2),
+        )
+    ]
+    difference_maps = {}
+    statistics = []
+    for time_stamp in time_stamps:
+        fields_mesh1, fields_mesh2 = (extract_fields_at_time_stamp(results, time_stamp) for results in results_per_mesh)
+        for field in _FIELDS_TO_COMPARE:
+            transferred = transfer_values_conservatively(remapping_mesh2_to_mesh1, fields_mesh2[field])
+            difference_maps[f"{field}_{time_stamp}_mesh1"] = fields_mesh1[field]
+            difference_maps[f"{field}_{time_stamp}_mesh2"] = transferred
+            difference_maps[f"{field}_{time_stamp}_difference"] = transferred - fields_mesh1[field]
+            statistics.append(
+                {
+                    "time_step": time_stamp,
+                    "variable": field,
+                    **calculate_convergence_statistics(
+                        fields_mesh1[field], transferred, remapping_mesh2_to_mesh1.target_cell_area
+                    ),
+                }
+            )
+    return pd.DataFrame(difference_maps, index=mesh1.index), pd.DataFrame(statistics)
+
+
+def compare_scenarios_between_meshes(
+    path_to_experiments_mesh1: PathsToJsonWithExperimentPath,
+    path_to_experiments_mesh2: PathsToJsonWithExperimentPath,
+    path_to_mesh1: str,
+    path_to_mesh2: str,
+    time_stamps: Sequence[int],
+    time_step: int,
+    used_geomorphologic_module: bool,
+    path_to_output_folder: str,
+) -> pd.DataFrame:
+    mesh1 = load_mesh_as_geo_data_frame(path_to_mesh1)
+    mesh2 = load_mesh_as_geo_data_frame(path_to_mesh2)
+    fingerprint_of_mesh1 = create_geometry_fingerprint(mesh1)
+    fingerprint_of_mesh2 = create_geometry_fingerprint(mesh2)
+    remapping_mesh2_to_mesh1 = create_mesh_remapping(
+        mesh2, mesh1, source_mesh_fingerprint=fingerprint_of_mesh2, target_mesh_fingerprint=fingerprint_of_mesh1
+    )
+    all_statistics = []
+    for experiment_id, path_mesh1, path_mesh2 in match_experiments_between_meshes(
+        path_to_experiments_mesh1, path_to_experiments_mesh2
+    ):
+        print(experiment_id)
+        difference_maps, statistics = compare_experiment_between_meshes(
+            remapping_mesh2_to_mesh1,
+            mesh1,
+            mesh2,
+            path_to_mesh1,
+            path_to_mesh2,
+            path_mesh1,
+            path_mesh2,
+            time_stamps,
+            time_step,
+            used_geomorphologic_module,
+            fingerprint_of_mesh1=fingerprint_of_mesh1,
+            fingerprint_of_mesh2=fingerprint_of_mesh2,
+        )
+        write_results_with_shared_mesh_geometry(
+            difference_maps,
+            mesh1,
+            path_to_output_folder,
+            f"difference_map_{experiment_id}",
+            mesh_fingerprint=fingerprint_of_mesh1,
+        )
+        statistics.insert(0, "experiment_id", experiment_id)
+        all_statistics.append(statistics)
+    convergence_statistics = pd.concat(all_statistics, ignore_index=True) if all_statistics else pd.DataFrame()
+    convergence_statistics.to_csv(
+        os.path.join(path_to_output_folder, "convergence_statistics.csv"), sep=";", index=False
+    )
+    return convergence_statistics
+
+
+def main():
+    path_to_mesh1 = r"C:\Users\nflue\Documents\Masterarbeit\02_Data\04_Model_220511\04_Model\01_input_data\BF2020_Mesh\new_mesh_all_inputs\Project1_computational-mesh.2dm"
+    path_to_mesh2 = r"C:\Users\nflue\Documents\Masterarbeit\02_Data\04_Model_220620\04_Model\01_input_data\BF2020_Mesh\new_mesh_finer_01\Project1_computational-mesh.2dm"
+    compare_scenarios_between_meshes(
+        PathsToJsonWithExperimentPath.hydraulic_scenarios_mesh1,
+        PathsToJsonWithExperimentPath.hydraulic_scenarios_mesh2,
+        path_to_mesh1,
+        path_to_mesh2,
+        time_stamps=[0, 90000],
+        time_step=300,
+        used_geomorphologic_module=True,
+        path_to_output_folder=os.path.join("out", "mesh_convergence", "hydraulic_scenarios"),
+    )
+
+
+if __name__ == "__main__":
+    main()
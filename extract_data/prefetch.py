@@ -0,0 +1,127 @@
+import os
+import queue
+import threading
+import warnings
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+from extract_data.memory_budget import SimulationResultsProvider
+from extract_data.repacked_results import REPACKED_RESULTS_FILE_NAME
+from helpers.global_and_constant_values import GlobalConstants
+
+_BYTES_PER_READ = 16 * 1024**2
+_SECONDS_BETWEEN_STOP_CHECKS = 0.5
+_FILES_TO_WARM_UP = (GlobalConstants.results_h5_file_name, "results_aux.h5", REPACKED_RESULTS_FILE_NAME)
+
+
+class PrefetchedExperiment(NamedTuple):
+    path: str
+    results_provider: SimulationResultsProvider
+
+
+class _EndOfExperiments:
+    pass
+
+
+def warm_up_result_files(path_to_experiment: str, stop_event: Optional[threading.Event] = None) -> None:
+    for file_name in _FILES_TO_WARM_UP:
+        path = os.path.join(path_to_experiment, file_name)
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb", buffering=0) as result_file:
+            while result_file.read(_BYTES_PER_READ):
+                if stop_event is not None and stop_event.is_set():
+                    return
+
+
+def _prefetch_experiment(
+    path: str,
+    create_results_provider: Callable[[str], SimulationResultsProvider],
+    should_load: Callable[[str], bool],
+    stop_event: threading.Event,
+) -> PrefetchedExperiment:
+    results_provider = create_results_provider(path)
+    if not should_load(path):
+        return PrefetchedExperiment(path, results_provider)
+    try:
+        warm_up_result_files(path, stop_event)
+        if not stop_event.is_set():
+            results_provider.preload()
+    except Exception as exception:
+        warnings.warn(f"prefetching {path} failed, it is loaded again when it is evaluated: {exception!r}")
+        results_provider.release()
+    return PrefetchedExperiment(path, results_provider)
+
+
+def _acquire_unless_stopped(free_slots: threading.Semaphore, stop_event: threading.Event) -> bool:
+    while not stop_event.is_set():
+        if free_slots.acquire(timeout=_SECONDS_BETWEEN_STOP_CHECKS):
+            return True
+    return False
+
+
+def _fill_queue(
+    paths: Iterable[str],
+    create_results_provider: Callable[[str], SimulationResultsProvider],
+    should_load: Callable[[str], bool],
+    items: queue.Queue,
+    free_slots: threading.Semaphore,
+    stop_event: threading.Event,
+) -> None:
+    try:
+        remaining_paths = iter(paths)
+        while _acquire_unless_stopped(free_slots, stop_event):
+            path = next(remaining_paths, None)
+            if path is None:
+                return
+            item = _prefetch_experiment(path, create_results_provider, should_load, stop_event)
+            if stop_event.is_set():
+                item.results_provider.release()
+                return
+            items.put(item)
+    except BaseException as exception:
+        items.put(exception)
+    finally:
+        items.put(_EndOfExperiments)
+
+
+def _release_remaining_items(items: queue.Queue) -> None:
+    while True:
+        try:
+            item = items.get_nowait()
+        except queue.Empty:
+            return
+        if isinstance(item, PrefetchedExperiment):
+            item.results_provider.release()
+
+
+def prefetch_experiments(
+    paths: Iterable[str],
+    create_results_provider: Callable[[str], SimulationResultsProvider],
+    should_load: Callable[[str], bool] = lambda path: True,
+    prefetch_depth: int = 1,
+) -> Iterator[PrefetchedExperiment]:
+    if prefetch_depth < 1:
+        for path in paths:
+            yield PrefetchedExperiment(path, create_results_provider(path))
+        return
+    items = queue.Queue()
+    free_slots = threading.Semaphore(prefetch_depth)
+    stop_event = threading.Event()
+    worker = threading.Thread(
+        target=_fill_queue,
+        args=(paths, create_results_provider, should_load, items, free_slots, stop_event),
+        name="prefetch_experiments",
+        daemon=True,
+    )
+    worker.start()
+    try:
+        while (item := items.get()) is not _EndOfExperiments:
+            if isinstance(item, BaseException):
+                raise item
+            free_slots.release()
+            yield item
+    finally:
+        stop_event.set()
+        # a preload that already started cannot be interrupted, the worker releases its results once it returns
+        worker.join(timeout=_SECONDS_BETWEEN_STOP_CHECKS)
+        _release_remaining_items(items)
@@ -0,0 +1,209 @@
+import json
+import os
+from typing import Optional, Sequence, Union
+
+import h5py
+import numpy as np
+from geopandas import GeoDataFrame
+
+from all_paths import PathsToJsonWithExperimentPath
+from extract_data.shared_mesh import load_or_create_shared_mesh
+from helpers.global_and_constant_values import GlobalConstants
+from tools.geo_export import create_geometry_fingerprint
+
+REPACKED_RESULTS_FILE_NAME = "results_repacked.h5"
+_AUXILIARY_RESULTS_FILE_NAME = "results_aux.h5"
+_FORMAT_VERSION = 1
+_KEYS_ATTRIBUTE = "keys"
+_TARGET_BYTES_PER_CHUNK = 1024**2
+_MAXIMUM_BYTES_OF_CHUNK_CACHE = 256 * 1024**2
+_TIME_SERIES_GROUPS_PER_FILE = {
+    GlobalConstants.results_h5_file_name: (
+        "RESULTS/CellsAll/HydState",
+        "RESULTS/CellsAll/BottomEl",
+        "RESULTS/CellsAll/ChezyCoe",
+    ),
+    _AUXILIARY_RESULTS_FILE_NAME: ("flow_velocity", "flow_velocity_abs"),
+}
+
+
+def _create_source_signature(path_to_experiment: str) -> str:
+    signature = {}
+    for file_name in _TIME_SERIES_GROUPS_PER_FILE:
+        status = os.stat(os.path.join(path_to_experiment, file_name))
+        signature[file_name] = [status.st_size, status.st_mtime_ns]
+    return json.dumps(signature, sort_keys=True)
+
+
+def choose_chunk_shape(
+    number_of_time_steps: int, number_of_cells: int, number_of_components: int, time_steps_per_chunk: int = 32
+) -> tuple[int, int, int]:
+    time_steps_per_chunk = max(1, min(time_steps_per_chunk, number_of_time_steps))
+    cells_per_chunk = _TARGET_BYTES_PER_CHUNK // (time_steps_per_chunk * number_of_components * 8)
+    return time_steps_per_chunk, max(1, min(cells_per_chunk, number_of_cells)), number_of_components
+
+
+def _repack_group(source_group: h5py.Group, target_file: h5py.File, name: str, time_steps_per_chunk: int) -> None:
+    keys = sorted(int(key) for key in source_group.keys())
+    if not keys:
+        return
+    first_step = source_group[str(keys[0])]
+    number_of_cells = first_step.shape[0]
+    number_of_components = int(np.prod(first_step.shape[1:], dtype=np.int64))
+    chunk_shape = choose_chunk_shape(len(keys), number_of_cells, number_of_components, time_steps_per_chunk)
+    dataset = target_file.create_dataset(
+        name,
+        shape=(len(keys), number_of_cells, number_of_components),
+        dtype=first_step.dtype,
+        chunks=chunk_shape,
+        compression="gzip",
+        compression_opts=4,
+        shuffle=True,
+    )
+    dataset.attrs[_KEYS_ATTRIBUTE] = np.asarray(keys, dtype=np.int64)
+    for start in range(0, len(keys), chunk_shape[0]):
+        keys_in_block = keys[start : start + chunk_shape[0]]
+        dataset[start : start + len(keys_in_block)] = np.stack(
+            [np.asarray(source_group[str(key)]).reshape(number_of_cells, -1) for key in keys_in_block]
+        )
+
+
+def repack_experiment_results(path_to_experiment: str, mesh_fingerprint: str, time_steps_per_chunk: int = 32) -> str:
+    path = os.path.join(path_to_experiment, REPACKED_RESULTS_FILE_NAME)
+    temporary_path = os.path.join(path_to_experiment, f".{REPACKED_RESULTS_FILE_NAME}.tmp")
+    source_signature = _create_source_signature(path_to_experiment)
+    with h5py.File(temporary_path, "w") as target_file:
+        target_file.attrs["format_version"] = _FORMAT_VERSION
+        target_file.attrs["source_signature"] = source_signature
+        target_file.attrs["mesh_fingerprint"] = mesh_fingerprint
+        for file_name, group_names in _TIME_SERIES_GROUPS_PER_FILE.items():
+            with h5py.File(os.path.join(path_to_experiment, file_name), "r") as source_file:
+                for group_name in group_names:
+                    if group_name in source_file:
+                        _repack_group(source_file[group_name], target_file, group_name, time_steps_per_chunk)
+    os.replace(temporary_path, path)
+    return path
+
+
+class RepackedStep:
+    _dataset: h5py.Dataset
+    _position: int
+
+    def __init__(self, dataset: h5py.Dataset, position: int):
+        self._dataset = dataset
+        self._position = position
+
+    def __getitem__(self, selection) -> np.ndarray:
+        if not isinstance(selection, tuple):
+            selection = (selection,)
+        if not selection:
+            return self._dataset[self._position]
+        return self._dataset[(self._position, *selection)]
+
+
+class RepackedGroup:
+    _dataset: h5py.Dataset
+    _position_per_key: dict[int, int]
+
+    def __init__(self, dataset: h5py.Dataset):
+        self._dataset = dataset
+        self._position_per_key = {int(key): position for position, key in enumerate(dataset.attrs[_KEYS_ATTRIBUTE])}
+
+    def keys(self) -> list[str]:
+        return [str(key) for key in self._position_per_key]
+
+    def __getitem__(self, key: str) -> RepackedStep:
+        return RepackedStep(self._dataset, self._position_per_key[int(key)])
+
+    def _get_positions(self, keys: Sequence[int]) -> np.ndarray:
+        return np.array([self._position_per_key[int(key)] for key in keys], dtype=np.int64)
+
+    def read_steps(self, keys: Sequence[int]) -> np.ndarray:
+        positions = self._get_positions(keys)
+        if len(positions) == 0:
+            return np.empty((0, *self._dataset.shape[1:]), dtype=self._dataset.dtype)
+        if np.all(np.diff(positions) == 1):
+            return self._dataset[positions[0] : positions[-1] + 1]
+        return self._dataset[positions]
+
+    def read_cells(self, keys: Sequence[int], sorted_cells: np.ndarray) -> np.ndarray:
+        positions = self._get_positions(keys)
+        if len(positions) == 0:
+            return np.empty((0, len(sorted_cells), self._dataset.shape[2]), dtype=self._dataset.dtype)
+        return self._dataset[positions[0] : positions[-1] + 1, sorted_cells][positions - positions[0]]
+
+
+class RepackedResults:
+    _file: h5py.File
+
+    def __init__(self, path: str):
+        self._file = h5py.File(path, "r", rdcc_nbytes=_MAXIMUM_BYTES_OF_CHUNK_CACHE, rdcc_nslots=100003, rdcc_w0=1.0)
+
+    def __enter__(self) -> "RepackedResults":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def mesh_fingerprint(self) -> Optional[str]:
+        return self._file.attrs.get("mesh_fingerprint")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._file
+
+    def get(self, name: str) -> RepackedGroup:
+        return RepackedGroup(self._file[name])
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def is_repacked_store_up_to_date(
+    path_to_experiment: str, mesh: Optional[GeoDataFrame] = None, mesh_fingerprint: Optional[str] = None
+) -> bool:
+    path = os.path.join(path_to_experiment, REPACKED_RESULTS_FILE_NAME)
+    if not os.path.exists(path):
+        return False
+    with h5py.File(path, "r") as repacked_file:
+        if repacked_file.attrs.get("format_version") != _FORMAT_VERSION:
+            return False
+        if repacked_file.attrs.get("source_signature") != _create_source_signature(path_to_experiment):
+            return False
+        stored_mesh_fingerprint = repacked_file.attrs.get("mesh_fingerprint")
+    if mesh is None and mesh_fingerprint is None:
+        return True
+    return stored_mesh_fingerprint == (
+        create_geometry_fingerprint(mesh) if mesh_fingerprint is None else mesh_fingerprint
+    )
+
+
+def open_repacked_results_if_available(
+    path_to_experiment: str, mesh: Optional[GeoDataFrame] = None, mesh_fingerprint: Optional[str] = None
+) -> Optional[RepackedResults]:
+    if not is_repacked_store_up_to_date(path_to_experiment, mesh, mesh_fingerprint):
+        return None
+    return RepackedResults(os.path.join(path_to_experiment, REPACKED_RESULTS_FILE_NAME))
+
+
+def select_results_group(
+    repacked_results: Optional[RepackedResults], h5_file: h5py.File, name: str
+) -> Union[RepackedGroup, h5py.Group]:
+    if repacked_results is not None and name in repacked_results:
+        return repacked_results.get(name)
+    return h5_file[name]
+
+
+def main():
+    path_to_mesh = r"C:\Users\nflue\Documents\Masterarbeit\02_Data\04_Model_220620\04_Model\01_input_data\BF2020_Mesh\new_mesh_finer_01\Project1_computational-mesh.2dm"
+    mesh_fingerprint = load_or_create_shared_mesh(path_to_mesh).fingerprint
+    with open(PathsToJsonWithExperimentPath.hydraulic_scenarios_126000_mesh2, "r") as json_file:
+        paths_to_experiments = json.load(json_file)
+    for path_to_experiment in paths_to_experiments:
+        if is_repacked_store_up_to_date(path_to_experiment, mesh_fingerprint=mesh_fingerprint):
+            continue
+        print(repack_experiment_results(path_to_experiment, mesh_fingerprint))
+
+
+if __name__ == "__main__":
+    main()
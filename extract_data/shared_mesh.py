@@ -0,0 +1,184 @@
+import hashlib
+import os
+import shutil
+from typing import NamedTuple, Optional
+
+import geopandas as gpd
+import numpy as np
+import py2dm
+from shapely.geometry import Polygon
+
+from tools.atomic_files import write_file_atomically
+from tools.geo_export import create_geometry_fingerprint
+
+_PATH_TO_CACHE_FOLDER = os.path.join(r".\.checkpoints", "shared_mesh")
+_FINGERPRINT_FILE_NAME = "fingerprint.txt"
+_ARRAY_NAMES = (
+    "node_coordinates",
+    "node_positions_of_cells",
+    "material_index",
+    "cell_area",
+    "cell_centroid",
+    "first_adjacent_cell",
+    "second_adjacent_cell",
+)
+
+
+class CellAdjacency(NamedTuple):
+    first_cell: np.ndarray
+    second_cell: np.ndarray
+    number_of_cells: int
+
+
+def create_cell_adjacency(node_indices_of_cells: np.ndarray) -> CellAdjacency:
+    number_of_cells, nodes_per_cell = node_indices_of_cells.shape
+    edges = np.stack([node_indices_of_cells, np.roll(node_indices_of_cells, -1, axis=1)], axis=-1).reshape(-1, 2)
+    edges.sort(axis=1)
+    cell_of_edge = np.repeat(np.arange(number_of_cells), nodes_per_cell)
+    order = np.lexsort((edges[:, 1], edges[:, 0]))
+    sorted_edges = edges[order]
+    is_shared_with_next = np.all(sorted_edges[1:] == sorted_edges[:-1], axis=1)
+    return CellAdjacency(
+        first_cell=cell_of_edge[order[:-1][is_shared_with_next]],
+        second_cell=cell_of_edge[order[1:][is_shared_with_next]],
+        number_of_cells=number_of_cells,
+    )
+
+
+def _read_mesh_arrays(path_to_mesh: str) -> dict[str, np.ndarray]:
+    with py2dm.Reader(path_to_mesh) as mesh:
+        node_ids = np.array([node.id for node in mesh.nodes], dtype=np.int64)
+        node_coordinates = np.array([node.pos for node in mesh.nodes], dtype=np.float64)
+        node_ids_of_cells = [element.nodes for element in mesh.elements]
+        material_index = np.array([element.materials[0] for element in mesh.elements], dtype=np.int64)
+    if len({len(node_ids_of_element) for node_ids_of_element in node_ids_of_cells}) > 1:
+        raise ValueError(f"{path_to_mesh} mixes elements with a different number of nodes")
+    order_of_node_ids = np.argsort(node_ids)
+    node_positions_of_cells = order_of_node_ids[
+        np.searchsorted(node_ids, np.array(node_ids_of_cells, dtype=np.int64), sorter=order_of_node_ids)
+    ]
+    origin_of_cells = node_coordinates[node_positions_of_cells[:, 0], :2]
+    corners = node_coordinates[node_positions_of_cells, :2] - origin_of_cells[:, None]
+    next_corners = np.roll(corners, -1, axis=1)
+    cross_product = corners[..., 0] * next_corners[..., 1] - next_corners[..., 0] * corners[..., 1]
+    doubled_signed_area = np.sum(cross_product, axis=1)
+    cell_area = np.abs(doubled_signed_area) / 2
+    cell_centroid = origin_of_cells + np.sum((corners + next_corners) * cross_product[..., None], axis=1) / (
+        3 * doubled_signed_area[:, None]
+    )
+    cell_adjacency = create_cell_adjacency(node_positions_of_cells)
+    return {
+        "node_coordinates": node_coordinates,
+        "node_positions_of_cells": node_positions_of_cells,
+        "material_index": material_index,
+        "cell_area": cell_area,
+        "cell_centroid": cell_centroid,
+        "first_adjacent_cell": cell_adjacency.first_cell,
+        "second_adjacent_cell": cell_adjacency.second_cell,
+    }
+
+
+def _get_path_to_shared_mesh(path_to_mesh: str, path_to_cache_folder: str) -> str:
+    status = os.stat(path_to_mesh)
+    digest = hashlib.sha1(repr((os.path.abspath(path_to_mesh), status.st_size, status.st_mtime_ns)).encode())
+    stem = os.path.splitext(os.path.basename(path_to_mesh))[0]
+    return os.path.join(path_to_cache_folder, f"{stem}_{digest.hexdigest()[:16]}")
+
+
+def create_shared_mesh(path_to_mesh: str, path_to_cache_folder: Optional[str] = None) -> str:
+    path_to_cache_folder = _PATH_TO_CACHE_FOLDER if path_to_cache_folder is None else path_to_cache_folder
+    path = _get_path_to_shared_mesh(path_to_mesh, path_to_cache_folder)
+    if os.path.exists(path):
+        return path
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(temporary_path, exist_ok=True)
+    for name, values in _read_mesh_arrays(path_to_mesh).items():
+        np.save(os.path.join(temporary_path, f"{name}.npy"), values)
+    try:
+        os.replace(temporary_path, path)
+    except OSError:
+        if not os.path.exists(path):
+            raise
+        shutil.rmtree(temporary_path)
+    return path
+
+
+class SharedMesh:
+    _path: str
+    _arrays: dict[str, np.ndarray]
+    _geo_data_frame: Optional[gpd.GeoDataFrame]
+    _fingerprint: Optional[str]
+
+    def __init__(self, path: str):
+        self._path = path
+        self._arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in _ARRAY_NAMES}
+        self._geo_data_frame = None
+        self._fingerprint = None
+
+    def __getstate__(self) -> str:
+        return self._path
+
+    def __setstate__(self, path: str) -> None:
+        self.__init__(path)
+
+    def __len__(self) -> int:
+        return len(self.material_index)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def node_coordinates(self) -> np.ndarray:
+        return self._arrays["node_coordinates"]
+
+    @property
+    def node_positions_of_cells(self) -> np.ndarray:
+        return self._arrays["node_positions_of_cells"]
+
+    @property
+    def material_index(self) -> np.ndarray:
+        return self._arrays["material_index"]
+
+    @property
+    def cell_area(self) -> np.ndarray:
+        return self._arrays["cell_area"]
+
+    @property
+    def cell_centroid(self) -> np.ndarray:
+        return self._arrays["cell_centroid"]
+
+    @property
+    def cell_adjacency(self) -> CellAdjacency:
+        return CellAdjacency(
+            first_cell=self._arrays["first_adjacent_cell"],
+            second_cell=self._arrays["second_adjacent_cell"],
+            number_of_cells=len(self),
+        )
+
+    @property
+    def fingerprint(self) -> str:
+        if self._fingerprint is not None:
+            return self._fingerprint
+        path_to_fingerprint = os.path.join(self._path, _FINGERPRINT_FILE_NAME)
+        if os.path.exists(path_to_fingerprint):
+            with open(path_to_fingerprint, "r") as fingerprint_file:
+                self._fingerprint = fingerprint_file.read().strip()
+        else:
+            self._fingerprint = create_geometry_fingerprint(self.create_geo_data_frame())
+            write_file_atomically(path_to_fingerprint, self._fingerprint.encode())
+        return self._fingerprint
+
+    def create_geo_data_frame(self) -> gpd.GeoDataFrame:
+        if self._geo_data_frame is None:
+            rings = self.node_coordinates[self.node_positions_of_cells]
+            self._geo_data_frame = gpd.GeoDataFrame(
+                data={"index": np.arange(len(self), dtype=np.int64), "material_index": np.array(self.material_index)},
+                geometry=[Polygon(ring) for ring in rings],
+                crs=2056,
+            )
+        return self._geo_data_frame
+
+
+def load_or_create_shared_mesh(path_to_mesh: str, path_to_cache_folder: Optional[str] = None) -> SharedMesh:
+    return SharedMesh(create_shared_mesh(path_to_mesh, path_to_cache_folder))
@@ -1,75 +1,40 @@
 import dataclasses
+import gc
 import json
 import os
-import pickle
+import warnings
 from collections import defaultdict
-from typing import NamedTuple, Iterable, Sized
+from typing import TYPE_CHECKING, Collection, NamedTuple, Iterable, Sized, Optional, Sequence, Type
 
-import geopandas as gpd
-import matplotlib.colors
-import matplotlib.pyplot as plt
 import pandas as pd
-from geopandas import GeoDataFrame
 from tqdm import tqdm
-from plotly import graph_objects as go
 
 from all_paths import PathsToJsonWithExperimentPath
-from csv_logging.calculate_entries import (
-    goodness_of_fit_for_bottom_elevation,
-    goodness_of_fit_for_velocity,
-    goodness_of_fit_for_water_depth,
-    goodness_of_fit_for_three_d_analysis,
-)
 from csv_logging.csvlogger import (
+    BaseLogEntry,
     CSVLogger,
     GoodnessOfFitForInitialVelocity,
     GoodnessOfFitForInitialBottomElevation,
     GoodnessOfFitForInitialWaterDepth,
     GoodnessOfFitFor3dEvaluation,
+    GoodnessOfFitFor3dEvaluationOnGrid,
     ShearStress,
     ScenarioEvaluationHmid,
 )
-from evaluation_runner.analysis_calibration.three_dimensional import (
-    create_union_of_dod_and_simulated_dz_mesh,
-    clip_mesh_with_polygons,
-)
-from evaluation_runner.profiles.evaluate_profiles import (
-    create_histogram_with_mesh_values,
-    evaluate_points_along_profiles,
-    create_scatter_plot,
-    create_scatter_plot_for_velocities,
-)
-from evaluation_runner.scenario_evaluation.evaluate_water_depth_change import (
-    calculate_mean_de_watering_speed_over_time,
-    DeWateringSpeedCalculationParameters,
-)
-from evaluation_runner.scenario_evaluation.final_scenario_evaluation_log_entries import (
-    calculate_and_log_hmid_statistics,
-)
-from evaluation_runner.scenario_evaluation.shield_stress import (
-    calculate_shear_stress_coefficients,
-    ParametersForShearStressEvaluation,
-    calculate_and_log_shear_stress_statistics,
-    create_parameters_for_shear_stress,
-    select_area_where_guenter_criterion_is_reached_chezy,
-    select_area_where_crit_shield_stress_is_reached_with_chezy,
-    select_area_where_crit_tau_is_reached,
-)
-from evaluation_runner.scenario_evaluation.visualizations_shear_stress import (
-    another_function_that_will_sexually_embarrass_me,
-)
-from tools.figure_generator import create_figure_if_none_given
-from extract_data.create_shape_files_from_simulation_results import process_h5_files_to_shape_files
-from extract_data.summarising_mesh import (
-    create_default_state_to_name_in_shape_file_mapping,
-    create_mesh_with_before_and_after_flood_data,
-    assign_requested_values_from_summarising_mesh_to_point,
-    create_mesh_from_mapped_values,
-    StateToNameInShapeFileMapping,
-)
+from evaluation_runner.checkpoints import CheckpointStore
+from evaluation_runner.work_queue import WorkQueue
+from evaluation_runner.command_line import DEFAULT_STAGES, load_configuration, run_evaluation
+from tools.output_sink import OutputSink, write_output
 from profile_creation.containers import BeforeOrAfterFloodScenario
-from script_for_profile_creation import create_paths
-from utils.loading import load_data_with_crs_2056
+
+if TYPE_CHECKING:
+    from geopandas import GeoDataFrame
+
+    from evaluation_runner.scenario_evaluation.shield_stress import ParametersForShearStressEvaluation
+    from extract_data.memory_budget import MemoryBudget
+    from extract_data.summarising_mesh import StateToNameInShapeFileMapping
+    from tools.reference_layers import ReferenceLayerRegistry
+    from tools.render_queue import RenderQueue
 
 
 def get_json_with_all_result_paths(path_to_all_experiments_to_evaluate: PathsToJsonWithExperimentPath) -> list[str]:
@@ -77,6 +42,24 @@ def get_json_with_all_result_paths(path_to_all_experiments_to_evaluate: PathsToJ
         return list(json.load(json_file))
 
 
+def select_valid_experiments(
+    paths_to_experiments: list[str],
+    path_to_manifest: str,
+    number_of_cells: int,
+    require_chezy_coefficients: bool,
+) -> list[str]:
+    from tools.unify_experiments import load_or_scan_experiments, select_experiments_to_evaluate
+
+    selected_paths, broken_experiments = select_experiments_to_evaluate(
+        load_or_scan_experiments(paths_to_experiments, path_to_manifest),
+        number_of_cells=number_of_cells,
+        require_chezy_coefficients=require_chezy_coefficients,
+    )
+    for path_to_experiment, problems in broken_experiments.items():
+        warnings.warn(f"skipping {path_to_experiment}: {'; '.join(problems)}")
+    return selected_paths
+
+
 def inclusive_range(start: int, stop: int, step: int) -> Iterable[int]:
     for i in range(start, stop, step):
         yield i
@@ -107,8 +90,16 @@ def _map_material_index_to_name(index: int) -> str:
 
 
 def make_stacked_bar_chart_of_mat_index(
-    selection_where_flow_velocity_and_wd_are_too_small: GeoDataFrame, tau_bins: list[float]
+    selection_where_flow_velocity_and_wd_are_too_small: pd.DataFrame,
+    tau_bins: list[float],
+    render_queue: Optional["RenderQueue"] = None,
+    output_sink: Optional[OutputSink] = None,
 ) -> None:
+    from plotly import graph_objects as go
+
+    from tools.figure_generator import create_figure_if_none_given
+    from tools.render_queue import save_figure_as_image
+
     _length_per_group: float = 10
     _gap_between_groups: float = 2.5
     _classes_per_group: int = len(tau_bins)
@@ -145,13 +136,13 @@ def make_stacked_bar_chart_of_mat_index(
             x_tick_labels.append(f"{tau_chezy_bin}")
             location = outer_x_location + inner_x_location
             x_tick_location.append(location)
-            total_at_this_position.append((location, inner_group.area.sum()))
+            total_at_this_position.append((location, inner_group["area"].sum()))
             for material_name, group in inner_group.groupby("material_name"):
                 name = f"{discharge}_{tau_chezy_bin}_{material_name}"
                 fig.add_trace(
                     go.Bar(
                         x=[location, outer_x_location],
-                        y=[group.area.sum()],
+                        y=[group["area"].sum()],
                         name=name,
                         marker_color=color_map[material_name],
                         showlegend=False,
@@ -160,12 +151,12 @@ def make_stacked_bar_chart_of_mat_index(
                 )
 
     summary = {
-        tuple(name): group.area.sum()
+        tuple(name): group["area"].sum()
         for name, group in selection_where_flow_velocity_and_wd_are_too_small.groupby(
             ["discharge", "tau_chezy_bin", "material_name"]
         )
     }
-    pd.DataFrame(data=summary, index=[0]).to_csv("dump.csv", sep=";")
+    write_output("dump.csv", pd.DataFrame(data=summary, index=[0]).to_csv, "dump.csv", sep=";", output_sink=output_sink)
 
     fig.update_layout(xaxis=dict(ticktext=x_tick_labels, tickvals=x_tick_location, tickangle=-90))
     fig.update_xaxes(categoryorder="array", categoryarray=["water", "vegetation", "gravel"])
@@ -188,12 +179,14 @@ def make_stacked_bar_chart_of_mat_index(
             textfont=dict(size=12),
         )
     )
-    fig.write_image(
+    save_figure_as_image(
+        fig,
         "C:\\Users\\nflue\\Documents\\Masterarbeit\\03_Projects\\MasterThesis\\BasementEvaluations\\out\\plots_shieldstress\\stacked_material_index.svg",
         format="svg",
         width=1200,
         height=900,
         scale=2,
+        render_queue=render_queue,
     )
 
     fig.show()
@@ -201,245 +194,722 @@ def make_stacked_bar_chart_of_mat_index(
 
 def evaluate_simulation_on_given_points(
     path_to_all_experiments_to_evaluate: PathsToJsonWithExperimentPath,
-    evaluation_points: GeoDataFrame,
+    evaluation_points: "GeoDataFrame",
     path_to_mesh: str,
     flood_scenario: BeforeOrAfterFloodScenario,
     path_to_dod_as_polygon: str,
     paths_to_polygon_as_area_of_interest: tuple[str, ...],
     path_to_folder_containing_points_with_lines: str,
     simulation_time_in_seconds: int,
-    evaluation_parameters_for_shear_stress: ParametersForShearStressEvaluation,
+    evaluation_parameters_for_shear_stress: "ParametersForShearStressEvaluation",
     sample_time_step_width: int,
+    memory_budget: Optional["MemoryBudget"] = None,
+    resume: bool = False,
+    reset_checkpoints: bool = False,
+    stream_logs: bool = True,
+    flush_logs_every_n_entries: int = 1,
+    worker_id: Optional[str] = None,
+    write_parquet_logs: bool = True,
+    update_catalog: bool = True,
+    path_to_catalog: Optional[str] = None,
+    share_mesh_geometry_in_outputs: bool = True,
+    render_figures_in_background: bool = True,
+    number_of_render_workers: Optional[int] = None,
+    path_to_dod_raster: Optional[str] = None,
+    prefetch_depth: int = 1,
+    write_outputs_in_background: bool = True,
+    work_queue: Optional[WorkQueue] = None,
+    stages: Collection[str] = DEFAULT_STAGES,
+    create_figures: bool = True,
+    validate_experiments: bool = True,
+    reference_layers: Optional["ReferenceLayerRegistry"] = None,
 ):
-    logger_hmid = CSVLogger(ScenarioEvaluationHmid)
-    logger_shear_stress = CSVLogger(ShearStress)
-    logger_goodness_of_fit_for_bottom_elevation = CSVLogger(GoodnessOfFitForInitialBottomElevation)
-    logger_goodness_of_fit_for_water_depth = CSVLogger(GoodnessOfFitForInitialWaterDepth)
-    logger_goodness_of_fit_for_velocity = CSVLogger(GoodnessOfFitForInitialVelocity)
-    logger_goodness_of_fit_for_three_d_evaluation = CSVLogger(GoodnessOfFitFor3dEvaluation)
+    from evaluation_runner.all_gps_points.gps_points_store import create_path_to_gps_points_store, write_gps_points_once
+    from extract_data.memory_budget import SimulationResultsProvider
+    from extract_data.prefetch import prefetch_experiments
+    from extract_data.shared_mesh import load_or_create_shared_mesh
+    from extract_data.summarising_mesh import (
+        create_default_state_to_name_in_shape_file_mapping,
+        create_mesh_with_before_and_after_flood_data,
+    )
+    from tools.reference_layers import ReferenceLayerRegistry
+
+    if work_queue is not None and not stream_logs:
+        raise ValueError("evaluating from a work queue needs streamed logs to write one shard per worker")
+    if work_queue is not None and worker_id is None:
+        worker_id = work_queue.worker_id
+    if reference_layers is None:
+        reference_layers = ReferenceLayerRegistry()
+    log_file_names = create_log_file_names(flood_scenario)
+    streaming = LogStreamingParameters(
+        stream_logs=stream_logs, flush_every_n_entries=flush_logs_every_n_entries, worker_id=worker_id
+    )
+    logger_hmid = create_logger(ScenarioEvaluationHmid, log_file_names.hmid, streaming)
+    logger_shear_stress = create_logger(ShearStress, log_file_names.shear_stress, streaming)
+    logger_goodness_of_fit_for_bottom_elevation = create_logger(
+        GoodnessOfFitForInitialBottomElevation, log_file_names.bottom_elevation, streaming
+    )
+    logger_goodness_of_fit_for_water_depth = create_logger(
+        GoodnessOfFitForInitialWaterDepth, log_file_names.water_depth, streaming
+    )
+    logger_goodness_of_fit_for_velocity = create_logger(
+        GoodnessOfFitForInitialVelocity, log_file_names.velocity, streaming
+    )
+    logger_goodness_of_fit_for_three_d_evaluation = create_logger(
+        GoodnessOfFitFor3dEvaluation, log_file_names.three_d_evaluation, streaming
+    )
+    logger_goodness_of_fit_for_three_d_evaluation_on_grid = create_logger(
+        GoodnessOfFitFor3dEvaluationOnGrid, log_file_names.three_d_evaluation_on_grid, streaming
+    )
 
     logger_triple = GpsPointsLoggerTriple(
         logger_goodness_of_fit_for_velocity=logger_goodness_of_fit_for_velocity,
         logger_goodness_of_fit_for_water_depth=logger_goodness_of_fit_for_water_depth,
         logger_goodness_of_fit_for_bottom_elevation=logger_goodness_of_fit_for_bottom_elevation,
     )
-
-    all_paths_to_experiment_results = get_json_with_all_result_paths(path_to_all_experiments_to_evaluate)
-    before_flood_mapping = create_default_state_to_name_in_shape_file_mapping(0)
-    after_flood_mapping = create_default_state_to_name_in_shape_file_mapping(simulation_time_in_seconds)
-    time_stamps_to_evaluate_individually = list(
-        inclusive_range(start=0, stop=simulation_time_in_seconds, step=sample_time_step_width)
+    loggers_with_file_names = (
+        (logger_hmid, log_file_names.hmid),
+        (logger_shear_stress, log_file_names.shear_stress),
+        (logger_goodness_of_fit_for_bottom_elevation, log_file_names.bottom_elevation),
+        (logger_goodness_of_fit_for_water_depth, log_file_names.water_depth),
+        (logger_goodness_of_fit_for_velocity, log_file_names.velocity),
+        (logger_goodness_of_fit_for_three_d_evaluation, log_file_names.three_d_evaluation),
+        (logger_goodness_of_fit_for_three_d_evaluation_on_grid, log_file_names.three_d_evaluation_on_grid),
     )
-
-    for path in all_paths_to_experiment_results:
-        experiment_id = os.path.split(path)[-1]
-        resulting_geo_data_frames = process_h5_files_to_shape_files(
-            path, path_to_mesh=path_to_mesh, time_step=sample_time_step_width, used_geomorphologic_module=True
+    all_loggers = tuple(logger for logger, _ in loggers_with_file_names)
+    output_sink = OutputSink() if write_outputs_in_background else None
+    render_queue = None
+    try:
+        checkpoint_store = CheckpointStore(
+            run_name=_derive_run_name(path_to_all_experiments_to_evaluate, flood_scenario),
+            resume=resume,
+            output_sink=output_sink,
+            stages=stages,
+            reset=reset_checkpoints,
         )
 
-        if do_de_watering_speed_analysis := False:
-            meshes_to_unify = []
-            de_watering_parameters = DeWateringSpeedCalculationParameters(
-                exclude_water_depth_above=1.0,
-                exclude_water_depth_below=0.1,
-                time_stamps_to_evaluate_change_on=time_stamps_to_evaluate_individually,
-            )
-            for time_stamp in tqdm(time_stamps_to_evaluate_individually):
-                mapping_for_step = create_default_state_to_name_in_shape_file_mapping(time_stamp)
-                mesh_for_this_time_step = create_mesh_from_mapped_values(resulting_geo_data_frames, mapping_for_step)
-                meshes_to_unify.append(mesh_for_this_time_step)
-            meshes_to_unify.reverse()
-            mesh_with_all_time_steps = meshes_to_unify.pop()
-            for mesh in tqdm(reversed(meshes_to_unify)):
-                for column in filter(lambda x: x != "geometry", mesh.columns.values.tolist()):
-                    mesh_with_all_time_steps[column] = mesh[column]
-            mesh_with_all_time_steps = mesh_with_all_time_steps.copy()
-
-            dewatering_mesh = calculate_mean_de_watering_speed_over_time(
-                mesh_with_all_time_steps, de_watering_parameters
+        shared_mesh = load_or_create_shared_mesh(path_to_mesh)
+        mesh = shared_mesh.create_geo_data_frame()
+        all_paths_to_experiment_results = get_json_with_all_result_paths(path_to_all_experiments_to_evaluate)
+        if validate_experiments:
+            from tools.unify_experiments import get_path_to_manifest
+
+            all_paths_to_experiment_results = select_valid_experiments(
+                all_paths_to_experiment_results,
+                get_path_to_manifest(path_to_all_experiments_to_evaluate),
+                number_of_cells=len(shared_mesh),
+                require_chezy_coefficients="individual_evaluations" in stages,
             )
+        if work_queue is not None:
+            work_queue.populate(all_paths_to_experiment_results)
+            all_paths_to_experiment_results = work_queue.iterate_claimed_experiments()
+        before_flood_mapping = create_default_state_to_name_in_shape_file_mapping(0)
+        after_flood_mapping = create_default_state_to_name_in_shape_file_mapping(simulation_time_in_seconds)
+        time_stamps_to_evaluate_individually = list(
+            inclusive_range(start=0, stop=simulation_time_in_seconds, step=sample_time_step_width)
+        )
 
-            condition_dewatering_speed_very_big = dewatering_mesh["avg_cm/h"] < -30
-            condition_dewatering_speed_big = (dewatering_mesh["avg_cm/h"] < -20) & (dewatering_mesh["avg_cm/h"] >= -30)
-            condition_dewatering_speed_moderate = (dewatering_mesh["avg_cm/h"] < -10) & (
-                dewatering_mesh["avg_cm/h"] >= -20
-            )
-            condition_dewatering_speed_small = (dewatering_mesh["avg_cm/h"] < 0) & (dewatering_mesh["avg_cm/h"] >= -10)
-
-            dewatering_mesh["speed"] = None
-            dewatering_mesh.loc[condition_dewatering_speed_small, "speed"] = "0 - 10"
-            dewatering_mesh.loc[condition_dewatering_speed_moderate, "speed"] = "10.1 - 20"
-            dewatering_mesh.loc[condition_dewatering_speed_big, "speed"] = "20.1 - 30"
-            dewatering_mesh.loc[condition_dewatering_speed_very_big, "speed"] = "> 30"
-
-            file_path = os.path.join("out", "dewatering_shape", experiment_id)
-            if not os.path.exists(file_path):
-                os.mkdir(file_path)
-
-            area_per_dewatering_speed = {
-                speed_level: group.area.sum() for speed_level, group in dewatering_mesh.groupby("speed")
-            }
-            area_per_dewatering_speed["experiment_id"] = experiment_id
-            pd.DataFrame(index=[0], data=area_per_dewatering_speed).to_csv(
-                os.path.join(file_path, "area_per_dewatering_speed.csv")
-            )
+        if render_figures_in_background and create_figures:
+            from tools.render_queue import RenderQueue
+
+            render_queue = RenderQueue(number_of_workers=number_of_render_workers)
+        profile_points_layout = None
+        cross_section_geometry = None
+        dod_comparison_grid = None
+        path_to_profile_samples = os.path.join("out", "profiles", f"samples_{flood_scenario.value}")
+        write_gps_points_once(evaluation_points, create_path_to_gps_points_store(flood_scenario.value))
+
+        for path, results_provider in prefetch_experiments(
+            all_paths_to_experiment_results,
+            create_results_provider=lambda path_to_experiment: SimulationResultsProvider(
+                path_to_experiment,
+                path_to_mesh=path_to_mesh,
+                sample_time_step_width=sample_time_step_width,
+                used_geomorphologic_module=True,
+                memory_budget=memory_budget,
+                mesh=mesh,
+                shared_mesh=shared_mesh,
+            ),
+            should_load=lambda path_to_experiment: not checkpoint_store.is_experiment_completed(
+                os.path.split(path_to_experiment)[-1]
+            ),
+            prefetch_depth=prefetch_depth,
+        ):
+            experiment_id = os.path.split(path)[-1]
+            checkpoint_store.restore_log_entries(experiment_id, all_loggers)
+            if checkpoint_store.is_experiment_completed(experiment_id):
+                print(f"{experiment_id} already evaluated, skipping it")
+                if work_queue is not None:
+                    work_queue.mark_as_completed(path)
+                continue
+
+            if (do_de_watering_speed_analysis := "de_watering" in stages) and not checkpoint_store.is_stage_completed(
+                experiment_id, "de_watering"
+            ):
+                import geopandas as gpd
+
+                from evaluation_runner.scenario_evaluation.evaluate_water_depth_change import (
+                    calculate_mean_de_watering_speed_over_time,
+                    DeWateringSpeedCalculationParameters,
+                )
+                from evaluation_runner.scenario_evaluation.wetted_area_connectivity import (
+                    create_isolated_pools_mesh,
+                    find_isolated_pools_over_time,
+                    write_isolated_pools_tables,
+                )
+                from extract_data.memory_budget import allocate_array_within_budget
+                from extract_data.summarising_mesh import create_mesh_from_mapped_values
 
-            file_name = f"\\dewatering.gpkg"
-            dewatering_mesh.drop(
-                dewatering_mesh.columns.difference(["geometry", "speed", "avg_cm/h"]), axis=1, inplace=True
-            )
-            dewatering_mesh.dropna(axis=0, inplace=True)
-            dewatering_mesh.to_file(f"{file_path}{file_name}", driver="GPKG")
-
-        # evaluate some intermediate states without comparison:
-        print(experiment_id)
-
-        if do_individual_evaluations := False:
-            _all_selections_to_concat = []
-            # time_stamps_to_evaluate = [8100]
-            time_stamps_to_evaluate = [16200, 32400, 64800, 97200, 129600]
-            for time_stamp in tqdm(time_stamps_to_evaluate_individually):
-                mapping_for_step = create_default_state_to_name_in_shape_file_mapping(time_stamp)
-                mesh_for_this_time_step = create_mesh_from_mapped_values(resulting_geo_data_frames, mapping_for_step)
-                selection_where_flow_velocity_and_wd_are_too_small = calculate_shear_stress_coefficients(
-                    mesh_for_this_time_step,
-                    evaluation_parameters=evaluation_parameters_for_shear_stress,
-                    state_to_name_in_shape_file_mapping=mapping_for_step,
+                de_watering_parameters = DeWateringSpeedCalculationParameters(
+                    exclude_water_depth_above=1.0,
+                    exclude_water_depth_below=0.1,
+                    time_stamps_to_evaluate_change_on=time_stamps_to_evaluate_individually,
+                )
+                water_depths_over_time = allocate_array_within_budget(
+                    results_provider.memory_budget,
+                    shape=(len(mesh), len(time_stamps_to_evaluate_individually)),
+                    file_name=f"water_depths_{experiment_id}",
+                )
+                water_depth_column_names = []
+                for time_stamps_in_chunk, results_in_chunk in results_provider.iterate_chunks(
+                    time_stamps_to_evaluate_individually
+                ):
+                    for time_stamp in tqdm(time_stamps_in_chunk):
+                        mapping_for_step = create_default_state_to_name_in_shape_file_mapping(time_stamp)
+                        mesh_for_this_time_step = create_mesh_from_mapped_values(results_in_chunk, mapping_for_step)
+                        water_depths_over_time[:, len(water_depth_column_names)] = mesh_for_this_time_step[
+                            mapping_for_step.water_depth.final_name
+                        ].values
+                        water_depth_column_names.append(mapping_for_step.water_depth.final_name)
+                        del mesh_for_this_time_step
+                mesh_with_all_time_steps = gpd.GeoDataFrame(
+                    pd.DataFrame(water_depths_over_time, columns=water_depth_column_names, copy=False),
+                    geometry=mesh.geometry.values,
+                    crs=mesh.crs,
                 )
-                _all_selections_to_concat.append(selection_where_flow_velocity_and_wd_are_too_small)
-                _all_selections_to_concat[-1]["time_step"] = time_stamp
-
-                if log_shear_stress := True:
-                    if time_stamp in time_stamps_to_evaluate:
-                        logger_shear_stress = calculate_and_log_shear_stress_statistics(
-                            logger_shear_stress=logger_shear_stress,
-                            time_step=time_stamp,
-                            evaluation_parameters=evaluation_parameters_for_shear_stress,
-                            experiment_id=experiment_id,
-                            selection_where_wd_and_v_too_small=selection_where_flow_velocity_and_wd_are_too_small,
-                        )
 
-                if hmid := False:
-                    logger_hmid = calculate_and_log_hmid_statistics(
-                        logger_hmid=logger_hmid,
-                        experiment_id=experiment_id,
-                        evaluation_parameters=evaluation_parameters_for_shear_stress,
-                        time_step=time_stamp,
-                        mesh_with_simulation_state=mesh_for_this_time_step,
-                        state_to_name_in_shape_file_mapping=mapping_for_step,
-                    )
+                dewatering_mesh = calculate_mean_de_watering_speed_over_time(
+                    mesh_with_all_time_steps, de_watering_parameters
+                )
+                del mesh_with_all_time_steps
 
-            if log_shear_stress := False:
-                del _all_selections_to_concat[0]
-                all_selections = gpd.GeoDataFrame(
-                    pd.concat(_all_selections_to_concat, axis=0, ignore_index=True),
-                    crs=_all_selections_to_concat[0].crs,
+                condition_dewatering_speed_very_big = dewatering_mesh["avg_cm/h"] < -30
+                condition_dewatering_speed_big = (dewatering_mesh["avg_cm/h"] < -20) & (
+                    dewatering_mesh["avg_cm/h"] >= -30
+                )
+                condition_dewatering_speed_moderate = (dewatering_mesh["avg_cm/h"] < -10) & (
+                    dewatering_mesh["avg_cm/h"] >= -20
+                )
+                condition_dewatering_speed_small = (dewatering_mesh["avg_cm/h"] < 0) & (
+                    dewatering_mesh["avg_cm/h"] >= -10
                 )
-                all_selections["discharge"] = all_selections["time_step"] * 30 / 8100
-                # all_selections.to_file(r"C:\Users\nflue\Documents\Masterarbeit\03_Projects\MasterThesis\BasementEvaluations\out\plots_shieldstress\shield_stress.gpkg", driver="GPKG")
 
-                another_function_that_will_sexually_embarrass_me(all_selections)
-                make_stacked_bar_chart_of_mat_index(
-                    all_selections.drop(
-                        all_selections[~all_selections["discharge"].isin({60, 120, 240, 360, 480})].index
-                    ),
-                    [0, 26.6, 55, 72, float("inf")],
+                dewatering_mesh["speed"] = None
+                dewatering_mesh.loc[condition_dewatering_speed_small, "speed"] = "0 - 10"
+                dewatering_mesh.loc[condition_dewatering_speed_moderate, "speed"] = "10.1 - 20"
+                dewatering_mesh.loc[condition_dewatering_speed_big, "speed"] = "20.1 - 30"
+                dewatering_mesh.loc[condition_dewatering_speed_very_big, "speed"] = "> 30"
+
+                file_path = os.path.join("out", "dewatering_shape", experiment_id)
+                if not os.path.exists(file_path):
+                    os.mkdir(file_path)
+
+                area_per_dewatering_speed = {
+                    speed_level: group.area.sum() for speed_level, group in dewatering_mesh.groupby("speed")
+                }
+                area_per_dewatering_speed["experiment_id"] = experiment_id
+                path_to_area_per_dewatering_speed = os.path.join(file_path, "area_per_dewatering_speed.csv")
+                write_output(
+                    path_to_area_per_dewatering_speed,
+                    pd.DataFrame(index=[0], data=area_per_dewatering_speed).to_csv,
+                    path_to_area_per_dewatering_speed,
+                    output_sink=output_sink,
                 )
 
-            write_log_for_shear_stress(logger_shear_stress, flood_scenario=flood_scenario)
-            write_log_for_hmid(logger_hmid, flood_scenario=flood_scenario)
+                dewatering_mesh.drop(
+                    dewatering_mesh.columns.difference(["geometry", "speed", "avg_cm/h"]), axis=1, inplace=True
+                )
+                dewatering_mesh.dropna(axis=0, inplace=True)
+                write_result_mesh(
+                    dewatering_mesh,
+                    mesh,
+                    file_path,
+                    "dewatering",
+                    share_mesh_geometry_in_outputs,
+                    output_sink,
+                    mesh_fingerprint=shared_mesh.fingerprint,
+                )
+                del dewatering_mesh
+
+                if do_isolated_pools := True:
+                    isolated_pools = find_isolated_pools_over_time(
+                        shared_mesh.cell_adjacency,
+                        water_depths_over_time,
+                        time_stamps_to_evaluate_individually,
+                        cell_area=shared_mesh.cell_area,
+                    )
+                    write_output(
+                        os.path.join(file_path, "isolated_pools_per_time_step.csv"),
+                        write_isolated_pools_tables,
+                        isolated_pools,
+                        shared_mesh.cell_area,
+                        file_path,
+                        experiment_id,
+                        output_sink=output_sink,
+                    )
+                    write_result_mesh(
+                        create_isolated_pools_mesh(isolated_pools, mesh),
+                        mesh,
+                        file_path,
+                        "isolated_pools",
+                        share_mesh_geometry_in_outputs,
+                        output_sink,
+                        mesh_fingerprint=shared_mesh.fingerprint,
+                    )
+                    del isolated_pools
+                del water_depths_over_time
+                checkpoint_store.record_completed_stage(experiment_id, "de_watering", all_loggers)
+
+            # evaluate some intermediate states without comparison:
+            print(experiment_id)
+
+            if (
+                do_individual_evaluations := "individual_evaluations" in stages
+            ) and not checkpoint_store.is_stage_completed(experiment_id, "individual_evaluations"):
+                from evaluation_runner.scenario_evaluation.final_scenario_evaluation_log_entries import (
+                    calculate_and_log_hmid_statistics,
+                )
+                from evaluation_runner.scenario_evaluation.shear_stress_selections import TimeStackedSelections
+                from evaluation_runner.scenario_evaluation.shield_stress import (
+                    calculate_and_log_shear_stress_statistics,
+                    calculate_shear_stress_coefficients,
+                )
+                from extract_data.summarising_mesh import create_mesh_from_mapped_values
+
+                shear_stress_selections = TimeStackedSelections()
+                # time_stamps_to_evaluate = [8100]
+                time_stamps_to_evaluate = [16200, 32400, 64800, 97200, 129600]
+                for time_stamps_in_chunk, results_in_chunk in results_provider.iterate_chunks(
+                    time_stamps_to_evaluate_individually
+                ):
+                    for time_stamp in tqdm(time_stamps_in_chunk):
+                        mapping_for_step = create_default_state_to_name_in_shape_file_mapping(time_stamp)
+                        mesh_for_this_time_step = create_mesh_from_mapped_values(results_in_chunk, mapping_for_step)
+                        selection_where_flow_velocity_and_wd_are_too_small = calculate_shear_stress_coefficients(
+                            mesh_for_this_time_step,
+                            evaluation_parameters=evaluation_parameters_for_shear_stress,
+                            state_to_name_in_shape_file_mapping=mapping_for_step,
+                        )
+                        if time_stamp != time_stamps_to_evaluate_individually[0]:
+                            shear_stress_selections.append(
+                                selection_where_flow_velocity_and_wd_are_too_small,
+                                time_step=time_stamp,
+                                discharge=time_stamp * 30 / 8100,
+                            )
+
+                        if log_shear_stress := True:
+                            if time_stamp in time_stamps_to_evaluate:
+                                logger_shear_stress = calculate_and_log_shear_stress_statistics(
+                                    logger_shear_stress=logger_shear_stress,
+                                    time_step=time_stamp,
+                                    evaluation_parameters=evaluation_parameters_for_shear_stress,
+                                    experiment_id=experiment_id,
+                                    selection_where_wd_and_v_too_small=selection_where_flow_velocity_and_wd_are_too_small,
+                                )
+
+                        if hmid := False:
+                            logger_hmid = calculate_and_log_hmid_statistics(
+                                logger_hmid=logger_hmid,
+                                experiment_id=experiment_id,
+                                evaluation_parameters=evaluation_parameters_for_shear_stress,
+                                time_step=time_stamp,
+                                mesh_with_simulation_state=mesh_for_this_time_step,
+                                state_to_name_in_shape_file_mapping=mapping_for_step,
+                            )
+                        del mesh_for_this_time_step
+
+                if log_shear_stress := False:
+                    from evaluation_runner.scenario_evaluation.visualizations_shear_stress import (
+                        another_function_that_will_sexually_embarrass_me,
+                    )
 
-        # compare initial and final state of simulation
-        before_and_after_flood_mesh = create_mesh_with_before_and_after_flood_data(
-            resulting_geo_data_frames,
-            before_flood_mapping=before_flood_mapping,
-            after_flood_mapping=after_flood_mapping,
-        )
-        del before_and_after_flood_mesh["geometrygeometry"]
+                    # shear_stress_selections.to_geo_data_frame(shared_mesh).to_file(r"C:\Users\nflue\Documents\Masterarbeit\03_Projects\MasterThesis\BasementEvaluations\out\plots_shieldstress\shield_stress.gpkg", driver="GPKG")
 
-        before_and_after_flood_mesh.to_file(f"out\\HMID\\mesh_{experiment_id}.gpkg", driver="GPKG")
+                    another_function_that_will_sexually_embarrass_me(shear_stress_selections.to_data_frame(shared_mesh))
+                    make_stacked_bar_chart_of_mat_index(
+                        shear_stress_selections.to_data_frame(shared_mesh, discharges={60, 120, 240, 360, 480}),
+                        [0, 26.6, 55, 72, float("inf")],
+                        render_queue=render_queue,
+                        output_sink=output_sink,
+                    )
+                del shear_stress_selections
+
+                write_log_for_shear_stress(logger_shear_stress, flood_scenario=flood_scenario)
+                write_log_for_hmid(logger_hmid, flood_scenario=flood_scenario)
+                checkpoint_store.record_completed_stage(experiment_id, "individual_evaluations", all_loggers)
+
+            if (do_cross_sections := "cross_sections" in stages) and not checkpoint_store.is_stage_completed(
+                experiment_id, "cross_sections"
+            ):
+                from evaluation_runner.profiles.batch_profiles import load_points_with_lines
+                from evaluation_runner.profiles.cross_sections import (
+                    calculate_cross_section_time_series_for_experiment,
+                    create_transect_lines_from_profile_points,
+                    intersect_transect_lines_with_mesh,
+                    write_cross_section_time_series,
+                )
 
-        valid_mapping = derive_columns_to_lookup_from_flood_scenario(
-            before_flood_mapping, after_flood_mapping, flood_scenario
-        )
+                if cross_section_geometry is None:
+                    cross_section_geometry = intersect_transect_lines_with_mesh(
+                        create_transect_lines_from_profile_points(
+                            load_points_with_lines(
+                                path_to_folder_containing_points_with_lines, flood_scenario, reference_layers
+                            )
+                        ),
+                        mesh,
+                    )
+                path_to_cross_sections = os.path.join("out", "cross_sections", flood_scenario.value)
+                write_output(
+                    os.path.join(path_to_cross_sections, f"cross_sections_{experiment_id}.csv"),
+                    write_cross_section_time_series,
+                    calculate_cross_section_time_series_for_experiment(
+                        results_provider, cross_section_geometry, time_stamps_to_evaluate_individually
+                    ),
+                    path_to_folder=path_to_cross_sections,
+                    experiment_id=experiment_id,
+                    output_sink=output_sink,
+                )
+                checkpoint_store.record_completed_stage(experiment_id, "cross_sections", all_loggers)
 
-        if do_points := True:
-            renamed_updated_gps_points = assign_requested_values_from_summarising_mesh_to_point(
-                columns_to_lookup=[pair.final_name for pair in valid_mapping],
-                mesh_with_all_results=before_and_after_flood_mesh,
-                points=evaluation_points.copy(deep=True),
-            )
-            # renamed_updated_gps_points.to_file(f"out\\profiles\\gps_points_{flood_scenario}.gpkg", driver="GPKG")
-
-            logger_triple = calculate_and_log_statistics_for_gps_points(
-                renamed_updated_gps_points,
-                logger_triple,
-                experiment_id=experiment_id,
-                flood_scenario=flood_scenario,
-                mapping=valid_mapping,
+            # compare initial and final state of simulation
+            before_and_after_flood_mesh = create_mesh_with_before_and_after_flood_data(
+                results_provider.load([0, simulation_time_in_seconds]),
+                before_flood_mapping=before_flood_mapping,
+                after_flood_mapping=after_flood_mapping,
             )
-
-            write_logs_for_gps_points(
-                logger_triple,
-                flood_scenario=flood_scenario,
+            del before_and_after_flood_mesh["geometrygeometry"]
+            if memory_budget is not None:
+                results_provider.release()
+
+            write_result_mesh(
+                before_and_after_flood_mesh,
+                mesh,
+                "out\\HMID",
+                f"mesh_{experiment_id}",
+                share_mesh_geometry_in_outputs,
+                output_sink,
+                mesh_fingerprint=shared_mesh.fingerprint,
             )
 
-        if do_profiles := False:
-            evaluate_points_along_profiles(
-                mesh_with_all_results=before_and_after_flood_mesh,
-                flood_scenario=flood_scenario,
-                path_to_folder_containing_points_with_line=path_to_folder_containing_points_with_lines,
-                colum_name_mapping=valid_mapping,
-                experiment_id=experiment_id,
+            valid_mapping = derive_columns_to_lookup_from_flood_scenario(
+                before_flood_mapping, after_flood_mapping, flood_scenario
             )
 
-        if do_polygons := False:
-            union_of_dod_and_simulated_dz_mesh = create_union_of_dod_and_simulated_dz_mesh(
-                path_to_dod_as_polygon=path_to_dod_as_polygon,
-                mesh_with_all_results=before_and_after_flood_mesh,
-            )
+            if (do_points := "points" in stages) and not checkpoint_store.is_stage_completed(experiment_id, "points"):
+                from extract_data.summarising_mesh import assign_requested_values_from_summarising_mesh_to_point
 
-            # union_of_dod_and_simulated_dz_mesh.to_file(f"out\\polygons\\{experiment_id}.gpkg", driver="GPKG")
+                renamed_updated_gps_points = assign_requested_values_from_summarising_mesh_to_point(
+                    columns_to_lookup=[pair.final_name for pair in valid_mapping],
+                    mesh_with_all_results=before_and_after_flood_mesh,
+                    points=evaluation_points.copy(deep=True),
+                )
+                # renamed_updated_gps_points.to_file(f"out\\profiles\\gps_points_{flood_scenario}.gpkg", driver="GPKG")
 
-            all_polygons = dict()
-            for polygon_path in tqdm(paths_to_polygon_as_area_of_interest):
-                masking_polygons_for_evaluation = load_data_with_crs_2056(polygon_path)
-                polygon_name = os.path.split(polygon_path)[-1].split(".")[0]
-                clipped_mesh = clip_mesh_with_polygons(
-                    union_of_dod_and_simulated_dz_mesh, masking_polygons_for_evaluation, experiment_id=experiment_id
+                logger_triple = calculate_and_log_statistics_for_gps_points(
+                    renamed_updated_gps_points,
+                    logger_triple,
+                    experiment_id=experiment_id,
+                    flood_scenario=flood_scenario,
+                    mapping=valid_mapping,
+                    columns_of_evaluation_points=evaluation_points.columns,
+                    render_queue=render_queue,
+                    create_figures=create_figures,
                 )
 
-                logger_goodness_of_fit_for_three_d_evaluation = calculate_and_log_3d_statistics_for_polygons(
-                    logger_goodness_of_fit_for_three_d_evaluation,
-                    union_of_dod_and_simulated_dz_mesh=clipped_mesh,
+                write_logs_for_gps_points(
+                    logger_triple,
+                    flood_scenario=flood_scenario,
+                )
+                checkpoint_store.record_completed_stage(experiment_id, "points", all_loggers)
+
+            if (do_profiles := "profiles" in stages) and not checkpoint_store.is_stage_completed(
+                experiment_id, "profiles"
+            ):
+                from evaluation_runner.profiles.batch_profiles import (
+                    create_profile_points_layout,
+                    load_points_with_lines,
+                    save_profile_samples_of_experiment,
+                )
+                from evaluation_runner.profiles.evaluate_profiles import evaluate_points_along_profiles
+
+                if profile_points_layout is None:
+                    profile_points_layout = create_profile_points_layout(
+                        load_points_with_lines(
+                            path_to_folder_containing_points_with_lines, flood_scenario, reference_layers
+                        ),
+                        mesh,
+                    )
+                evaluate_points_along_profiles(
+                    mesh_with_all_results=before_and_after_flood_mesh,
+                    flood_scenario=flood_scenario,
+                    path_to_folder_containing_points_with_line=path_to_folder_containing_points_with_lines,
+                    colum_name_mapping=valid_mapping,
+                    experiment_id=experiment_id,
+                    render_queue=render_queue,
+                    profile_points_layout=profile_points_layout,
+                )
+                save_profile_samples_of_experiment(
+                    profile_points_layout,
+                    mesh_with_all_results=before_and_after_flood_mesh,
+                    mapping=valid_mapping,
                     experiment_id=experiment_id,
-                    polygon_name=polygon_name,
+                    path_to_folder=path_to_profile_samples,
+                )
+                checkpoint_store.record_completed_stage(experiment_id, "profiles", all_loggers)
+
+            if (
+                (do_polygons := "polygons" in stages)
+                and path_to_dod_raster is not None
+                and not checkpoint_store.is_stage_completed(experiment_id, "polygons")
+            ):
+                from csv_logging.calculate_entries import goodness_of_fit_for_three_d_analysis_on_grid
+                from evaluation_runner.analysis_calibration.raster_comparison import (
+                    compare_elevation_change_on_grid,
+                    create_dod_comparison_grid,
+                    summarise_elevation_change_on_grid,
                 )
-                all_polygons[polygon_name] = masking_polygons_for_evaluation
 
-            if do_summary_of_all_polygons := False:
-                all_masking_polygons = pd.concat(all_polygons.values())
-                clipped_mesh = clip_mesh_with_polygons(
-                    union_of_dod_and_simulated_dz_mesh, all_masking_polygons, experiment_id
+                if dod_comparison_grid is None:
+                    dod_comparison_grid = create_dod_comparison_grid(
+                        path_to_dod_raster,
+                        mesh,
+                        paths_to_polygon_as_area_of_interest,
+                        reference_layers,
+                        mesh_fingerprint=shared_mesh.fingerprint,
+                    )
+                elevation_change_comparison = compare_elevation_change_on_grid(
+                    dod_comparison_grid.mapping, before_and_after_flood_mesh["delta_z"].values, dod_comparison_grid.dod
+                )
+                for polygon_name, polygon_mask in dod_comparison_grid.polygon_masks.items():
+                    logger_goodness_of_fit_for_three_d_evaluation_on_grid.add_entry_to_log(
+                        goodness_of_fit_for_three_d_analysis_on_grid(
+                            summarise_elevation_change_on_grid(elevation_change_comparison, polygon_mask),
+                            experiment_id=experiment_id,
+                            polygon_name=polygon_name,
+                        )
+                    )
+                write_log_for_3d_evaluation_on_grid(
+                    logger_goodness_of_fit_for_three_d_evaluation_on_grid, flood_scenario=flood_scenario
                 )
-                clipped_mesh.to_file(f"out\\polygons\\polygons_{experiment_id}.gpkg", driver="GPKG")
+                del elevation_change_comparison
+                checkpoint_store.record_completed_stage(experiment_id, "polygons", all_loggers)
+            elif do_polygons and not checkpoint_store.is_stage_completed(experiment_id, "polygons"):
+                from evaluation_runner.analysis_calibration.three_dimensional import (
+                    clip_mesh_with_polygons,
+                    create_union_of_dod_and_simulated_dz_mesh,
+                )
+                from tools.geo_export import write_geo_data_frame_to_gpkg
 
-                logger_goodness_of_fit_for_three_d_evaluation = calculate_and_log_3d_statistics_for_polygons(
-                    logger_goodness_of_fit_for_three_d_evaluation,
-                    union_of_dod_and_simulated_dz_mesh=clipped_mesh,
-                    experiment_id=experiment_id,
-                    polygon_name="-".join(all_polygons.keys()),
+                union_of_dod_and_simulated_dz_mesh = create_union_of_dod_and_simulated_dz_mesh(
+                    path_to_dod_as_polygon=path_to_dod_as_polygon,
+                    mesh_with_all_results=before_and_after_flood_mesh,
+                    reference_layers=reference_layers,
                 )
 
-            write_log_for_3d_evaluation(
-                logger_goodness_of_fit_for_three_d_evaluation=logger_goodness_of_fit_for_three_d_evaluation,
-                flood_scenario=flood_scenario,
+                # union_of_dod_and_simulated_dz_mesh.to_file(f"out\\polygons\\{experiment_id}.gpkg", driver="GPKG")
+
+                all_polygons = dict()
+                for polygon_path in tqdm(paths_to_polygon_as_area_of_interest):
+                    masking_polygons_for_evaluation = reference_layers.get_vector_layer(polygon_path)
+                    polygon_name = os.path.split(polygon_path)[-1].split(".")[0]
+                    clipped_mesh = clip_mesh_with_polygons(
+                        union_of_dod_and_simulated_dz_mesh, masking_polygons_for_evaluation, experiment_id=experiment_id
+                    )
+
+                    logger_goodness_of_fit_for_three_d_evaluation = calculate_and_log_3d_statistics_for_polygons(
+                        logger_goodness_of_fit_for_three_d_evaluation,
+                        union_of_dod_and_simulated_dz_mesh=clipped_mesh,
+                        experiment_id=experiment_id,
+                        polygon_name=polygon_name,
+                    )
+                    all_polygons[polygon_name] = masking_polygons_for_evaluation
+
+                if do_summary_of_all_polygons := False:
+                    all_masking_polygons = pd.concat(all_polygons.values())
+                    clipped_mesh = clip_mesh_with_polygons(
+                        union_of_dod_and_simulated_dz_mesh, all_masking_polygons, experiment_id
+                    )
+                    path_to_clipped_mesh = f"out\\polygons\\polygons_{experiment_id}.gpkg"
+                    write_output(
+                        path_to_clipped_mesh,
+                        write_geo_data_frame_to_gpkg,
+                        clipped_mesh.copy(),
+                        path_to_clipped_mesh,
+                        output_sink=output_sink,
+                    )
+
+                    logger_goodness_of_fit_for_three_d_evaluation = calculate_and_log_3d_statistics_for_polygons(
+                        logger_goodness_of_fit_for_three_d_evaluation,
+                        union_of_dod_and_simulated_dz_mesh=clipped_mesh,
+                        experiment_id=experiment_id,
+                        polygon_name="-".join(all_polygons.keys()),
+                    )
+
+                write_log_for_3d_evaluation(
+                    logger_goodness_of_fit_for_three_d_evaluation=logger_goodness_of_fit_for_three_d_evaluation,
+                    flood_scenario=flood_scenario,
+                )
+                del union_of_dod_and_simulated_dz_mesh, all_polygons
+                checkpoint_store.record_completed_stage(experiment_id, "polygons", all_loggers)
+
+            checkpoint_store.mark_experiment_as_completed(experiment_id, all_loggers)
+            if work_queue is not None and output_sink is not None:
+                output_sink.submit(path, work_queue.mark_as_completed, path, wait_for_earlier_writes=True)
+            elif work_queue is not None:
+                work_queue.mark_as_completed(path)
+            del before_and_after_flood_mesh
+            results_provider.release()
+            gc.collect()
+
+        if output_sink is not None:
+            output_sink.close()
+
+        if profile_points_layout is not None:
+            from evaluation_runner.profiles.batch_profiles import create_profile_error_table, load_profile_samples
+
+            create_profile_error_table(
+                profile_points_layout, load_profile_samples(path_to_profile_samples, profile_points_layout)
+            ).to_csv(
+                os.path.join("out", "profiles", f"profile_errors_{flood_scenario.value}.csv"), sep=";", index=False
             )
+    except BaseException:
+        close_resources_after_failure(output_sink, *all_loggers, work_queue, render_queue)
+        raise
+
+    for logger, _ in loggers_with_file_names:
+        logger.close()
+    if work_queue is not None:
+        work_queue.close()
+    publish_logs(
+        loggers_with_file_names,
+        work_queue,
+        write_parquet_logs=write_parquet_logs,
+        update_catalog=update_catalog,
+        path_to_catalog=path_to_catalog,
+        scenario_set=_derive_scenario_set_name(path_to_all_experiments_to_evaluate),
+        mesh=_derive_mesh_name(path_to_mesh),
+        flood_scenario=flood_scenario.name,
+    )
+    if render_queue is not None:
+        render_queue.close()
+
+
+def close_resources_after_failure(*resources: Optional[object]) -> None:
+    for resource in resources:
+        if resource is None:
+            continue
+        try:
+            resource.close()
+        except Exception as error:
+            warnings.warn(f"could not close {type(resource).__name__} after the evaluation failed: {error}")
+
+
+def publish_logs(
+    loggers_with_file_names: Sequence[tuple[CSVLogger, str]],
+    work_queue: Optional[WorkQueue],
+    write_parquet_logs: bool,
+    update_catalog: bool,
+    path_to_catalog: Optional[str],
+    scenario_set: str,
+    mesh: str,
+    flood_scenario: str,
+) -> None:
+    run_labels = dict(scenario_set=scenario_set, mesh=mesh, flood_scenario=flood_scenario)
+    loggers_to_publish = []
+    merged_logs = []
+    if work_queue is None:
+        loggers_to_publish = [
+            (logger, file_name) for logger, file_name in loggers_with_file_names if logger.get_all_entries()
+        ]
+    else:
+        # only the last worker merges the shards of all workers, so the merged logs are published once
+        type_per_file_name = {file_name: logger.type_of_message_to_log for logger, file_name in loggers_with_file_names}
+        merged_logs = [
+            (path, type_per_file_name[os.path.basename(path)])
+            for path in work_queue.merge_result_shards_if_last_worker(type_per_file_name)
+        ]
+    if not loggers_to_publish and not merged_logs:
+        return
+    from csv_logging.columnar_logs import write_csv_log_as_parquet_to_file, write_logs_as_parquet_to_file
+
+    catalog = None
+    if update_catalog:
+        from csv_logging.catalog import ExperimentCatalog
+
+        catalog = ExperimentCatalog(path_to_catalog)
+    try:
+        for logger, file_name in loggers_to_publish:
+            if write_parquet_logs:
+                write_logs_as_parquet_to_file(logger, file_name)
+            if catalog is not None:
+                catalog.ingest_logger(logger, **run_labels)
+        for path, type_of_log_entry in merged_logs:
+            print(f"merged the shards of all workers into {path}")
+            if write_parquet_logs:
+                write_csv_log_as_parquet_to_file(path, type_of_log_entry)
+            if catalog is not None:
+                catalog.ingest_csv_log(path, type_of_log_entry, **run_labels)
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+
+def write_result_mesh(
+    mesh_with_results: "GeoDataFrame",
+    mesh: "GeoDataFrame",
+    path_to_folder: str,
+    file_stem: str,
+    share_mesh_geometry: bool,
+    output_sink: Optional[OutputSink] = None,
+    mesh_fingerprint: Optional[str] = None,
+) -> None:
+    from tools.geo_export import write_geo_data_frame_to_gpkg, write_results_with_shared_mesh_geometry
+
+    if output_sink is not None:
+        mesh_with_results = mesh_with_results.copy(deep=False)
+    if share_mesh_geometry:
+        write_output(
+            os.path.join(path_to_folder, f"{file_stem}.parquet"),
+            write_results_with_shared_mesh_geometry,
+            mesh_with_results,
+            mesh,
+            path_to_folder,
+            file_stem,
+            mesh_fingerprint=mesh_fingerprint,
+            output_sink=output_sink,
+        )
+    else:
+        path = os.path.join(path_to_folder, f"{file_stem}.gpkg")
+        write_output(path, write_geo_data_frame_to_gpkg, mesh_with_results, path, output_sink=output_sink)
+
+
+def _derive_scenario_set_name(path_to_all_experiments_to_evaluate: PathsToJsonWithExperimentPath) -> str:
+    return os.path.split(os.path.dirname(path_to_all_experiments_to_evaluate))[-1]
+
+
+def _derive_mesh_name(path_to_mesh: str) -> str:
+    return os.path.split(os.path.dirname(path_to_mesh))[-1]
+
+
+def _derive_run_name(
+    path_to_all_experiments_to_evaluate: PathsToJsonWithExperimentPath, flood_scenario: BeforeOrAfterFloodScenario
+) -> str:
+    return f"{_derive_scenario_set_name(path_to_all_experiments_to_evaluate)}_{flood_scenario.value}"
 
 
 def derive_columns_to_lookup_from_flood_scenario(
     before_flood_mapping, after_flood_mapping, flood_scenario
-) -> StateToNameInShapeFileMapping:
+) -> "StateToNameInShapeFileMapping":
     if flood_scenario == BeforeOrAfterFloodScenario.bf_2020:
         return before_flood_mapping
     elif flood_scenario == BeforeOrAfterFloodScenario.af_2020:
@@ -456,10 +926,12 @@ class GpsPointsLoggerTriple(NamedTuple):
 
 def calculate_and_log_3d_statistics_for_polygons(
     logger_goodness_of_fit_for_three_d_evaluation: CSVLogger,
-    union_of_dod_and_simulated_dz_mesh: GeoDataFrame,
+    union_of_dod_and_simulated_dz_mesh: "GeoDataFrame",
     experiment_id: str,
     polygon_name,
 ) -> CSVLogger:
+    from csv_logging.calculate_entries import goodness_of_fit_for_three_d_analysis
+
     logger_goodness_of_fit_for_three_d_evaluation.add_entry_to_log(
         goodness_of_fit_for_three_d_analysis(union_of_dod_and_simulated_dz_mesh, experiment_id, polygon_name)
     )
@@ -467,12 +939,25 @@ def calculate_and_log_3d_statistics_for_polygons(
 
 
 def calculate_and_log_statistics_for_gps_points(
-    renamed_updated_gps_points: GeoDataFrame,
+    renamed_updated_gps_points: "GeoDataFrame",
     logger_triple: GpsPointsLoggerTriple,
     experiment_id,
     flood_scenario,
-    mapping: StateToNameInShapeFileMapping,
+    mapping: "StateToNameInShapeFileMapping",
+    columns_of_evaluation_points: Sequence[str],
+    render_queue: Optional["RenderQueue"] = None,
+    create_figures: bool = True,
 ) -> GpsPointsLoggerTriple:
+    from csv_logging.calculate_entries import (
+        goodness_of_fit_for_bottom_elevation,
+        goodness_of_fit_for_velocity,
+        goodness_of_fit_for_water_depth,
+    )
+    from evaluation_runner.all_gps_points.gps_points_store import (
+        create_path_to_gps_points_store,
+        write_sampled_gps_values,
+    )
+
     water_depth_ = mapping.water_depth.final_name
     velocity_ = mapping.flow_velocity.final_name
     bottom_elevation_ = mapping.bottom_elevation.final_name
@@ -483,28 +968,42 @@ def calculate_and_log_statistics_for_gps_points(
     renamed_updated_gps_points["wse_sim"] = (
         renamed_updated_gps_points[water_depth_] + renamed_updated_gps_points[bottom_elevation_]
     )
-    gps_points_with_velocity: GeoDataFrame = (
+    gps_points_with_velocity: "GeoDataFrame" = (
         renamed_updated_gps_points.loc[renamed_updated_gps_points["Vel__m_s_"] > 0, :]
     ).copy(deep=True)
     gps_points_with_velocity["v_sim_gps"] = gps_points_with_velocity[velocity_] - gps_points_with_velocity["Vel__m_s_"]
 
-    create_histogram_with_mesh_values(
-        renamed_updated_gps_points, "wd_sim_gps", flood_scenario=flood_scenario, experiment_id=experiment_id
-    )
-    # create_histogram_with_mesh_values(gps_points_with_velocity, "v_sim_gps", flood_scenario=flood_scenario, experiment_id=experiment_id)
+    if create_figures:
+        from evaluation_runner.profiles.evaluate_profiles import create_histogram_with_mesh_values
 
-    filename = f"out\\gps_points_calibration\\gps_pts_calibration_{experiment_id}.pkl"
-    with open(filename, "wb") as dump_file:
-        pickle.dump(renamed_updated_gps_points, dump_file)
+        create_histogram_with_mesh_values(
+            renamed_updated_gps_points,
+            "wd_sim_gps",
+            flood_scenario=flood_scenario,
+            experiment_id=experiment_id,
+            render_queue=render_queue,
+        )
+    # create_histogram_with_mesh_values(gps_points_with_velocity, "v_sim_gps", flood_scenario=flood_scenario, experiment_id=experiment_id)
 
-    create_scatter_plot(
+    write_sampled_gps_values(
         renamed_updated_gps_points,
-        column_to_make_scatter_from_sim="wse_sim",
-        flood_scenario=flood_scenario,
+        columns_of_points=columns_of_evaluation_points,
         experiment_id=experiment_id,
-        column_to_make_scatter_from_obs="WSE__m_",
+        path_to_store=create_path_to_gps_points_store(flood_scenario.value),
     )
 
+    if create_figures:
+        from evaluation_runner.profiles.evaluate_profiles import create_scatter_plot
+
+        create_scatter_plot(
+            renamed_updated_gps_points,
+            column_to_make_scatter_from_sim="wse_sim",
+            flood_scenario=flood_scenario,
+            experiment_id=experiment_id,
+            column_to_make_scatter_from_obs="WSE__m_",
+            render_queue=render_queue,
+        )
+
     # create_scatter_plot_for_velocities(gps_points_with_velocity,column_to_make_scatter_from_sim=velocity_,flood_scenario=flood_scenario,experiment_id=experiment_id,column_to_make_scatter_from_obs="Vel__m_s_",)
 
     logger_triple.logger_goodness_of_fit_for_water_depth.add_entry_to_log(
@@ -523,18 +1022,54 @@ def calculate_and_log_statistics_for_gps_points(
     return logger_triple
 
 
+class LogFileNames(NamedTuple):
+    velocity: str
+    water_depth: str
+    bottom_elevation: str
+    three_d_evaluation: str
+    three_d_evaluation_on_grid: str
+    shear_stress: str
+    hmid: str
+
+
+def create_log_file_names(flood_scenario: BeforeOrAfterFloodScenario) -> LogFileNames:
+    return LogFileNames(
+        velocity=f"log_goodness_of_fit_{flood_scenario}_velocities.csv",
+        water_depth=f"log_goodness_of_fit_{flood_scenario}_water_depths.csv",
+        bottom_elevation=f"log_goodness_of_fit_{flood_scenario}_bottom_ele.csv",
+        three_d_evaluation=f"log_three_d_statistics_{flood_scenario}.csv",
+        three_d_evaluation_on_grid=f"log_three_d_statistics_on_grid_{flood_scenario}.csv",
+        shear_stress="log_shear_stress_fine_mesh.csv",
+        hmid="log_hmid_input_01_fine_mesh_126000.csv",
+    )
+
+
+class LogStreamingParameters(NamedTuple):
+    stream_logs: bool
+    flush_every_n_entries: int
+    worker_id: Optional[str]
+
+
+def create_logger(
+    type_of_message_to_log: Type[BaseLogEntry], file_name: str, streaming: LogStreamingParameters
+) -> CSVLogger:
+    return CSVLogger(
+        type_of_message_to_log,
+        stream_to_file_name=file_name if streaming.stream_logs else None,
+        flush_every_n_entries=streaming.flush_every_n_entries,
+        worker_id=streaming.worker_id,
+    )
+
+
 def write_logs_for_gps_points(
     logger_triple: GpsPointsLoggerTriple,
     flood_scenario: BeforeOrAfterFloodScenario,
 ) -> None:
-    logger_triple.logger_goodness_of_fit_for_velocity.write_logs_as_csv_to_file(
-        f"log_goodness_of_fit_{flood_scenario}_velocities.csv"
-    )
-    logger_triple.logger_goodness_of_fit_for_water_depth.write_logs_as_csv_to_file(
-        f"log_goodness_of_fit_{flood_scenario}_water_depths.csv"
-    )
+    log_file_names = create_log_file_names(flood_scenario)
+    logger_triple.logger_goodness_of_fit_for_velocity.write_logs_as_csv_to_file(log_file_names.velocity)
+    logger_triple.logger_goodness_of_fit_for_water_depth.write_logs_as_csv_to_file(log_file_names.water_depth)
     logger_triple.logger_goodness_of_fit_for_bottom_elevation.write_logs_as_csv_to_file(
-        f"log_goodness_of_fit_{flood_scenario}_bottom_ele.csv"
+        log_file_names.bottom_elevation
     )
 
 
@@ -542,75 +1077,28 @@ def write_log_for_3d_evaluation(
     logger_goodness_of_fit_for_three_d_evaluation: CSVLogger, flood_scenario: BeforeOrAfterFloodScenario
 ) -> None:
     logger_goodness_of_fit_for_three_d_evaluation.write_logs_as_csv_to_file(
-        f"log_three_d_statistics_{flood_scenario}.csv"
+        create_log_file_names(flood_scenario).three_d_evaluation
+    )
+
+
+def write_log_for_3d_evaluation_on_grid(
+    logger_goodness_of_fit_for_three_d_evaluation_on_grid: CSVLogger, flood_scenario: BeforeOrAfterFloodScenario
+) -> None:
+    logger_goodness_of_fit_for_three_d_evaluation_on_grid.write_logs_as_csv_to_file(
+        create_log_file_names(flood_scenario).three_d_evaluation_on_grid
     )
 
 
 def write_log_for_shear_stress(logger_shear_stress: CSVLogger, flood_scenario: BeforeOrAfterFloodScenario) -> None:
-    logger_shear_stress.write_logs_as_csv_to_file("log_shear_stress_fine_mesh.csv")
+    logger_shear_stress.write_logs_as_csv_to_file(create_log_file_names(flood_scenario).shear_stress)
 
 
 def write_log_for_hmid(logger_hmid: CSVLogger, flood_scenario: BeforeOrAfterFloodScenario) -> None:
-    logger_hmid.write_logs_as_csv_to_file("log_hmid_input_01_fine_mesh_126000.csv")
+    logger_hmid.write_logs_as_csv_to_file(create_log_file_names(flood_scenario).hmid)
 
 
 def main():
-    flood_scenario = BeforeOrAfterFloodScenario.bf_2020
-    simulation_time_in_seconds = 90000
-    sample_time_step_width = 300
-
-    paths_to_json_with_experiment_paths = (
-        PathsToJsonWithExperimentPath.calibration_experiments_with_different_sediment_depths_mesh2
-    )
-
-    path_to_gps_points = create_paths(flood_scenario).path_to_gps_points
-    # old:path_to_mesh = r"C:\Users\nflue\Documents\Masterarbeit\02_Data\04_Model_220309\04_Model\01_input_data_old\BF2020_Mesh\new_mesh_all_inputs\bathymetry_and_mesh_BF2020_computational-mesh.2dm"
-    # path_to_mesh = r"C:\Users\nflue\Documents\Masterarbeit\02_Data\04_Model_220511\04_Model\01_input_data\BF2020_Mesh\new_mesh_all_inputs\Project1_computational-mesh.2dm"
-    path_to_mesh = r"C:\Users\nflue\Documents\Masterarbeit\02_Data\04_Model_220620\04_Model\01_input_data\BF2020_Mesh\new_mesh_finer_01\Project1_computational-mesh.2dm"
-
-    paths_to_polygon_as_area_of_interest = (
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\1.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\2.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\3.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\4.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\5.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\6.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\7.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\8.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\9.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\10.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\11.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\12.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\13.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\14.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\15.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\16.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\17.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\18.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\19.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\20.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\21.shp",
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\05_evaluation\\areas_to_compare_dod_bf_and_af\\22.shp",
-    )
-    path_to_dod_as_polygon = (
-        "C:\\Users\\nflue\\Documents\\Masterarbeit\\02_Data\\03_Bathymetry\\DoDs\\dod_v2\\dod_as_polygon.shp"
-    )
-    path_to_folder_containing_points_with_lines = "C:\\Users\\nflue\\Documents\\Masterarbeit\\03_Projects\\MasterThesis\\BasementPreparation\\river_profiles_from_bathymetry"
-
-    evaluation_parameters_for_shear_stress = create_parameters_for_shear_stress()
-
-    evaluate_simulation_on_given_points(
-        path_to_all_experiments_to_evaluate=paths_to_json_with_experiment_paths,
-        evaluation_points=load_data_with_crs_2056(path_to_gps_points),
-        path_to_mesh=path_to_mesh,
-        flood_scenario=flood_scenario,
-        paths_to_polygon_as_area_of_interest=paths_to_polygon_as_area_of_interest,
-        path_to_dod_as_polygon=path_to_dod_as_polygon,
-        path_to_folder_containing_points_with_lines=path_to_folder_containing_points_with_lines,
-        simulation_time_in_seconds=simulation_time_in_seconds,
-        evaluation_parameters_for_shear_stress=evaluation_parameters_for_shear_stress,
-        sample_time_step_width=sample_time_step_width,
-    )
+    run_evaluation(load_configuration())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import threading
+from typing import Optional
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyogrio
+
+_CELL_INDEX_COLUMN = "cell_index"
+_MESH_GEOMETRY_METADATA_KEY = b"mesh_geometry"
+
+
+def create_geometry_fingerprint(geometries: gpd.GeoDataFrame) -> str:
+    hash_of_geometries = hashlib.sha1(str(geometries.crs).encode())
+    hash_of_geometries.update(geometries.index.values.tobytes())
+    for wkb in geometries.geometry.to_wkb():
+        hash_of_geometries.update(wkb)
+    return hash_of_geometries.hexdigest()[:16]
+
+
+def _create_temporary_path(path: str) -> str:
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.{os.getpid()}-{threading.get_ident()}.tmp{extension}"
+
+
+def _make_folder_if_needed(path: str) -> None:
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+
+def write_geo_data_frame_to_gpkg(geo_data_frame: gpd.GeoDataFrame, path: str, layer: Optional[str] = None) -> str:
+    _make_folder_if_needed(path)
+    temporary_path = _create_temporary_path(path)
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    pyogrio.write_dataframe(geo_data_frame, temporary_path, layer=layer, driver="GPKG")
+    os.replace(temporary_path, path)
+    return path
+
+
+def write_mesh_geometry_once(
+    mesh: gpd.GeoDataFrame, path_to_folder: str, mesh_fingerprint: Optional[str] = None
+) -> str:
+    mesh_fingerprint = create_geometry_fingerprint(mesh) if mesh_fingerprint is None else mesh_fingerprint
+    path = os.path.join(path_to_folder, f"mesh_geometry_{mesh_fingerprint}.gpkg")
+    if not os.path.exists(path):
+        mesh_geometry = gpd.GeoDataFrame(
+            {_CELL_INDEX_COLUMN: mesh.index.values}, geometry=mesh.geometry.values, crs=mesh.crs
+        )
+        write_geo_data_frame_to_gpkg(mesh_geometry, path)
+    return path
+
+
+def write_results_with_shared_mesh_geometry(
+    results: pd.DataFrame,
+    mesh: gpd.GeoDataFrame,
+    path_to_folder: str,
+    file_stem: str,
+    mesh_fingerprint: Optional[str] = None,
+) -> str:
+    if not results.index.isin(mesh.index).all():
+        raise KeyError(f"the index of the results for {file_stem} does not match the cell index of the mesh")
+    path_to_mesh_geometry = write_mesh_geometry_once(mesh, path_to_folder, mesh_fingerprint)
+    geometry_columns = [
+        column for column in results.columns if isinstance(results[column].dtype, gpd.array.GeometryDtype)
+    ]
+    attributes = pd.DataFrame(results.drop(columns=geometry_columns)).rename_axis(_CELL_INDEX_COLUMN).reset_index()
+    table = pa.Table.from_pandas(attributes, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {
+            **(table.schema.metadata or {}),
+            _MESH_GEOMETRY_METADATA_KEY: os.path.basename(path_to_mesh_geometry).encode(),
+        }
+    )
+    path = os.path.join(path_to_folder, f"{file_stem}.parquet")
+    temporary_path = _create_temporary_path(path)
+    pq.write_table(table, temporary_path, compression="zstd")
+    os.replace(temporary_path, path)
+    return path
+
+
+def load_results_with_shared_mesh_geometry(path_to_results: str) -> gpd.GeoDataFrame:
+    table = pq.read_table(path_to_results)
+    path_to_mesh_geometry = os.path.join(
+        os.path.dirname(path_to_results), table.schema.metadata[_MESH_GEOMETRY_METADATA_KEY].decode()
+    )
+    mesh_geometry = pyogrio.read_dataframe(path_to_mesh_geometry).set_index(_CELL_INDEX_COLUMN)
+    attributes = table.to_pandas().set_index(_CELL_INDEX_COLUMN)
+    return gpd.GeoDataFrame(
+        attributes, geometry=mesh_geometry.geometry.loc[attributes.index].values, crs=mesh_geometry.crs
+    )
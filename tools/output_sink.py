@@ -0,0 +1,108 @@
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import Future, wait
+from typing import Callable, NamedTuple, Optional
+
+
+class _OutputWrite(NamedTuple):
+    path: str
+    function: Callable
+    args: tuple
+    kwargs: dict
+    earlier_writes: tuple[Future, ...]
+    future: Future
+
+
+class OutputSink:
+    _lanes: list[queue.Queue]
+    _writers: list[threading.Thread]
+    _free_slots: threading.BoundedSemaphore
+    _unfinished: set[Future]
+    _failures: list[tuple[str, BaseException]]
+    _lock: threading.Lock
+
+    def __init__(self, number_of_writers: Optional[int] = None, maximum_pending_writes: Optional[int] = None):
+        number_of_writers = min(4, os.cpu_count() or 1) if number_of_writers is None else number_of_writers
+        maximum_pending_writes = 4 * number_of_writers if maximum_pending_writes is None else maximum_pending_writes
+        self._free_slots = threading.BoundedSemaphore(maximum_pending_writes)
+        self._unfinished = set()
+        self._failures = []
+        self._lock = threading.Lock()
+        self._lanes = [queue.Queue() for _ in range(number_of_writers)]
+        self._writers = [
+            threading.Thread(target=self._write_from_lane, args=(lane,), name=f"output_sink_{number}", daemon=True)
+            for number, lane in enumerate(self._lanes)
+        ]
+        for writer in self._writers:
+            writer.start()
+
+    def __enter__(self) -> "OutputSink":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _select_lane(self, path: str) -> queue.Queue:
+        return self._lanes[zlib.crc32(os.path.abspath(path).encode()) % len(self._lanes)]
+
+    def submit(self, path: str, function: Callable, *args, wait_for_earlier_writes: bool = False, **kwargs) -> Future:
+        if not self._writers:
+            raise RuntimeError("the output sink is already closed")
+        self._free_slots.acquire()
+        with self._lock:
+            earlier_writes = tuple(self._unfinished) if wait_for_earlier_writes else ()
+            output_write = _OutputWrite(path, function, args, kwargs, earlier_writes, Future())
+            self._unfinished.add(output_write.future)
+        self._select_lane(path).put(output_write)
+        return output_write.future
+
+    def _write_from_lane(self, lane: queue.Queue) -> None:
+        while (output_write := lane.get()) is not None:
+            try:
+                wait(output_write.earlier_writes)
+                failed_writes = [future for future in output_write.earlier_writes if future.exception() is not None]
+                if failed_writes:
+                    raise RuntimeError(
+                        f"{len(failed_writes)} earlier writes failed, {output_write.path} is not written"
+                    )
+                output_write.future.set_result(output_write.function(*output_write.args, **output_write.kwargs))
+            except BaseException as exception:
+                with self._lock:
+                    self._failures.append((output_write.path, exception))
+                output_write.future.set_exception(exception)
+            finally:
+                with self._lock:
+                    self._unfinished.discard(output_write.future)
+                self._free_slots.release()
+                output_write = None
+
+    def flush(self) -> None:
+        with self._lock:
+            unfinished = tuple(self._unfinished)
+        wait(unfinished)
+        with self._lock:
+            failures, self._failures = self._failures, []
+        if failures:
+            raise RuntimeError(
+                f"{len(failures)} outputs could not be written: "
+                + ", ".join(f"{path} ({exception!r})" for path, exception in failures)
+            )
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            for lane in self._lanes:
+                lane.put(None)
+            for writer in self._writers:
+                writer.join()
+            self._writers = []
+
+
+def write_output(path: str, function: Callable, *args, output_sink: Optional[OutputSink] = None, **kwargs) -> None:
+    if output_sink is None:
+        function(*args, **kwargs)
+    else:
+        output_sink.submit(path, function, *args, **kwargs)
@@ -0,0 +1,96 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional
+
+import geopandas as gpd
+import pandas as pd
+
+from utils.loading import load_data_with_crs_2056
+
+_DEFAULT_MAXIMUM_BYTES = 2 * 1024**3
+
+
+class _CachedLayer(NamedTuple):
+    layer: Any
+    size_in_bytes: int
+
+
+def estimate_size_of_layer(layer: Any, path: str) -> int:
+    if isinstance(layer, gpd.GeoDataFrame):
+        size_of_geometries = sum(len(geometry.wkb) for geometry in layer.geometry if geometry is not None)
+        return int(layer.drop(columns=layer.geometry.name).memory_usage(deep=True).sum()) + size_of_geometries
+    if isinstance(layer, pd.DataFrame):
+        return int(layer.memory_usage(deep=True).sum())
+    return os.path.getsize(path)
+
+
+def load_vector_layer_with_spatial_index(path: str) -> gpd.GeoDataFrame:
+    layer = load_data_with_crs_2056(path)
+    layer.sindex
+    return layer
+
+
+def load_pickle(path: str) -> Any:
+    with open(path, "rb") as dump_file:
+        return pickle.load(dump_file)
+
+
+class ReferenceLayerRegistry:
+    _maximum_bytes: int
+    _layers: "OrderedDict[tuple[str, int, Callable], _CachedLayer]"
+    _bytes_in_use: int
+    _lock: threading.RLock
+
+    def __init__(self, maximum_bytes: int = _DEFAULT_MAXIMUM_BYTES):
+        self._maximum_bytes = maximum_bytes
+        self._layers = OrderedDict()
+        self._bytes_in_use = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._layers)
+
+    @property
+    def bytes_in_use(self) -> int:
+        return self._bytes_in_use
+
+    def _remove(self, key: tuple[str, int, Callable]) -> None:
+        self._bytes_in_use -= self._layers.pop(key).size_in_bytes
+
+    def get(self, path: str, load: Callable[[str], Any]) -> Any:
+        absolute_path = os.path.abspath(path)
+        key = (absolute_path, os.stat(absolute_path).st_mtime_ns, load)
+        with self._lock:
+            if key in self._layers:
+                self._layers.move_to_end(key)
+                return self._layers[key].layer
+            for outdated_key in [other for other in self._layers if other[0] == absolute_path and other[2] == load]:
+                self._remove(outdated_key)
+            layer = load(absolute_path)
+            cached_layer = _CachedLayer(layer, estimate_size_of_layer(layer, absolute_path))
+            if cached_layer.size_in_bytes > self._maximum_bytes:
+                return layer
+            while self._layers and self._bytes_in_use + cached_layer.size_in_bytes > self._maximum_bytes:
+                self._remove(next(iter(self._layers)))
+            self._layers[key] = cached_layer
+            self._bytes_in_use += cached_layer.size_in_bytes
+            return layer
+
+    def get_vector_layer(self, path: str) -> gpd.GeoDataFrame:
+        return self.get(path, load_vector_layer_with_spatial_index)
+
+    def get_pickle(self, path: str) -> Any:
+        return self.get(path, load_pickle)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._layers.clear()
+            self._bytes_in_use = 0
+
+
+def load_vector_layer(path: str, reference_layers: Optional[ReferenceLayerRegistry] = None) -> gpd.GeoDataFrame:
+    if reference_layers is None:
+        return load_data_with_crs_2056(path)
+    return reference_layers.get_vector_layer(path)
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import NamedTuple, Optional
+
+from plotly import graph_objects as go
+from plotly import io as pio
+
+from tools.atomic_files import write_file_atomically
+
+
+class FigureExport(NamedTuple):
+    figure_as_json: str
+    path: str
+    format: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    scale: Optional[float] = None
+
+
+def _render_figure_export(figure_export: FigureExport) -> str:
+    figure = pio.from_json(figure_export.figure_as_json)
+    if figure_export.format == "html":
+        figure.write_html(figure_export.path)
+    else:
+        figure.write_image(
+            figure_export.path,
+            format=figure_export.format,
+            width=figure_export.width,
+            height=figure_export.height,
+            scale=figure_export.scale,
+        )
+    return figure_export.path
+
+
+def _create_digest(figure_export: FigureExport) -> str:
+    return hashlib.sha1(repr(figure_export).encode()).hexdigest()
+
+
+class RenderQueue:
+    _MANIFEST_PATH = os.path.join(r".\.render_cache", "manifest.json")
+    _executor: Optional[ProcessPoolExecutor]
+    _number_of_workers: int
+    _maximum_pending_exports: int
+    _skip_unchanged: bool
+    _pending: dict[Future, tuple[str, str]]
+    _digest_per_path: dict[str, str]
+    _failures: list[tuple[str, BaseException]]
+
+    def __init__(
+        self,
+        number_of_workers: Optional[int] = None,
+        maximum_pending_exports: Optional[int] = None,
+        skip_unchanged: bool = True,
+    ):
+        self._number_of_workers = max(1, (os.cpu_count() or 2) // 2) if number_of_workers is None else number_of_workers
+        self._maximum_pending_exports = (
+            4 * self._number_of_workers if maximum_pending_exports is None else maximum_pending_exports
+        )
+        self._skip_unchanged = skip_unchanged
+        self._executor = None
+        self._pending = {}
+        self._failures = []
+        self._digest_per_path = {}
+        if skip_unchanged and os.path.exists(self._MANIFEST_PATH):
+            with open(self._MANIFEST_PATH, "r") as manifest_file:
+                self._digest_per_path = json.load(manifest_file)
+
+    def add_image(
+        self,
+        figure: go.Figure,
+        path: str,
+        format: str,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        scale: Optional[float] = None,
+    ) -> None:
+        self._submit(FigureExport(figure.to_json(), path, format, width, height, scale))
+
+    def add_html(self, figure: go.Figure, path: str) -> None:
+        self._submit(FigureExport(figure.to_json(), path, "html"))
+
+    def _submit(self, figure_export: FigureExport) -> None:
+        path = os.path.abspath(figure_export.path)
+        figure_export = figure_export._replace(path=path)
+        digest = _create_digest(figure_export)
+        if self._skip_unchanged and self._digest_per_path.get(path) == digest and os.path.exists(path):
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._number_of_workers)
+        while len(self._pending) >= self._maximum_pending_exports:
+            self._collect(wait(self._pending, return_when=FIRST_COMPLETED).done)
+        self._pending[self._executor.submit(_render_figure_export, figure_export)] = (path, digest)
+
+    def _collect(self, finished_futures) -> None:
+        for future in finished_futures:
+            path, digest = self._pending.pop(future)
+            exception = future.exception()
+            if exception is None:
+                self._digest_per_path[path] = digest
+            else:
+                self._digest_per_path.pop(path, None)
+                self._failures.append((path, exception))
+
+    def render(self) -> None:
+        self._collect(wait(self._pending).done)
+        if self._skip_unchanged:
+            os.makedirs(os.path.dirname(self._MANIFEST_PATH), exist_ok=True)
+            write_file_atomically(self._MANIFEST_PATH, json.dumps(self._digest_per_path, indent=True).encode())
+        failures, self._failures = self._failures, []
+        if failures:
+            raise RuntimeError(
+                f"{len(failures)} figures could not be rendered: "
+                + ", ".join(f"{path} ({exception!r})" for path, exception in failures)
+            )
+
+    def close(self) -> None:
+        try:
+            self.render()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+def save_figure_as_image(
+    figure: go.Figure,
+    path: str,
+    format: str,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    scale: Optional[float] = None,
+    render_queue: Optional[RenderQueue] = None,
+) -> None:
+    if render_queue is None:
+        figure.write_image(path, format=format, width=width, height=height, scale=scale)
+    else:
+        render_queue.add_image(figure, path, format=format, width=width, height=height, scale=scale)
+
+
+def save_figure_as_html(figure: go.Figure, path: str, render_queue: Optional[RenderQueue] = None) -> None:
+    if render_queue is None:
+        figure.write_html(path)
+    else:
+        render_queue.add_html(figure, path)
@@ -1,14 +1,284 @@
+import dataclasses
+import hashlib
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional, Sequence
 
+import h5py
+
+from helpers.global_and_constant_values import GlobalConstants
 from helpers.helpers import change_back_to_original_wd_afterwards
+from tools.atomic_files import write_file_atomically
+
+MANIFEST_FORMAT_VERSION = 1
+HYDRAULIC_STATE = "RESULTS/CellsAll/HydState"
+BOTTOM_ELEVATION = "RESULTS/CellsAll/BottomEl"
+CHEZY_COEFFICIENTS = "RESULTS/CellsAll/ChezyCoe"
+_AUXILIARY_RESULTS_FILE_NAME = "results_aux.h5"
+_TIME_SERIES_GROUPS_PER_FILE = {
+    GlobalConstants.results_h5_file_name: (HYDRAULIC_STATE, BOTTOM_ELEVATION, CHEZY_COEFFICIENTS),
+    _AUXILIARY_RESULTS_FILE_NAME: ("flow_velocity", "flow_velocity_abs"),
+}
+_MODEL_FILE_NAME = "model.json"
+_MESH_FILE_KEY = "mesh_file"
+_BYTES_PER_FINGERPRINT_BLOCK = 1024**2
+
+
+@dataclasses.dataclass(frozen=True)
+class H5FileSummary:
+    size_in_bytes: int
+    modification_time_ns: int
+    fingerprint: str
+    time_steps_per_group: dict[str, int]
+    number_of_cells: Optional[int]
+    error: Optional[str] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class ExperimentSummary:
+    path: str
+    h5_files: dict[str, H5FileSummary]
+    mesh_file: Optional[str]
+
+    @property
+    def results(self) -> Optional[H5FileSummary]:
+        return self.h5_files.get(GlobalConstants.results_h5_file_name)
+
+    @property
+    def auxiliary_results(self) -> Optional[H5FileSummary]:
+        return self.h5_files.get(_AUXILIARY_RESULTS_FILE_NAME)
+
+    @property
+    def total_size_in_bytes(self) -> int:
+        return sum(h5_file.size_in_bytes for h5_file in self.h5_files.values())
+
+    @property
+    def number_of_time_steps(self) -> int:
+        return 0 if self.results is None else self.results.time_steps_per_group.get(HYDRAULIC_STATE, 0)
+
+    @property
+    def has_bottom_elevation(self) -> bool:
+        return self.results is not None and BOTTOM_ELEVATION in self.results.time_steps_per_group
+
+    @property
+    def has_chezy_coefficients(self) -> bool:
+        return self.results is not None and CHEZY_COEFFICIENTS in self.results.time_steps_per_group
+
+
+def create_content_fingerprint(path: str) -> str:
+    size_in_bytes = os.path.getsize(path)
+    hash_of_file = hashlib.sha1(str(size_in_bytes).encode())
+    with open(path, "rb") as h5_file:
+        hash_of_file.update(h5_file.read(_BYTES_PER_FINGERPRINT_BLOCK))
+        if size_in_bytes > _BYTES_PER_FINGERPRINT_BLOCK:
+            h5_file.seek(max(_BYTES_PER_FINGERPRINT_BLOCK, size_in_bytes - _BYTES_PER_FINGERPRINT_BLOCK))
+            hash_of_file.update(h5_file.read(_BYTES_PER_FINGERPRINT_BLOCK))
+    return hash_of_file.hexdigest()[:16]
+
+
+def summarise_h5_file(path: str, group_names: Sequence[str]) -> H5FileSummary:
+    status = os.stat(path)
+    time_steps_per_group = {}
+    number_of_cells = None
+    error = None
+    try:
+        with h5py.File(path, "r") as h5_file:
+            for group_name in group_names:
+                if group_name not in h5_file:
+                    continue
+                keys = sorted(int(key) for key in h5_file[group_name].keys())
+                time_steps_per_group[group_name] = len(keys)
+                if keys:
+                    last_step = h5_file[group_name][str(keys[-1])]
+                    number_of_cells = last_step.shape[0] if number_of_cells is None else number_of_cells
+    except (OSError, KeyError, ValueError) as exception:
+        error = repr(exception)
+    return H5FileSummary(
+        size_in_bytes=status.st_size,
+        modification_time_ns=status.st_mtime_ns,
+        fingerprint=create_content_fingerprint(path),
+        time_steps_per_group=time_steps_per_group,
+        number_of_cells=number_of_cells,
+        error=error,
+    )
+
+
+def find_mesh_file(path_to_experiment: str) -> Optional[str]:
+    path_to_model = os.path.join(path_to_experiment, _MODEL_FILE_NAME)
+    if not os.path.exists(path_to_model):
+        return None
+    with open(path_to_model, "r") as model_file:
+        nodes = [json.load(model_file)]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, dict):
+            if isinstance(node.get(_MESH_FILE_KEY), str):
+                return node[_MESH_FILE_KEY]
+            nodes.extend(node.values())
+        elif isinstance(node, list):
+            nodes.extend(node)
+    return None
+
+
+def scan_experiment(path_to_experiment: str) -> ExperimentSummary:
+    h5_files = {}
+    for file_name, group_names in _TIME_SERIES_GROUPS_PER_FILE.items():
+        path = os.path.join(path_to_experiment, file_name)
+        if os.path.exists(path):
+            h5_files[file_name] = summarise_h5_file(path, group_names)
+    return ExperimentSummary(path=path_to_experiment, h5_files=h5_files, mesh_file=find_mesh_file(path_to_experiment))
+
+
+def scan_experiments(
+    paths_to_experiments: Sequence[str], number_of_workers: Optional[int] = None
+) -> list[ExperimentSummary]:
+    if len(paths_to_experiments) < 2 or number_of_workers == 1:
+        return [scan_experiment(path_to_experiment) for path_to_experiment in paths_to_experiments]
+    with ProcessPoolExecutor(max_workers=number_of_workers) as executor:
+        return list(executor.map(scan_experiment, paths_to_experiments))
+
+
+def is_summary_up_to_date(summary: ExperimentSummary) -> bool:
+    for file_name in _TIME_SERIES_GROUPS_PER_FILE:
+        path = os.path.join(summary.path, file_name)
+        h5_file = summary.h5_files.get(file_name)
+        if h5_file is None or not os.path.exists(path):
+            if h5_file is not None or os.path.exists(path):
+                return False
+            continue
+        status = os.stat(path)
+        if (status.st_size, status.st_mtime_ns) != (h5_file.size_in_bytes, h5_file.modification_time_ns):
+            return False
+    return True
+
+
+def get_path_to_manifest(path_to_json_with_experiment_paths: str) -> str:
+    return f"{os.path.splitext(path_to_json_with_experiment_paths)[0]}_manifest.json"
+
+
+def write_experiment_manifest(path_to_manifest: str, summaries: Iterable[ExperimentSummary]) -> None:
+    manifest = {
+        "format_version": MANIFEST_FORMAT_VERSION,
+        "experiments": [dataclasses.asdict(summary) for summary in summaries],
+    }
+    write_file_atomically(path_to_manifest, json.dumps(manifest, indent=True).encode())
+
+
+def read_experiment_manifest(path_to_manifest: str) -> list[ExperimentSummary]:
+    with open(path_to_manifest, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest.get("format_version") != MANIFEST_FORMAT_VERSION:
+        return []
+    return [
+        ExperimentSummary(
+            path=entry["path"],
+            h5_files={file_name: H5FileSummary(**h5_file) for file_name, h5_file in entry["h5_files"].items()},
+            mesh_file=entry["mesh_file"],
+        )
+        for entry in manifest["experiments"]
+    ]
+
+
+def load_or_scan_experiments(
+    paths_to_experiments: Sequence[str], path_to_manifest: str, number_of_workers: Optional[int] = None
+) -> list[ExperimentSummary]:
+    summary_per_path = {}
+    if os.path.exists(path_to_manifest):
+        summary_per_path = {
+            summary.path: summary
+            for summary in read_experiment_manifest(path_to_manifest)
+            if summary.path in paths_to_experiments and is_summary_up_to_date(summary)
+        }
+    paths_to_scan = [path for path in paths_to_experiments if path not in summary_per_path]
+    if paths_to_scan:
+        summary_per_path.update(
+            {summary.path: summary for summary in scan_experiments(paths_to_scan, number_of_workers)}
+        )
+        write_experiment_manifest(path_to_manifest, (summary_per_path[path] for path in paths_to_experiments))
+    return [summary_per_path[path] for path in paths_to_experiments]
+
+
+def find_problems_of_experiment(
+    summary: ExperimentSummary,
+    expected_number_of_time_steps: int,
+    number_of_cells: Optional[int] = None,
+    require_bottom_elevation: bool = True,
+    require_chezy_coefficients: bool = False,
+) -> list[str]:
+    results = summary.results
+    if results is None:
+        return [f"{GlobalConstants.results_h5_file_name} is missing"]
+    problems = [
+        f"{file_name} cannot be read: {h5_file.error}"
+        for file_name, h5_file in summary.h5_files.items()
+        if h5_file.error
+    ]
+    if problems:
+        return problems
+    if summary.number_of_time_steps == 0:
+        problems.append(f"{HYDRAULIC_STATE} has no time steps")
+    elif summary.number_of_time_steps < expected_number_of_time_steps:
+        problems.append(
+            f"{HYDRAULIC_STATE} has {summary.number_of_time_steps} time steps "
+            f"while other experiments have {expected_number_of_time_steps}, the run did not finish"
+        )
+    for h5_file in summary.h5_files.values():
+        for group_name, number_of_time_steps in h5_file.time_steps_per_group.items():
+            if number_of_time_steps != summary.number_of_time_steps:
+                problems.append(
+                    f"{group_name} has {number_of_time_steps} instead of {summary.number_of_time_steps} time steps"
+                )
+    if require_bottom_elevation and not summary.has_bottom_elevation:
+        problems.append(f"{BOTTOM_ELEVATION} is missing")
+    if require_chezy_coefficients and not summary.has_chezy_coefficients:
+        problems.append(f"{CHEZY_COEFFICIENTS} is missing")
+    if summary.auxiliary_results is None:
+        problems.append(f"{_AUXILIARY_RESULTS_FILE_NAME} is missing")
+    else:
+        problems.extend(
+            f"{group_name} is missing in {_AUXILIARY_RESULTS_FILE_NAME}"
+            for group_name in _TIME_SERIES_GROUPS_PER_FILE[_AUXILIARY_RESULTS_FILE_NAME]
+            if group_name not in summary.auxiliary_results.time_steps_per_group
+        )
+    if number_of_cells is not None and results.number_of_cells not in (None, number_of_cells):
+        problems.append(f"the results have {results.number_of_cells} cells but the mesh has {number_of_cells}")
+    return problems
+
+
+def select_experiments_to_evaluate(
+    summaries: Sequence[ExperimentSummary],
+    number_of_cells: Optional[int] = None,
+    require_bottom_elevation: bool = True,
+    require_chezy_coefficients: bool = False,
+) -> tuple[list[str], dict[str, list[str]]]:
+    expected_number_of_time_steps = max((summary.number_of_time_steps for summary in summaries), default=0)
+    problems_per_path = {
+        summary.path: find_problems_of_experiment(
+            summary,
+            expected_number_of_time_steps,
+            number_of_cells=number_of_cells,
+            require_bottom_elevation=require_bottom_elevation,
+            require_chezy_coefficients=require_chezy_coefficients,
+        )
+        for summary in summaries
+    }
+    valid_summaries = [summary for summary in summaries if not problems_per_path[summary.path]]
+    largest_first = sorted(valid_summaries, key=lambda summary: summary.total_size_in_bytes, reverse=True)
+    broken_experiments = {path: problems for path, problems in problems_per_path.items() if problems}
+    return [summary.path for summary in largest_first], broken_experiments
 
 
-def write_all_paths_to_a_json(path: str, json_file_name: str) -> None:
+def write_all_paths_to_a_json(
+    path: str, json_file_name: str, write_manifest: bool = True, number_of_workers: Optional[int] = None
+) -> None:
     with change_back_to_original_wd_afterwards(path):
         all_paths = [os.path.abspath(path) for path in os.listdir(path) if os.path.isdir(path)]
         with open(json_file_name, "w") as json_file:
             json.dump(all_paths, json_file, indent=True)
+        path_to_json = os.path.abspath(json_file_name)
+    if write_manifest:
+        write_experiment_manifest(get_path_to_manifest(path_to_json), scan_experiments(all_paths, number_of_workers))
 
 
 def main():